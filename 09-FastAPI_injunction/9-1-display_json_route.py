@@ -1,7 +1,11 @@
 import json
-from fastapi import FastAPI, Response, status
-from typing import Dict
+from itertools import islice
+from fastapi import FastAPI, Header, Response, status, Query
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Any, Dict, Iterator, Literal, Optional, Tuple
 from pathlib import Path
+from .utils.json_stream import iter_json_file          # type: ignore
+from .utils.http_cache import etag_headers, etag_matches, file_etag, not_modified          # type: ignore
 
 app: FastAPI = FastAPI()
 
@@ -16,14 +20,70 @@ Problem with this approach: if no try-except, the 'FileNotFoundError' crashes th
 """
 
 
+MAX_PAGE_SIZE: int = 1000
+STREAM_CHUNK_BYTES: int = 64 * 1024
+
+STREAM_MEDIA_TYPES: Dict[str, str] = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def stream_patients(patients: Iterator[Tuple[str, Any]], format: str) -> Iterator[bytes]:
+
+    # {"id": ..., <patient fields>} per patient, either items of a json array or 1 json obj per line.
+    # sent in chunks of ~STREAM_CHUNK_BYTES: 1 chunk per patient would cost a threadpool hop per patient
+    separator: bytes = b'\n' if format == 'ndjson' else b','
+    chunk: bytearray = bytearray(b'' if format == 'ndjson' else b'[')
+
+    for position, (patient_id, patient) in enumerate(patients):
+        if position and format == 'json':
+            chunk += separator
+
+        chunk += json.dumps({'id': patient_id, **patient}).encode()
+
+        if format == 'ndjson':
+            chunk += separator
+
+        if len(chunk) >= STREAM_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+
+    if format == 'json':
+        chunk += b']'
+
+    if chunk:
+        yield bytes(chunk)
+
+
 # create a GET route to display a json file
 @app.get('/patients',
         response_model=None)           # use response_model=None coz 'Response' is not a valid Pydantic type.
-def view_patients() -> Dict[str, object] | Response:
+def view_patients(response: Response,
+                  offset: Annotated[Optional[int], Query(ge=0,
+                                                         description='Patients to skip')] = None,
+                  limit: Annotated[Optional[int], Query(ge=1,
+                                                        le=MAX_PAGE_SIZE,
+                                                        description='Max. patients to return')] = None,
+                  format: Annotated[Optional[Literal['json', 'ndjson']], Query(description='Streamed as a json array or ndjson (1 patient per line)')] = None,
+                  if_none_match: Annotated[Optional[str], Header()] = None
+                  ) -> Dict[str, object] | Response:
+
+    # any of the params: streamed page, patients parsed 1 by 1 from the file & sent as soon as parsed
+    if offset is not None or limit is not None or format is not None:
+        return view_patients_page(offset or 0, limit, format or 'json', if_none_match)
+
     try:
+        # ETag of the file as it is now (stat only): the client's copy is current -> 304, the file is not read
+        etag: str = file_etag(json_file_path)
+
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
         with open(json_file_path, 'r') as json_file:
             # data = json.load(json_file)
             # print(type(data))
+            response.headers.update(etag_headers(etag))
             return json.load(json_file)
     
     except FileNotFoundError as err:
@@ -42,3 +102,56 @@ def view_patients() -> Dict[str, object] | Response:
             }),
             media_type='application/json')
 
+
+def view_patients_page(offset: int, limit: Optional[int], format: str, if_none_match: Optional[str] = None) -> Response:
+
+    patients: Iterator[Tuple[str, Any]] = islice(iter_json_file(json_file_path),
+                                                 offset,
+                                                 offset + limit if limit is not None else None)
+
+    # 1st patient parsed before answering: a missing file / invalid start of file still gets its error status,
+    # an error further down the file can only cut the stream short
+    try:
+        etag: str = file_etag(json_file_path)
+
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        first: Tuple[str, Any] | None = next(patients, None)
+
+    except FileNotFoundError as err:
+        return Response(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content=json.dumps({
+                'error': f'Patient data file not found: {err}'
+            }),
+            media_type='application/json')
+
+    except json.JSONDecodeError as err:
+        return Response(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content=json.dumps({
+                'error': f'Invalid JSON: {err}'
+            }),
+            media_type='application/json')
+
+    def page() -> Iterator[Tuple[str, Any]]:
+        if first is not None:
+            yield first
+            yield from patients
+
+    return StreamingResponse(stream_patients(page(), format),
+                             media_type=STREAM_MEDIA_TYPES[format],
+                             headers=etag_headers(etag))
+
+
+"""
+    • Without params '/patients' answers like before (the whole file as 1 json obj). With 'offset' / 'limit' / 'format',
+      memory & time to 1st byte no longer grow with the file: only the patients up to offset + limit are parsed,
+      1 at a time (utils/json_stream.py), & each one is sent as soon as it is parsed.
+
+    • Page through with offset += limit until a page holds less than 'limit' patients.
+
+    • Every response carries the ETag of patient_data.json (inode, mtime & size), a poll sending it back in
+      If-None-Match gets a 304 from a stat() alone while the file is unchanged.
+"""
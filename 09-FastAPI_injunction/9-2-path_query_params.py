@@ -1,12 +1,21 @@
+import os
 import json
+import threading
 from pathlib import Path
-from fastapi import FastAPI, Response, status, Path as PathParam, HTTPException, Query
-from typing import Annotated, Dict, List, Any, Optional
+from fastapi import FastAPI, Header, Response, status, Path as PathParam, HTTPException, Query
+from typing import Annotated, Dict, List, Any, Optional, Tuple
+from .utils.sorted_index import PatientIndexes, SortKey, decode_cursor, encode_cursor, top_k          # type: ignore
+from .utils.http_cache import content_etag, etag_headers, etag_matches, not_modified, record_etag          # type: ignore
+from .utils.patient_mmap import PatientMmapFile, open_patient_mmap          # type: ignore
 
 app: FastAPI = FastAPI()
 
 json_file_path: Path = Path(__file__).parent / 'patient_data.json'
 
+# 'true': '/patients/{patient_id}' reads 1 line of patient_data.ndjson through its mmap'ed id index (utils/patient_mmap.py),
+# patient_data.json is then only loaded by the 1st '/sort'
+PATIENT_MMAP_ENABLED: bool = os.getenv('PATIENT_MMAP_ENABLED', 'false').lower() == 'true'
+
 # load data
 def load_patient_data():        # Dict[str, str] | Response
     try:
@@ -25,7 +34,72 @@ def load_patient_data():        # Dict[str, str] | Response
         #                     detail=f'Patient data file not found: {err}')
 
 
-patient_data: Dict[str, Dict[str, Any]] | Response = load_patient_data()      # replaced 'object' type to 'Dict[str, Any]'
+patient_data: Dict[str, Dict[str, Any]] | Response = load_patient_data() if not PATIENT_MMAP_ENABLED else {}     # replaced 'object' type to 'Dict[str, Any]'
+
+
+def json_file_key() -> Tuple[int, int, int]:
+    # inode, mtime & size: write_json_atomic() replaces the file (new inode) even when the mtime doesn't move (coarse
+    # timestamps, 2 writes in the same tick), mtime & size catch in-place edits. Raises FileNotFoundError
+    json_stat = os.stat(json_file_path)
+    return json_stat.st_ino, json_stat.st_mtime_ns, json_stat.st_size
+
+
+patient_data_file_key: Tuple[int, int, int] | None = json_file_key() if json_file_path.exists() and not PATIENT_MMAP_ENABLED else None
+
+valid_sorted_fields: List[str] = ['height', 'weight', 'bmi']
+MAX_PAGE_SIZE: int = 1000
+
+# sorted secondary index per field of '/sort', built on its 1st use & kept in step with patient_data.json
+patient_indexes: PatientIndexes = PatientIndexes(valid_sorted_fields,
+                                                 patient_data if isinstance(patient_data, dict) else {})
+patient_data_lock = threading.Lock()            # sync routes run on threadpool workers
+
+
+def refresh_patient_data() -> None:
+    global patient_data, patient_data_file_key
+
+    # patient_data.json rewritten (ex: by the 9-3 / 9-4 apps): reload it & update the indexes for the changed patients only
+    try:
+        file_key: Tuple[int, int, int] = json_file_key()          # before the read: a rewrite during it reloads again next time
+    except FileNotFoundError:
+        return                                  # keep serving the data loaded last
+
+    if file_key == patient_data_file_key:
+        return
+
+    try:
+        new_data: Dict[str, Dict[str, Any]] | Response = load_patient_data()
+    except json.JSONDecodeError:
+        return
+
+    if isinstance(new_data, dict):
+        patient_indexes.sync(new_data)
+        patient_data, patient_data_file_key = new_data, file_key
+
+
+patient_mmap: PatientMmapFile | None = None
+patient_mmap_lock = threading.Lock()
+
+
+def get_mmap_patient(patient_id: str) -> bytes | None:
+    global patient_mmap
+
+    # remapped (& rebuilt if needed) only when patient_data.json changed, the lookup itself runs outside the lock
+    with patient_mmap_lock:
+        try:
+            patient_mmap = open_patient_mmap(json_file_path, patient_mmap)
+
+        except FileNotFoundError as err:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f'Patient data file not found: {err}')
+
+        except (json.JSONDecodeError, ValueError) as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f'Invalid patient data file: {err}')
+
+        mapped: PatientMmapFile = patient_mmap
+
+    return mapped.get_raw(patient_id)           # the record's json line, not decoded
 
 
 # route with path-parameter:
@@ -34,14 +108,45 @@ patient_data: Dict[str, Dict[str, Any]] | Response = load_patient_data()      #
 def get_patient_by_id(patient_id: Annotated[str, PathParam(...,
                                                            description='The patient ID',
                                                            example='P001')
-                                                        ]):
+                                                        ],
+                      response: Response,
+                      if_none_match: Annotated[Optional[str], Header()] = None):
 
-    if isinstance(patient_data, Response):
+    if PATIENT_MMAP_ENABLED:
+        raw_record: bytes | None = get_mmap_patient(patient_id)
+
+        # ETag = hash of the stored line: a 304 decodes nothing, a 200 sends the bytes as they are
+        if raw_record is not None:
+            etag: str = content_etag(raw_record)
+
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+            return Response(content=raw_record,
+                            media_type='application/json',
+                            headers=etag_headers(etag))
+
+        record: Dict[str, Any] | None = None
+
+    elif isinstance(patient_data, Response):
         return patient_data                     # returns the error response directly
-    
+
+    else:
+        with patient_data_lock:
+            refresh_patient_data()
+
+        record = patient_data.get(patient_id)
+
     # better ready prod code
-    if patient_id in patient_data:
-         return patient_data[patient_id]        # the `return` immediately exits the route handler, so execution would never reach the raise HTTPException(...) line; The HTTPException is only hit when the condition is False (i.e., the patient_id key is not present in patient_data).
+    if record is not None:
+         # ETag = hash of this patient's record: other patients changing in the file don't invalidate it
+         etag = record_etag(record)
+
+         if etag_matches(if_none_match, etag):
+             return not_modified(etag)
+
+         response.headers.update(etag_headers(etag))
+         return record                          # the `return` immediately exits the route handler, so execution would never reach the raise HTTPException(...) line; The HTTPException is only hit when the condition is False (i.e., the patient_id key is not present in patient_data).
     
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -65,10 +170,15 @@ def get_patient_by_id(patient_id: Annotated[str, PathParam(...,
 def sort_patients(sort_by: Annotated[str, Query(...,
                                                 description='Sort patients on the basis of height, weight & bmi')],
                 order_by: Optional[str] = Query(default=None,
-                                                description='Sort either in asc or desc. order')
+                                                description='Sort either in asc or desc. order'),
+                limit: Optional[int] = Query(default=None,
+                                             ge=1,
+                                             le=MAX_PAGE_SIZE,
+                                             description='Page size, the response then holds 1 page & its "next_cursor"'),
+                cursor: Optional[str] = Query(default=None,
+                                              description='"next_cursor" of the previous page')
                                                 ):
     
-    valid_sorted_fields: List[str] = ['height', 'weight', 'bmi']
     valid_order_fields: List[str] = ['asc', 'desc']
 
     if sort_by not in valid_sorted_fields:
@@ -82,14 +192,34 @@ def sort_patients(sort_by: Annotated[str, Query(...,
     if isinstance(patient_data, Response):
         return patient_data
     
-    sorted_data: List[Dict[str, Any]] = sorted(patient_data.values(),         # extract all "<Values>" from json file
-                         key=lambda x: x.get(sort_by, 0),
-                         reverse=True if order_by=='desc' else False)      # means desc order
-    
     """
-        *  x.get(sort_by, 0): this calls the dictionary's get() method on each item (weight, height, bmi). It attempts to retrieve the value associated with the key stored in the variable `sort_by`. If that key doesn't exist in the dictionary, it returns 0 as a default value instead of raising a KeyError.
+        *  x.get(sort_by, 0) (see utils/sorted_index.sort_key()): this calls the dictionary's get() method on each item (weight, height, bmi). It attempts to retrieve the value associated with the key stored in the variable `sort_by`. If that key doesn't exist in the dictionary, it returns 0 as a default value instead of raising a KeyError.
         
         * Why use .get() with a default? Default value of 0 is safety mechanism. If any dictionary in the list is missing the sort_by key, the code won't crash—it will treat that item as having a value of 0 for sorting purposes.
     """
 
-    return sorted_data
\ No newline at end of file
+    descending: bool = order_by == 'desc'
+
+    try:
+        after: SortKey | None = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=str(err))
+
+    with patient_data_lock:
+        refresh_patient_data()
+
+        # no 'limit' & no 'cursor': the whole sorted list, as before (walks the index instead of sorting every time)
+        if limit is None and after is None:
+            return [patient_data[patient_id] for _, patient_id in patient_indexes.build(sort_by).page(descending)]
+
+        # 1st page before the index exists: heap top-k, O(n log k)
+        if after is None and patient_indexes.get(sort_by) is None:
+            keys: List[SortKey] = top_k(patient_data, sort_by, limit, descending)         # type: ignore
+        else:
+            keys = patient_indexes.build(sort_by).page(descending, limit, after)
+
+        return {
+            'patients': [patient_data[patient_id] for _, patient_id in keys],
+            'next_cursor': encode_cursor(keys[-1]) if limit is not None and len(keys) == limit else None
+        }
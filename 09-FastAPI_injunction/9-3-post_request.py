@@ -1,28 +1,25 @@
-from typing import Dict, Any
 from fastapi.responses import JSONResponse
 from fastapi import FastAPI, HTTPException, status
 from .models import Patient                  # type: ignore
-from .utils import load_patient_data, update_data_to_json                  # type: ignore
+from .utils.patient_store import patient_store, patient_store_lifespan      # type: ignore
 
-app: FastAPI = FastAPI()  
+# patient_data.json is loaded once at startup, writes are persisted in the background (see utils/patient_store.py)
+app: FastAPI = FastAPI(lifespan=patient_store_lifespan)
 
 @app.post('/create_patient')
-def create_patient(patient_obj: Patient) -> JSONResponse:
+async def create_patient(patient_obj: Patient) -> JSONResponse:
 
-  # load existing data from json file
-  patient_data: Dict[str, Dict[str, Any]] = load_patient_data()
+  # add new patient to the in-memory store, which saves it to the json file
+  # NOTE: the 'already exists' check & the insert happen together, 2 concurrent requests can't both create the same id
+  created: bool = await patient_store.create_async(patient_obj.id, patient_obj.model_dump(exclude={
+                                                                                            'id'
+                                                                                          }))
 
   # verify if patient already exists
-  if patient_obj.id in patient_data:
+  if not created:
      raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                          detail=f'Patient already exists for this id')
 
-  # add new patient to the json schema and save in file
-  patient_data[patient_obj.id] = patient_obj.model_dump(exclude={
-                                                        'id'
-                                                      })
-  update_data_to_json(patient_data)
-
   return JSONResponse(status_code=status.HTTP_201_CREATED,
                       content={
                          'message' : 'Patient added successfully'
@@ -2,63 +2,64 @@ from typing import Dict, Any
 from fastapi.responses import JSONResponse
 from fastapi import FastAPI, HTTPException, status
 from .models import Patient, PatientUpdate         # type: ignore
-from .utils import load_patient_data, update_data_to_json                  # type: ignore
+from .utils.patient_store import patient_store, patient_store_lifespan      # type: ignore
 
-app: FastAPI = FastAPI() 
+# patient_data.json is loaded once at startup, writes are persisted in the background (see utils/patient_store.py)
+# run several workers with PATIENT_STORE_MODE=journal
+# async routes: store calls that touch the disk run on the dedicated file I/O threads, not AnyIO's shared threadpool
+app: FastAPI = FastAPI(lifespan=patient_store_lifespan)
+
+# a concurrent update of the same patient (another request / worker) makes put() fail, re-read & re-apply this one
+UPDATE_ATTEMPTS: int = 5
 
 @app.put('/update/{patient_id}')
-def update_patient(patient_id: str, patient_update_obj: PatientUpdate) -> JSONResponse:
+async def update_patient(patient_id: str, patient_update_obj: PatientUpdate) -> JSONResponse:
 
-   # load existing data from json file
-   patient_data: Dict[str, Dict[str, Any]] = load_patient_data()
+   # convert the pydantic obj and exclude all fields not given by client during object update
+   update_patient_dict: Dict[str, Any] = patient_update_obj.model_dump(exclude_unset=True)
 
-   if patient_id not in patient_data:
-      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                        detail=f'Patient {patient_id} not found')
-   
+   for _ in range(UPDATE_ATTEMPTS):
 
-   existng_patient_dict: Dict[str, Any] = patient_data[patient_id]
+      # copy of the stored patient & its version, modifying it doesn't touch the store until put()
+      existng_patient_dict, version = await patient_store.get_versioned_async(patient_id)
 
-   # convert the pydantic obj and exclude all fields not given by client during object update
-   update_patient_dict: Dict[str, Any] = patient_update_obj.model_dump(exclude_unset=True)
+      if existng_patient_dict is None:
+         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                           detail=f'Patient {patient_id} not found')
+      
 
-   for key, val in update_patient_dict.items():    # taking <k,v> of from the obj what client submitted
-      existng_patient_dict[key] = val              # getting into the same 'key' of existing data dict and replacing it's old value with new (client) one
+      for key, val in update_patient_dict.items():    # taking <k,v> of from the obj what client submitted
+         existng_patient_dict[key] = val              # getting into the same 'key' of existing data dict and replacing it's old value with new (client) one
 
-   """
-   in order to calculate the computed fields 'bmi' and 'verdict' from the newly supplied client data, recreate the pydantic object for 'Patient' class, the only class which got these fields
-   
-   also assign 'id' key of existing_patient_dict to the variable 'patient_id' coz Pydantic REQUIRES 'id' to create Patient object
-    """
-   patient_obj: Patient = Patient(id=patient_id,
-                                  **existng_patient_dict)
+      """
+      in order to calculate the computed fields 'bmi' and 'verdict' from the newly supplied client data, recreate the pydantic object for 'Patient' class, the only class which got these fields
+      
+      also assign 'id' key of existing_patient_dict to the variable 'patient_id' coz Pydantic REQUIRES 'id' to create Patient object
+       """
+      patient_obj: Patient = Patient(id=patient_id,
+                                     **existng_patient_dict)
 
-   # convert above obj to dict and exclude 'id' field to match with 'PatientUpdate' schema (structure), add this dict to patient_data (json data)
-   patient_data[patient_id] = patient_obj.model_dump(exclude={
-                              'id'
-                           })
+      # convert above obj to dict and exclude 'id' field to match with 'PatientUpdate' schema (structure), & store it
+      # only if nobody changed the patient since it was read (same version)
+      if await patient_store.put_async(patient_id, patient_obj.model_dump(exclude={
+                                 'id'
+                              }), expected_version=version):
 
-   # finally update json file
-   update_data_to_json(patient_data)
+         return JSONResponse(status_code=status.HTTP_200_OK,
+                             content={
+                                'message' : 'Patient updated successfully'
+                             })
 
-   return JSONResponse(status_code=status.HTTP_200_OK,
-                       content={
-                          'message' : 'Patient updated successfully'
-                       })
+   raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                       detail=f'Patient {patient_id} is being updated concurrently, retry the request')
 
 
 @app.delete('/delete/{patient_id}')
-def delete_patient(patient_id: str):
+async def delete_patient(patient_id: str):
 
-   patient_data = load_patient_data()
-   
-   if patient_id not in patient_data:
+   if not await patient_store.delete_async(patient_id):
      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                         detail=f'Patient {patient_id} not found')
-   
-   del patient_data[patient_id]
-
-   update_data_to_json(patient_data)
 
    return JSONResponse(status_code=status.HTTP_204_NO_CONTENT,
                        content={
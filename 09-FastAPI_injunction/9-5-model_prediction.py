@@ -1,50 +1,149 @@
-from typing import AsyncGenerator, Dict, Any
+import os
+from typing import Annotated, AsyncGenerator, Dict, Any, List, Tuple
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, status
+from fastapi import Body, FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from .models import UserInputFeatures   # type: ignore
-from .utils import load_model, predict_output            # type: ignore
-from sklearn.base import BaseEstimator
+from .utils import extract_model_features            # type: ignore
+from .utils.model_registry import ModelHandle, ModelRegistry          # type: ignore
+from .utils.micro_batching import MicroBatcher          # type: ignore
+from .utils.inference_executor import InferenceExecutor        # type: ignore
+from .utils.prediction_cache import MISSING, PredictionCache, prediction_cache_key      # type: ignore
+from .utils.memory_usage import process_memory          # type: ignore
+from .utils.instrumentation import instrument_app, stage        # type: ignore
+from .utils.reference_data import reference_data        # type: ignore
+
+MAX_BATCH_SIZE: int = 10_000
+
+# micro-batching of concurrent /predict calls, tune the window with the 'batching' numbers on /health
+PREDICT_BATCHING_ENABLED: bool = os.getenv('PREDICT_BATCHING_ENABLED', 'true').lower() == 'true'
+PREDICT_BATCH_WINDOW_MS: float = float(os.getenv('PREDICT_BATCH_WINDOW_MS', '2'))
+PREDICT_MAX_BATCH_SIZE: int = int(os.getenv('PREDICT_MAX_BATCH_SIZE', '64'))
+
+# dedicated pool for sklearn scoring: 'thread' or 'process' (model loaded once per worker process)
+INFERENCE_EXECUTOR_MODE: str = os.getenv('INFERENCE_EXECUTOR_MODE', 'thread')
+INFERENCE_WORKERS: int = int(os.getenv('INFERENCE_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+
+# LRU cache of predictions keyed on the derived features, size 0 turns it off
+PREDICTION_CACHE_SIZE: int = int(os.getenv('PREDICTION_CACHE_SIZE', '4096'))
+PREDICTION_CACHE_TTL_SECONDS: float | None = float(os.getenv('PREDICTION_CACHE_TTL_SECONDS', '0')) or None
+
+# how often the model registry dir is checked for a new version
+MODEL_REGISTRY_POLL_SECONDS: float = float(os.getenv('MODEL_REGISTRY_POLL_SECONDS', '5'))
 
 # Skip loading model on every request each time (slow and inefficient), instead load once at startup
-insurance_model: BaseEstimator | None = None
+# NOTE: the registry holds the served model (+ its pandas-free fast scorer) & swaps in new versions without a restart
+model_registry: ModelRegistry = ModelRegistry(poll_interval_seconds=MODEL_REGISTRY_POLL_SECONDS)
+inference_executor: InferenceExecutor | None = None
+prediction_batcher: MicroBatcher | None = None
+prediction_cache: PredictionCache | None = PredictionCache(max_size=PREDICTION_CACHE_SIZE,
+                                                           ttl_seconds=PREDICTION_CACHE_TTL_SECONDS) if PREDICTION_CACHE_SIZE > 0 else None
+
+
+async def score_batch_in_executor(handle: ModelHandle, data_dicts: List[Dict[str, Any]]) -> List[str | Exception]:
+
+    if inference_executor is None:
+        raise RuntimeError('Inference executor is not running')
+
+    return await inference_executor.score(handle, data_dicts)
+
+
+def current_model() -> ModelHandle:
+
+    handle: ModelHandle | None = model_registry.current
+
+    if handle is None:
+        raise RuntimeError('Model is not loaded')
+
+    return handle
+
+
+def preload_model() -> None:
+    # called by utils/preload_launcher.py in the parent process so forked workers share the model's pages
+    model_registry.load_initial()
+
 
 @asynccontextmanager
 async def model_lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     
-    global insurance_model
-    insurance_model = load_model()
-    print('Model loaded into memory!')
+    global inference_executor, prediction_batcher
+
+    if model_registry.current is None:
+        print('Loading model into memory...')
+    else:
+        print('Using model preloaded before fork!')
+
+    await model_registry.start()            # loads the latest version (unless preloaded) & starts watching the registry dir
+    print(f'Model {current_model().version} loaded into memory!')
+
+    inference_executor = InferenceExecutor(current_model(),
+                                           mode=INFERENCE_EXECUTOR_MODE,        # type: ignore
+                                           max_workers=INFERENCE_WORKERS)
+
+    if PREDICT_BATCHING_ENABLED:
+        prediction_batcher = MicroBatcher(score_batch_in_executor,
+                                          max_batch_size=PREDICT_MAX_BATCH_SIZE,
+                                          max_wait_ms=PREDICT_BATCH_WINDOW_MS,
+                                          max_concurrent_batches=inference_executor.max_workers)     # keep every executor worker busy
+        await prediction_batcher.start()
 
     yield                           # used to create generator functions to produce a sequence of values over time, pausing and resuming execution. 
     print('Model shutting down...')
 
+    if prediction_batcher is not None:
+        await prediction_batcher.stop()            # flush requests still waiting in the queue
+        prediction_batcher = None
+
+    inference_executor.shutdown()
+    inference_executor = None
+
+    await model_registry.stop()
+
 app: FastAPI = FastAPI(lifespan=model_lifespan)
+instrument_app(app)                 # INSTRUMENTATION_ENABLED=true: per-stage timings, 'Server-Timing' header & GET /metrics
 
 
 @app.get('/health')                         # essential as a pre-requisite for cloud machine deployment
-def health_check() -> Dict[str, str | bool]:
+def health_check() -> Dict[str, Any]:
     return {
         'status': 'Ok',
-        'version': 'extract from MLFlow - v_1.0',
-        'model_load_status': insurance_model is not None
+        'version': model_registry.current.version if model_registry.current is not None else None,
+        'model_load_status': model_registry.current is not None,
+        'model': model_registry.info(),
+        'inference_executor': inference_executor.info() if inference_executor is not None else None,
+        'batching': prediction_batcher.metrics() if prediction_batcher is not None else None,
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+        'reference_data': reference_data.info(),
+        'memory': process_memory()             # per worker, compare 'pss_mb' with & without the preload launcher
     }
 
 
 @app.post('/predict')
-def predict_insurance_premium(user_input: UserInputFeatures) -> JSONResponse:
+async def predict_insurance_premium(user_input: UserInputFeatures) -> JSONResponse:
     
     try:
-        data_dict: Dict[str, Any] = {
-                'income_lpa': user_input.income_lpa,
-                'occupation': user_input.occupation,
-                'bmi': user_input.bmi,
-                'lifestyle_risk': user_input.lifestyle_risk,
-                'city_tier': user_input.city_tier,
-                'age_group': user_input.age_group,
-            }
+        with stage('features'):
+            data_dict: Dict[str, Any] = extract_model_features(user_input)     # income_lpa, occupation, bmi, lifestyle_risk, city_tier, age_group
+
+        handle: ModelHandle = current_model()             # pinned for the whole request, a hot swap meanwhile doesn't affect it
+        cache_key = prediction_cache_key(data_dict)
+        prediction_output = prediction_cache.get(cache_key, handle) if prediction_cache is not None else MISSING
+
+        if prediction_output is MISSING:
+            with stage('predict'):
+                if prediction_batcher is not None:
+                    prediction_output = await prediction_batcher.submit(data_dict, handle)       # scored together with concurrent requests
+                else:
+                    prediction_output = (await score_batch_in_executor(handle, [data_dict]))[0]
+
+                    if isinstance(prediction_output, Exception):
+                        raise prediction_output
 
-        prediction_output = predict_output(data_dict, insurance_model)
+            if prediction_cache is not None:
+                prediction_cache.put(cache_key, prediction_output, handle)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -60,6 +159,66 @@ def predict_insurance_premium(user_input: UserInputFeatures) -> JSONResponse:
             })
 
 
+# rows are taken as raw dicts (not List[UserInputFeatures]) so that one invalid row doesn't 422 the whole batch
+@app.post('/predict/batch')
+async def predict_insurance_premium_batch(user_inputs: Annotated[List[Dict[str, Any]], Body(...,
+                                                                                             max_length=MAX_BATCH_SIZE,
+                                                                                             description='List of UserInputFeatures payloads')]
+                                          ) -> JSONResponse:
+
+    # validating thousands of rows is CPU work too, keep it off the event loop
+    with stage('row_validation'):
+        results, valid_rows, data_dicts = await run_in_threadpool(validate_batch, user_inputs)
+
+    # one DataFrame & one predict() call for every valid row, run on the inference executor
+    with stage('predict'):
+        predictions: List[str | Exception] = await score_batch_in_executor(current_model(), data_dicts) if data_dicts else []
+
+    for index, prediction in zip(valid_rows, predictions):
+        if isinstance(prediction, Exception):
+            results[index]['error'] = f'Request cannot be processed right now, some exception occured: {str(prediction)}'
+        else:
+            results[index]['predicted_insurance_premium'] = prediction
+
+    failed: int = sum('error' in result for result in results)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'results': results
+        })
+
+
+def validate_batch(user_inputs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int], List[Dict[str, Any]]]:
+
+    results: List[Dict[str, Any]] = []
+    valid_rows: List[int] = []              # positions in 'results' which still need a prediction
+    data_dicts: List[Dict[str, Any]] = []
+
+    for index, raw_input in enumerate(user_inputs):
+        try:
+            user_input: UserInputFeatures = UserInputFeatures.model_validate(raw_input)
+            data_dicts.append(extract_model_features(user_input))
+            valid_rows.append(index)
+            results.append({'index': index})
+
+        except ValidationError as err:
+            results.append({
+                'index': index,
+                'error': jsonable_encoder(err.errors(include_url=False))
+            })
+
+        except HTTPException as err:          # raised by the 'occupation' validator
+            results.append({
+                'index': index,
+                'error': err.detail
+            })
+
+    return results, valid_rows, data_dicts
+
+
 """ 
 TODO: Data Science stuffs -->
 
@@ -1,16 +1,68 @@
 from .models.patient_models import Patient, PatientUpdate, PatientDB
-from typing import Any, Generator, List
-from fastapi import Depends, FastAPI, HTTPException, status
-from sqlmodel import Session, SQLModel, create_engine, select
+import os
+from typing import Annotated, Any, Dict, Generator, List, Optional, Set
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Response, status
+from sqlalchemy import insert, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, select
+from .utils.instrumentation import instrument_app, instrument_engine
+from .utils.http_cache import etag_headers, etag_matches, not_modified, strong_etag
+from .utils.database import create_db_engine
 
 app: FastAPI = FastAPI()
+instrument_app(app)             # INSTRUMENTATION_ENABLED=true: per-stage timings, 'Server-Timing' header & GET /metrics
 
-# Create the SQLite database engine
-engine = create_engine('sqlite:///patient_database.db',
-                                echo=True)
+# Create the SQLite database engine: DATABASE_URL, DATABASE_ECHO, pool sizes & SQLite pragmas from the env (see utils/database.py)
+engine = create_db_engine()
+instrument_engine(engine)       # 'db_query' & 'db_commit' stages
 
 SQLModel.metadata.create_all(engine)
 
+
+def migrate_patients_table() -> None:
+
+    # patient_database.db created before the 'version' column (create_all() doesn't alter existing tables): existing rows start at 1
+    if 'version' in {column['name'] for column in inspect(engine).get_columns(PatientDB.__tablename__)}:
+        return
+
+    with engine.begin() as connection:
+        if engine.dialect.name != 'sqlite':
+            connection.execute(text('ALTER TABLE patients ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+            return
+
+        # SQLite reuses the id of a deleted last row unless the table is AUTOINCREMENT, which only a rebuild can add
+        connection.execute(text('ALTER TABLE patients RENAME TO patients_before_version'))
+
+        for index in inspect(connection).get_indexes('patients_before_version'):
+            connection.execute(text(f'DROP INDEX {index["name"]}'))          # the new table's indexes take the same names
+
+        SQLModel.metadata.create_all(connection, tables=[PatientDB.__table__])        # type: ignore
+        columns: str = ', '.join(column.name for column in PatientDB.__table__.columns if column.name != 'version')        # type: ignore
+        connection.execute(text(f'INSERT INTO patients ({columns}) SELECT {columns} FROM patients_before_version'))
+        connection.execute(text('DROP TABLE patients_before_version'))
+
+
+migrate_patients_table()
+
+
+# ETag of GET /patients/{patient_id}: row id + version, both stored in the database, so every worker & outside writer agrees on it
+def patient_etag(row_id: int, version: int) -> str:
+    return strong_etag(f'{row_id:x}', f'{version:x}')
+
+
+MAX_BULK_PATIENTS: int = 50_000
+
+# patients per duplicate check (1 'IN' query, below SQLite's bound-parameter limit) & per insert transaction
+BULK_CHUNK_SIZE: int = int(os.getenv('BULK_CHUNK_SIZE', '500'))
+BULK_INSERT_ATTEMPTS: int = 3
+
+
+def is_patient_id_conflict(err: IntegrityError) -> bool:
+    # SQLite: 'UNIQUE constraint failed: patients.patient_id', PostgreSQL / MySQL name the unique index instead
+    message: str = str(err.orig)
+    return 'patients.patient_id' in message or 'ix_patients_patient_id' in message
+
+
 # Dependency: Get the session
 def get_session() -> Generator[Session, Any, None]:     # Generator[YieldType, SendType, ReturnType]
 
@@ -38,8 +90,20 @@ def read_patient(skip: int=0,
         response_model=PatientDB,
         status_code=status.HTTP_200_OK)
 def get_patient_by_id(patient_id: str,
-                    session: Session = Depends(get_session)) -> PatientDB:
-    
+                    response: Response,
+                    if_none_match: Annotated[Optional[str], Header()] = None,
+                    session: Session = Depends(get_session)) -> PatientDB | Response:
+
+    # unchanged since the client's copy: 304 after 1 lookup in the 'patient_id' index, without loading the row
+    if if_none_match is not None:
+        current = session.exec(
+            select(PatientDB.id, PatientDB.version)
+            .where(PatientDB.patient_id == patient_id)
+        ).first()
+
+        if current is not None and etag_matches(if_none_match, patient_etag(*current)):
+            return not_modified(patient_etag(*current))
+
     patient_info: PatientDB | None = session.exec(
         select(PatientDB)
         .where(PatientDB.patient_id == patient_id)
@@ -51,6 +115,7 @@ def get_patient_by_id(patient_id: str,
             detail=f'Patient {patient_id} not found'
         )
     
+    response.headers.update(etag_headers(patient_etag(patient_info.id, patient_info.version)))      # type: ignore
     return patient_info
 
 
@@ -94,6 +159,74 @@ def create_patient(patient: Patient,
     """
 
 
+# Create many patients - per chunk: 1 'IN' query for the existing ids, 1 executemany INSERT, 1 COMMIT
+@app.post('/create_patient/bulk',
+         status_code=status.HTTP_200_OK)
+def create_patients_bulk(patients: Annotated[List[Patient], Body(...,
+                                                                 max_length=MAX_BULK_PATIENTS,
+                                                                 description='List of Patient payloads')],
+                         session: Session = Depends(get_session)) -> Dict[str, Any]:
+
+    results: List[Dict[str, Any]] = []
+
+    for start in range(0, len(patients), BULK_CHUNK_SIZE):
+        chunk: List[Patient] = patients[start:start + BULK_CHUNK_SIZE]
+
+        for attempt in range(BULK_INSERT_ATTEMPTS):
+            existing_ids: Set[str] = set(session.exec(
+                select(PatientDB.patient_id)
+                .where(PatientDB.patient_id.in_([patient.id for patient in chunk]))        # type: ignore
+            ).all())
+
+            chunk_results: List[Dict[str, Any]] = []
+            rows: List[Dict[str, Any]] = []
+            chunk_ids: Set[str] = set()         # an id repeated in the payload: its 1st occurrence wins, like 1-by-1 creates
+
+            for index, patient in enumerate(chunk, start=start):
+                if patient.id in existing_ids or patient.id in chunk_ids:
+                    chunk_results.append({'index': index, 'id': patient.id, 'status': 'conflict'})
+                    continue
+
+                chunk_ids.add(patient.id)
+                rows.append(PatientDB.from_patient(patient).model_dump(exclude={'id'}))
+                chunk_results.append({'index': index, 'id': patient.id, 'status': 'created'})
+
+            try:
+                if rows:
+                    session.connection().execute(insert(PatientDB), rows)          # list of dicts -> executemany
+                session.commit()
+                break
+
+            # same id created by a concurrent request since the 'IN' query: check the chunk again. Any other
+            # constraint (ex: NOT NULL) fails the same way on every attempt, so it's raised as is
+            except IntegrityError as err:
+                session.rollback()
+
+                if not is_patient_id_conflict(err):
+                    raise
+
+        else:
+            # still racing after every attempt: nothing of this chunk was committed, the next chunks still get their turn
+            chunk_results = [{'index': index, 'id': patient.id, 'status': 'failed',
+                              'error': 'created concurrently by another request, retry'}
+                             for index, patient in enumerate(chunk, start=start)]
+
+        results.extend(chunk_results)
+
+    return {
+        'created': sum(result['status'] == 'created' for result in results),
+        'conflicts': sum(result['status'] == 'conflict' for result in results),
+        'failed': sum(result['status'] == 'failed' for result in results),
+        'results': results
+    }
+
+    """
+    Each chunk is committed on its own: the results list every patient, 'created' ones are committed, 'failed' ones
+    (chunk still racing a concurrent request after BULK_INSERT_ATTEMPTS) are simply resent, they come back as
+    'conflict' if they were created after all.
+    """
+
+
 # Update new patient - uses existing PatientUpdate model for validation
 @app.patch('/update_patient/{patient_id}',
         response_model=PatientDB,
@@ -120,6 +253,7 @@ def update_patient(patient_id: str,
         if value is not None:
             setattr(update_patient, field, value)         # equivalent to     "existng_patient_dict[key] = val"
 
+    update_patient.version = PatientDB.version + 1         # type: ignore      # incremented by the UPDATE itself: concurrent updates never share a version
     session.add(update_patient)
     session.commit()
     session.refresh(update_patient)
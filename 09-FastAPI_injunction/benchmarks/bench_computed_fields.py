@@ -0,0 +1,61 @@
+"""
+Microbenchmark of the memoized (@cached_property) computed fields of Patient & UserInputFeatures
+against the same models with plain, re-evaluated on every read, computed fields.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.benchmarks.bench_computed_fields
+"""
+import timeit
+from typing import Any, Callable, Dict, Type
+from pydantic import BaseModel, computed_field
+from ..models import Patient, UserInputFeatures              # type: ignore
+from ..utils import extract_model_features                  # type: ignore
+
+PATIENT: Dict[str, Any] = {'id': 'P007', 'name': 'James Bond', 'city': 'London', 'age': 40, 'gender': 'male', 'height': 1.83, 'weight': 85}
+USER_INPUT: Dict[str, Any] = {'age': 40, 'height': 1.83, 'weight': 85, 'income_lpa': 12.5, 'smoker': True, 'city': 'Pune', 'occupation': 'private_job'}
+
+
+def uncached(model_cls: Type[BaseModel]) -> Type[BaseModel]:
+
+    # same model, each computed field re-declared as a plain property around the cached_property's function
+    namespace: Dict[str, Any] = {name: computed_field(property(info.wrapped_property.func))         # type: ignore
+                                 for name, info in model_cls.__pydantic_computed_fields__.items()}
+    return type(f'Uncached{model_cls.__name__}', (model_cls,), namespace)
+
+
+def bench(label: str, run: Callable[[], Any], number: int = 20_000) -> float:
+
+    secs: float = min(timeit.repeat(run, number=number, repeat=5)) / number
+    print(f'  {label:<40} {secs * 1e6:8.2f} us')
+    return secs
+
+
+def main() -> None:
+
+    uncached_patient = uncached(Patient)
+    uncached_user_input = uncached(UserInputFeatures)
+
+    patient = Patient(**PATIENT)
+    assert uncached_patient(**PATIENT).model_dump() == patient.model_dump(), 'Memoized Patient fields differ'
+    user_input = UserInputFeatures(**USER_INPUT)
+    assert extract_model_features(uncached_user_input(**USER_INPUT)) == extract_model_features(user_input), 'Memoized UserInputFeatures fields differ'
+
+    print('9-3 / 9-4 write path: Patient(...) + model_dump(exclude={"id"})')
+    before: float = bench('plain computed fields', lambda: uncached_patient(**PATIENT).model_dump(exclude={'id'}))
+    after: float = bench('memoized computed fields', lambda: Patient(**PATIENT).model_dump(exclude={'id'}))
+    print(f'  {"speed-up":<40} {before / after:8.2f}x')
+
+    print('/predict payload: extract_model_features(UserInputFeatures(...))')
+    before = bench('plain computed fields', lambda: extract_model_features(uncached_user_input(**USER_INPUT)))
+    after = bench('memoized computed fields', lambda: extract_model_features(UserInputFeatures(**USER_INPUT)))
+    print(f'  {"speed-up":<40} {before / after:8.2f}x')
+
+    print('Repeated reads on 1 instance: model_dump() x 3')
+    uncached_instance = uncached_user_input(**USER_INPUT)
+    before = bench('plain computed fields', lambda: [uncached_instance.model_dump() for _ in range(3)])
+    after = bench('memoized computed fields', lambda: [user_input.model_dump() for _ in range(3)])
+    print(f'  {"speed-up":<40} {before / after:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Latency benchmark of FastScorer against the DataFrame based predict_output(), parity is checked by tests/test_fast_scoring.py.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.benchmarks.bench_fast_path
+"""
+import timeit
+import pandas as pd
+from pathlib import Path
+from typing import Any, Dict, List
+from ..utils import load_model, predict_output              # type: ignore
+from ..utils.fast_scoring import build_fast_scorer          # type: ignore
+from ..utils.feature_engineering import derive_model_features       # type: ignore
+
+csv_file_path: Path = Path(__file__).parent.parent / 'health_insurance.csv'
+
+
+def load_feature_rows() -> List[Dict[str, Any]]:
+
+    # no validation: the csv holds the occupations the model was trained on,
+    # which differ from the ones listed in user_input_literals.yaml
+    return derive_model_features(pd.read_csv(csv_file_path)).to_dict(orient='records')
+
+
+def main() -> None:
+    
+    sk_model = load_model()
+    fast_scorer = build_fast_scorer(sk_model)
+    assert fast_scorer is not None, 'Pipeline layout not supported by the fast path'
+
+    data_dicts: List[Dict[str, Any]] = load_feature_rows()
+
+    rounds: int = 5
+    dataframe_secs: float = min(timeit.repeat(lambda: [predict_output(d, sk_model) for d in data_dicts], number=1, repeat=rounds))
+    fast_secs: float = min(timeit.repeat(lambda: [fast_scorer.predict(d) for d in data_dicts], number=1, repeat=rounds))
+
+    print(f'DataFrame path : {dataframe_secs / len(data_dicts) * 1e6:8.1f} us/row')
+    print(f'Fast path      : {fast_secs / len(data_dicts) * 1e6:8.1f} us/row')
+    print(f'Speed-up       : {dataframe_secs / fast_secs:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
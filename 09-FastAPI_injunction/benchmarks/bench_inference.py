@@ -0,0 +1,276 @@
+"""
+Latency / throughput benchmark of the 9-5-model_prediction.py app, driven in-process through its ASGI interface
+(no network, no uvicorn) with UserInputFeatures payloads sampled from health_insurance.csv.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.benchmarks.bench_inference
+    python -m 09-FastAPI_injunction.benchmarks.bench_inference --modes single concurrent --requests 2000 --compare baseline.json
+
+Modes:
+    • single      -> one /predict request at a time
+    • concurrent  -> '--concurrency' /predict requests in flight at once (exercises micro-batching & the executor)
+    • batch       -> /predict/batch with '--batch-size' rows per request
+    • stages      -> no HTTP: validation, feature derivation & predict timed separately on the same payloads
+
+Results (+ the config & library versions of the run) are written to benchmarks/results/<timestamp>.json,
+'--compare' prints the p50 / p95 / p99 change against an earlier result file.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import platform
+import argparse
+import importlib
+import subprocess
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from importlib.metadata import version as package_version
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Tuple
+import httpx
+from ..models import UserInputFeatures                       # type: ignore
+from ..utils import extract_model_features, load_model, predict_output     # type: ignore
+from ..utils.reference_data import reference_data          # type: ignore
+
+csv_file_path: Path = Path(__file__).parent.parent / 'health_insurance.csv'
+results_dir_path: Path = Path(__file__).parent / 'results'
+
+# every sampled payload repeats, so by default the prediction cache is off to time the model, not the cache
+os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+
+APP_CONFIG_ENV: List[str] = ['PREDICTION_CACHE_SIZE', 'PREDICT_BATCHING_ENABLED', 'PREDICT_BATCH_WINDOW_MS', 'PREDICT_MAX_BATCH_SIZE',
+                             'INFERENCE_EXECUTOR_MODE', 'INFERENCE_WORKERS', 'COMPILED_MODEL_ENABLED', 'MODEL_MMAP_MODE',
+                             'INSTRUMENTATION_ENABLED']
+PACKAGES: List[str] = ['fastapi', 'starlette', 'pydantic', 'scikit-learn', 'numpy', 'pandas', 'httpx']
+MODES: List[str] = ['single', 'concurrent', 'batch', 'stages']
+
+
+def load_payloads(n_payloads: int, seed: int, occupations: List[str]) -> List[Dict[str, Any]]:
+
+    # only rows the API accepts: the csv also holds occupations missing from user_input_literals.yaml
+    rows: List[Dict[str, Any]] = [row for row in pd.read_csv(csv_file_path).to_dict(orient='records')
+                                  if row['occupation'] in occupations]
+    rng = random.Random(seed)
+
+    return [{'age': int(row['age']),
+             'height': float(row['height']),
+             'weight': float(row['weight']),
+             'income_lpa': float(row['income_lpa']),
+             'smoker': bool(row['smoker']),
+             'city': row['city'],
+             'occupation': row['occupation']} for row in rng.choices(rows, k=n_payloads)]
+
+
+def latency_summary(latencies_secs: List[float], wall_secs: float, n_items: int) -> Dict[str, Any]:
+
+    latencies_ms: np.ndarray = np.asarray(latencies_secs) * 1e3
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]).tolist()
+
+    return {
+        'requests': len(latencies_secs),
+        'items': n_items,
+        'throughput_per_sec': n_items / wall_secs if wall_secs else None,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'max_ms': float(latencies_ms.max())
+    }
+
+
+async def timed_post(client: httpx.AsyncClient, url: str, payload: Any) -> float:
+
+    started_at: float = time.perf_counter()
+    response: httpx.Response = await client.post(url, json=payload)
+    elapsed: float = time.perf_counter() - started_at
+
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} answered {response.status_code}: {response.text[:200]}')
+
+    return elapsed
+
+
+async def run_single(client: httpx.AsyncClient, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+
+    started_at: float = time.perf_counter()
+    latencies: List[float] = [await timed_post(client, '/predict', payload) for payload in payloads]
+    return latency_summary(latencies, time.perf_counter() - started_at, len(payloads))
+
+
+async def run_concurrent(client: httpx.AsyncClient, payloads: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_post(payload: Dict[str, Any]) -> float:
+        async with semaphore:
+            return await timed_post(client, '/predict', payload)
+
+    started_at: float = time.perf_counter()
+    latencies: List[float] = await asyncio.gather(*(bounded_post(payload) for payload in payloads))
+    summary: Dict[str, Any] = latency_summary(latencies, time.perf_counter() - started_at, len(payloads))
+    summary['concurrency'] = concurrency
+    return summary
+
+
+async def run_batch(client: httpx.AsyncClient, payloads: List[Dict[str, Any]], batch_size: int) -> Dict[str, Any]:
+
+    batches: List[List[Dict[str, Any]]] = [payloads[start:start + batch_size] for start in range(0, len(payloads), batch_size)]
+
+    started_at: float = time.perf_counter()
+    latencies: List[float] = [await timed_post(client, '/predict/batch', batch) for batch in batches]
+    summary: Dict[str, Any] = latency_summary(latencies, time.perf_counter() - started_at, len(payloads))
+    summary['batch_size'] = batch_size
+    return summary
+
+
+def time_stage(stage_fn: Callable[[Any], Any], inputs: List[Any]) -> Tuple[List[Any], Dict[str, Any]]:
+
+    outputs: List[Any] = []
+    latencies: List[float] = []
+
+    for stage_input in inputs:
+        started_at: float = time.perf_counter()
+        outputs.append(stage_fn(stage_input))
+        latencies.append(time.perf_counter() - started_at)
+
+    return outputs, latency_summary(latencies, sum(latencies), len(inputs))
+
+
+def run_stages(app_module: ModuleType, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+
+    handle = app_module.current_model()
+
+    user_inputs, validation = time_stage(UserInputFeatures.model_validate, payloads)
+    data_dicts, features = time_stage(extract_model_features, user_inputs)
+
+    stages: Dict[str, Any] = {'validation': validation, 'feature_derivation': features}
+
+    if handle.fast_scorer is not None:
+        _, stages['predict'] = time_stage(handle.fast_scorer.predict, data_dicts)
+        stages['predict']['scorer'] = type(handle.fast_scorer).__name__
+
+    # a compiled-only handle has no pipeline in memory, load it to time the sklearn path anyway
+    sk_model = handle.model if handle.model is not None else load_model(handle.source_path)
+    _, stages['predict_sklearn'] = time_stage(lambda data_dict: predict_output(data_dict, sk_model), data_dicts)
+    return stages
+
+
+def run_metadata(app_module: ModuleType, args: argparse.Namespace) -> Dict[str, Any]:
+
+    try:
+        commit: str | None = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'finished_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': {package: package_version(package) for package in PACKAGES},
+        'model': app_module.model_registry.info(),
+        'app_config': {name: os.getenv(name) for name in APP_CONFIG_ENV},
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+
+    print(f"\nvs {baseline['metadata'].get('git_commit')} ({baseline['metadata']['finished_at']}):")
+
+    for mode, summary in current['results'].items():
+        # 'stages' holds one summary per stage, the other modes are a single summary
+        for name, stats in (summary.items() if mode == 'stages' else [(None, summary)]):
+            previous: Dict[str, Any] | None = baseline['results'].get(mode)
+            previous = previous.get(name) if previous is not None and name is not None else previous
+
+            if previous is None:
+                continue
+
+            changes: str = ' | '.join(f"{key} {(stats[key] - previous[key]) / previous[key]:+7.1%}"
+                                      for key in ('p50_ms', 'p95_ms', 'p99_ms') if previous.get(key))
+            print(f"  {mode + (f'.{name}' if name else ''):<30} {changes}")
+
+
+def print_summary(label: str, summary: Dict[str, Any]) -> None:
+    print(f"  {label:<30} p50 {summary['p50_ms']:8.3f} ms | p95 {summary['p95_ms']:8.3f} ms | "
+          f"p99 {summary['p99_ms']:8.3f} ms | {summary['throughput_per_sec']:>10,.0f} items/sec")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+
+    app_module: ModuleType = importlib.import_module('..9-5-model_prediction', __package__)
+
+    payloads: List[Dict[str, Any]] = load_payloads(args.requests, args.seed, list(reference_data.current().occupations))
+    results: Dict[str, Any] = {}
+
+    # lifespan_context() runs the app's startup / shutdown (model load, executor, batcher) like uvicorn would
+    async with app_module.app.router.lifespan_context(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for payload in payloads[:args.warmup]:
+                await timed_post(client, '/predict', payload)
+
+            if 'single' in args.modes:
+                results['single'] = await run_single(client, payloads)
+
+            if 'concurrent' in args.modes:
+                results['concurrent'] = await run_concurrent(client, payloads, args.concurrency)
+
+            if 'batch' in args.modes:
+                results['batch'] = await run_batch(client, payloads, args.batch_size)
+
+        if 'stages' in args.modes:
+            results['stages'] = run_stages(app_module, payloads)
+
+        metadata: Dict[str, Any] = run_metadata(app_module, args)
+
+    return {'metadata': metadata, 'results': results}
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Benchmark /predict & /predict/batch of 9-5-model_prediction.py in-process')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--requests', type=int, default=1000, help='payloads per mode')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, default=None, help='defaults to benchmarks/results/<timestamp>.json')
+    parser.add_argument('--compare', type=Path, default=None, help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = asyncio.run(run(args))
+
+    print(f"\nModel {report['metadata']['model']['version']} ({report['metadata']['model']['scorer']}), {args.requests} payloads per mode:")
+
+    for mode, summary in report['results'].items():
+        if mode == 'stages':
+            for stage, stats in summary.items():
+                print_summary(f'stages.{stage}', stats)
+        else:
+            print_summary(mode, summary)
+
+    output_path: Path = args.output or results_dir_path / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output_path, 'w') as output_file:
+        json.dump(report, output_file, indent=4)
+
+    print(f'\nResults written to {output_path}')
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            compare_results(report, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+CRUD throughput of the 9-6 SQLite database: SQLite's defaults (rollback journal, synchronous=FULL) against the engine
+settings of utils/database.py (WAL, synchronous=NORMAL, cache, mmap, busy_timeout), each on a fresh database file.
+
+Every operation runs the same statements as the 9-6 route (ex: create = existence SELECT + INSERT + COMMIT + refresh),
+split over '--threads' threads sharing the engine's pool. '--mixed' adds a phase where 1 thread updates while the others read.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.benchmarks.bench_sqlite_engine --patients 2000 --threads 4
+"""
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, select
+from ..models.patient_models import PatientDB                          # type: ignore
+from ..utils.database import DatabaseSettings, create_db_engine       # type: ignore
+
+
+def patient_id_for(index: int) -> str:
+    return f'P{index:07d}'
+
+
+def create(session: Session, index: int) -> None:
+
+    patient_id: str = patient_id_for(index)
+
+    if session.exec(select(PatientDB).where(PatientDB.patient_id == patient_id)).first() is None:
+        patient: PatientDB = PatientDB(patient_id=patient_id, name=f'Patient {index}', city='Pune', age=30,
+                                       gender='male', height=1.7, weight=70.0)
+        session.add(patient)
+        session.commit()
+        session.refresh(patient)
+
+
+def read(session: Session, index: int) -> None:
+    session.exec(select(PatientDB).where(PatientDB.patient_id == patient_id_for(index))).first()
+
+
+def update(session: Session, index: int) -> None:
+
+    patient: PatientDB | None = session.exec(select(PatientDB).where(PatientDB.patient_id == patient_id_for(index))).first()
+
+    if patient is not None:
+        patient.weight += 1
+        patient.version = PatientDB.version + 1          # type: ignore
+        session.add(patient)
+        session.commit()
+        session.refresh(patient)
+
+
+def delete(session: Session, index: int) -> None:
+
+    patient: PatientDB | None = session.exec(select(PatientDB).where(PatientDB.patient_id == patient_id_for(index))).first()
+
+    if patient is not None:
+        session.delete(patient)
+        session.commit()
+
+
+def run_threads(engine: Engine, operation: Callable[[Session, int], None], indexes: List[List[int]]) -> float:
+
+    # 1 Session per operation, like 1 request of the app. Returns the seconds until every thread is done
+    def work(thread_indexes: List[int]) -> None:
+        for index in thread_indexes:
+            with Session(engine) as session:
+                operation(session, index)
+
+    threads: List[threading.Thread] = [threading.Thread(target=work, args=(thread_indexes,)) for thread_indexes in indexes]
+    started_at: float = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - started_at
+
+
+def bench(settings: DatabaseSettings, n_patients: int, n_threads: int, mixed: bool) -> Dict[str, float]:
+
+    # returns operations / second per phase
+    engine: Engine = create_db_engine(settings)
+    SQLModel.metadata.create_all(engine)
+
+    split: List[List[int]] = [list(range(thread, n_patients, n_threads)) for thread in range(n_threads)]
+    throughput: Dict[str, float] = {}
+
+    for phase, operation in (('create', create), ('read', read), ('update', update)):
+        throughput[phase] = n_patients / run_threads(engine, operation, split)
+
+    if mixed and n_threads > 1:
+        # 1 writer updating every patient while the other threads keep reading them: reads / second
+        readers_done = threading.Event()
+        reads: List[int] = [0] * (n_threads - 1)
+
+        def read_until_done(reader: int) -> None:
+            while not readers_done.is_set():
+                with Session(engine) as session:
+                    read(session, reads[reader] % n_patients)
+                reads[reader] += 1
+
+        readers: List[threading.Thread] = [threading.Thread(target=read_until_done, args=(reader,)) for reader in range(n_threads - 1)]
+
+        for reader_thread in readers:
+            reader_thread.start()
+
+        mixed_secs: float = run_threads(engine, update, [list(range(n_patients))])
+        readers_done.set()
+
+        for reader_thread in readers:
+            reader_thread.join()
+
+        throughput['mixed writes'] = n_patients / mixed_secs
+        throughput['mixed reads'] = sum(reads) / mixed_secs
+
+    throughput['delete'] = n_patients / run_threads(engine, delete, split)
+    engine.dispose()
+    return throughput
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='9-6 CRUD throughput: SQLite defaults vs utils/database.py engine settings')
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--mixed', action=argparse.BooleanOptionalAction, default=True)
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # echo off in both: only the pragmas differ
+        for name, pragmas_enabled in (('sqlite defaults', False), ('tuned', True)):
+            settings: DatabaseSettings = DatabaseSettings(url=f'sqlite:///{Path(tmp_dir) / name.replace(" ", "_")}.db',
+                                                          echo=False,
+                                                          sqlite_pragmas=pragmas_enabled)
+            results[name] = bench(settings, args.patients, args.threads, args.mixed)
+
+    print(f'{args.patients} patients, {args.threads} threads, operations / second')
+    print(f'{"phase":>14} {"defaults":>10} {"tuned":>10} {"speed-up":>9}')
+
+    for phase, default_ops in results['sqlite defaults'].items():
+        tuned_ops: float = results['tuned'][phase]
+        print(f'{phase:>14} {default_ops:>10.0f} {tuned_ops:>10.0f} {tuned_ops / default_ops:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup cost of the patient store: patient_data.json (json.load + Patient validation) against the binary snapshot,
+at several dataset sizes.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.benchmarks.bench_store_load --sizes 1000 10000 100000 300000
+"""
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from ..utils.patient_snapshot import read_snapshot, validate_records, write_snapshot        # type: ignore
+from ..utils.load_update_data import write_json_atomic                                      # type: ignore
+
+CITIES: List[str] = ['Mumbai', 'Delhi', 'Pune', 'Guwahati', 'Kolkata', 'Jaipur', 'Indore']
+
+
+def make_patients(n_patients: int, seed: int = 42) -> Dict[str, Dict[str, Any]]:
+
+    rng = random.Random(seed)
+    raw_patients: Dict[str, Dict[str, Any]] = {
+        f'P{index:07d}': {'name': f'Patient {index}',
+                          'city': rng.choice(CITIES),
+                          'age': rng.randint(1, 119),
+                          'gender': rng.choice(['male', 'female', 'others']),
+                          'height': round(rng.uniform(1.2, 2.1), 2),
+                          'weight': round(rng.uniform(30, 150), 1)}
+        for index in range(n_patients)
+    }
+    return validate_records(raw_patients)
+
+
+def best_of(run: Callable[[], Any], repeat: int) -> float:
+
+    timings: List[float] = []
+
+    for _ in range(repeat):
+        started_at: float = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started_at)
+
+    return min(timings)
+
+
+def load_json(json_path: Path) -> Dict[str, Dict[str, Any]]:
+
+    with open(json_path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Patient store load time: json + validation vs binary snapshot')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"patients":>10} {"json MB":>8} {"pickle MB":>9} {"json.load":>10} {"+validate":>10} {"snapshot":>10} {"speed-up":>9}')
+
+    for n_patients in args.sizes:
+        patients: Dict[str, Dict[str, Any]] = make_patients(n_patients)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path: Path = Path(tmp_dir) / 'patient_data.json'
+            write_snapshot(json_path, patients, write_json_atomic(json_path, patients))
+
+            assert read_snapshot(json_path) == validate_records(load_json(json_path)), 'Snapshot differs from the json'
+
+            parse_secs: float = best_of(lambda: load_json(json_path), args.repeat)
+            json_secs: float = best_of(lambda: validate_records(load_json(json_path)), args.repeat)      # the store's json path
+            snapshot_secs: float = best_of(lambda: read_snapshot(json_path), args.repeat)
+
+            json_mb: float = json_path.stat().st_size / 2**20
+            snapshot_mb: float = json_path.with_suffix('.snapshot.pickle').stat().st_size / 2**20
+
+        print(f'{n_patients:>10} {json_mb:>8.1f} {snapshot_mb:>9.1f} {parse_secs * 1e3:>8.1f}ms {json_secs * 1e3:>8.1f}ms '
+              f'{snapshot_secs * 1e3:>8.1f}ms {json_secs / snapshot_secs:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
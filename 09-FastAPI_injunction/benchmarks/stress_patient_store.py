@@ -0,0 +1,143 @@
+"""
+Stress check of the patient store with several worker processes writing the same files concurrently.
+
+Every process (x threads) does read-modify-write increments of 1 shared patient through get_versioned() +
+put(expected_version=), creates its own patients & races the other processes to create the same ids.
+A small compaction threshold makes compactions happen in the middle of it. The run fails if any update is lost,
+any id is created twice, or a worker ever reads an older version than one it already saw.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.benchmarks.stress_patient_store --mode journal --processes 4 --increments 300
+
+tests/test_patient_store.py runs a scaled-down journal-mode run with every 'pytest'; this script is for large runs.
+
+'--mode snapshot' (flushes merge other processes' patients, but no cross-process compare-and-set) shows the lost
+updates the journal mode prevents.
+"""
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing as mp
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from ..utils.patient_store import PatientStore              # type: ignore
+from ..utils.load_update_data import write_json_atomic      # type: ignore
+
+COUNTER_ID: str = 'P-COUNTER'
+PATIENT: Dict[str, Any] = {'name': 'Stress Test', 'city': 'Pune', 'age': 30, 'gender': 'male', 'height': 1.7, 'weight': 0,
+                           'bmi': 0.0, 'verdict': 'Underweight'}
+
+
+def run_worker(json_path: Path, mode: str, compact_records: int, worker: int, threads: int,
+               increments: int, creates: int, race_ids: int, results: 'mp.Queue[Tuple[int, int, int, int]]') -> None:
+
+    store: PatientStore = PatientStore(json_path, mode=mode, compact_records=compact_records)
+    store.load()
+
+    retries: List[int] = [0] * threads
+    race_wins: List[int] = [0] * threads
+    stale_reads: List[int] = [0] * threads
+
+    def work(thread: int) -> None:
+
+        last_version: int = 0
+
+        for i in range(increments):
+            while True:
+                patient, version = store.get_versioned(COUNTER_ID)
+                assert patient is not None
+
+                if version < last_version:
+                    stale_reads[thread] += 1
+                last_version = version
+
+                if store.put(COUNTER_ID, {**patient, 'weight': patient['weight'] + 1}, expected_version=version):
+                    break
+                retries[thread] += 1
+
+            if i < creates:
+                store.create(f'W{worker}-T{thread}-{i}', PATIENT)
+
+            if i < race_ids:
+                race_wins[thread] += store.create(f'RACE-{i}', PATIENT)
+
+    pool: List[threading.Thread] = [threading.Thread(target=work, args=(thread,)) for thread in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    store.flush()
+    results.put((worker, sum(retries), sum(race_wins), sum(stale_reads)))
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Concurrent writers on 1 patient store, checks that no update is lost')
+    parser.add_argument('--mode', choices=['journal', 'snapshot'], default='journal')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=2, help='threads per process')
+    parser.add_argument('--increments', type=int, default=200, help='increments of the shared patient per thread')
+    parser.add_argument('--creates', type=int, default=50, help='own patients created per thread')
+    parser.add_argument('--race-ids', type=int, default=50, help='ids every thread tries to create')
+    parser.add_argument('--compact-records', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path: Path = Path(tmp_dir) / 'patient_data.json'
+        write_json_atomic(json_path, {COUNTER_ID: PATIENT})
+
+        results: 'mp.Queue[Tuple[int, int, int, int]]' = mp.Queue()
+        workers: List[mp.Process] = [mp.Process(target=run_worker,
+                                                args=(json_path, args.mode, args.compact_records, worker, args.threads,
+                                                      args.increments, args.creates, args.race_ids, results))
+                                     for worker in range(args.processes)]
+
+        started_at: float = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        outcomes: List[Tuple[int, int, int, int]] = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed: float = time.perf_counter() - started_at
+
+        # what a freshly started worker sees
+        final: PatientStore = PatientStore(json_path, mode=args.mode)
+        final.load()
+        patients: Dict[str, Dict[str, Any]] = final.all()
+
+    writers: int = args.processes * args.threads
+    expected_weight: int = writers * args.increments
+    expected_creates: int = writers * min(args.creates, args.increments)
+    expected_race_ids: int = min(args.race_ids, args.increments)
+
+    lost_updates: int = expected_weight - patients[COUNTER_ID]['weight']
+    missing_creates: int = expected_creates - sum(patient_id.startswith('W') for patient_id in patients)
+    race_wins: int = sum(outcome[2] for outcome in outcomes)
+    stale_reads: int = sum(outcome[3] for outcome in outcomes)
+
+    print(f'{args.mode} mode: {writers} writers ({args.processes} processes x {args.threads} threads) in {elapsed:.2f}s')
+    print(f'  increments   : {patients[COUNTER_ID]["weight"]} / {expected_weight} '
+          f'({sum(outcome[1] for outcome in outcomes)} version conflicts retried)')
+    print(f'  own creates  : {expected_creates - missing_creates} / {expected_creates}')
+    print(f'  raced creates: {race_wins} winners for {expected_race_ids} ids')
+    print(f'  stale reads  : {stale_reads}')
+
+    failures: List[str] = []
+    if lost_updates:
+        failures.append(f'{lost_updates} lost updates')
+    if missing_creates:
+        failures.append(f'{missing_creates} lost creates')
+    if race_wins != expected_race_ids:
+        failures.append(f'{race_wins} successful creates for {expected_race_ids} raced ids')
+    if stale_reads:
+        failures.append(f'{stale_reads} reads went back in time')
+
+    if failures:
+        raise SystemExit(f'FAILED: {", ".join(failures)}')
+    print('OK: no update lost')
+
+
+if __name__ == '__main__':
+    main()
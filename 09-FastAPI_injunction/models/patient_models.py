@@ -1,21 +1,52 @@
-from pathlib import Path
-from typing import Annotated, Literal, Optional, List
-from box import ConfigBox
+from functools import cached_property
+from typing import Annotated, Any, ClassVar, Dict, Iterator, Literal, Optional, Tuple
 from pydantic import BaseModel, computed_field, Field, field_validator
 from fastapi import HTTPException, status
-from ..utils.load_update_data import read_yaml
+from ..utils.reference_data import ReferenceIndex, reference_data     # user_input_literals.yaml compiled into hash lookups
 from sqlmodel import SQLModel, Field as DBField
 from typing_extensions import Self
 
-user_constants: ConfigBox = read_yaml(Path(__file__).parent.parent / 'user_input_literals.yaml')
 
-gender_list: List[str] = user_constants.gender
-occupations_list: List[str] = user_constants.occupations
-tier_1_cities: List[str] = user_constants.tier_1_cities
-tier_2_cities: List[str] = user_constants.tier_2_cities
+class MemoizedComputedModel(BaseModel):
+   """
+   Base for models whose computed fields are @cached_property: each one is evaluated once per instance
+   (by the 1st read, model_dump() or another computed field) & stored in the instance __dict__.
+   '_computed_dependencies' maps a field to the cached computed fields derived from it, assigning that field drops them.
+   """
+   _computed_dependencies: ClassVar[Dict[str, Tuple[str, ...]]] = {}
 
+   def __setattr__(self, name: str, value: Any) -> None:
+      super().__setattr__(name, value)
+      self._drop_cached(self._computed_dependencies.get(name, ()))
 
-class CommonModel(BaseModel):
+   def __iter__(self) -> Iterator[Tuple[str, Any]]:
+      # cached values live in __dict__ next to the fields, keep dict(model) limited to the fields like before
+      for name, value in super().__iter__():
+         if name not in self.__pydantic_computed_fields__:
+            yield name, value
+
+   def model_copy(self, *, update: Dict[str, Any] | None = None, deep: bool = False) -> Self:
+      # the copy starts with this instance's __dict__ (cache included) & 'update' is written straight into it, bypassing __setattr__
+      copied: Self = super().model_copy(update=update, deep=deep)
+
+      if update:
+         copied._drop_cached(tuple(cached for field in update for cached in self._computed_dependencies.get(field, ())))
+
+      return copied
+
+   def __getstate__(self) -> Dict[Any, Any]:
+      # pickled with its fields only: the unpickled instance recomputes e.g. city_tier from the reference data it's loaded with
+      state: Dict[Any, Any] = super().__getstate__()
+      state['__dict__'] = {name: value for name, value in state['__dict__'].items()
+                           if name not in self.__pydantic_computed_fields__}
+      return state
+
+   def _drop_cached(self, cached_names: Tuple[str, ...]) -> None:
+      for cached_name in cached_names:
+         self.__dict__.pop(cached_name, None)
+
+
+class CommonModel(MemoizedComputedModel):
    height: Annotated[float, Field(...,
                                  gt=0,
                                  description='Height of the patient in meters')]
@@ -23,11 +54,16 @@ class CommonModel(BaseModel):
                                 gt=0,
                                 description='Weight of the patient in kgs')]
    
-   @computed_field
+   _computed_dependencies = {'height': ('bmi', 'verdict'),
+                             'weight': ('bmi', 'verdict')}
+
+   @computed_field                      # type: ignore[prop-decorator]
+   @cached_property
    def bmi(self) -> float:
     return round(self.weight / (self.height ** 2), 2)
    
-   @computed_field               
+   @computed_field                      # type: ignore[prop-decorator]
+   @cached_property
    def verdict(self) -> str:
 
     if self.bmi < 18.5:                   # type: ignore
@@ -80,15 +116,18 @@ class PatientUpdate(BaseModel):
    @field_validator('gender')
    @classmethod
    def validate_gender(cls, value: str) -> str:
-      if value not in gender_list:
-        #  raise ValueError(f'Gender must be one of {gender_list}')             # ValueError generates 422 Unprocessable Entity
+      literals: ReferenceIndex = reference_data.current()
+      gender: str | None = literals.canonical_gender(value)
+
+      if gender is None:
+        #  raise ValueError(f'Gender must be one of {literals.genders}')             # ValueError generates 422 Unprocessable Entity
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f'Invalid gender, has to be from the list: {occupations_list}')
+                            detail=f'Invalid gender, has to be from the list: {list(literals.genders)}')
       
-      return value
+      return gender
 
 
-class UserInputFeatures(BaseModel):
+class UserInputFeatures(MemoizedComputedModel):
    age: Annotated[int, Field(default=None,
                             gt=0,
                             lt=120)]
@@ -117,19 +156,30 @@ class UserInputFeatures(BaseModel):
    @field_validator('occupation')
    @classmethod
    def validate_occupation(cls, value: str) -> str:
-      if value not in occupations_list:
-        #  raise ValueError(f'Occupations list has to be from {occupations_list}')        # ValueError generates 422 Unprocessable Entity
+      literals: ReferenceIndex = reference_data.current()
+      occupation: str | None = literals.canonical_occupation(value)
+
+      if occupation is None:
+        #  raise ValueError(f'Occupations list has to be from {literals.occupations}')        # ValueError generates 422 Unprocessable Entity
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f'Invalid occupation, has to be from the list: {occupations_list}')
+                            detail=f'Invalid occupation, has to be from the list: {list(literals.occupations)}')
       
-      return value
+      return occupation            # spelled as in the yaml, ex: 'Private_Job' -> 'private_job'
 
 
-   @computed_field
+   _computed_dependencies = {'height': ('bmi', 'lifestyle_risk'),
+                             'weight': ('bmi', 'lifestyle_risk'),
+                             'smoker': ('lifestyle_risk',),
+                             'city': ('city_tier',),
+                             'age': ('age_group',)}
+
+   @computed_field                      # type: ignore[prop-decorator]
+   @cached_property
    def bmi(self) -> float:
       return round(self.weight/(self.height**2), 2)   
    
-   @computed_field
+   @computed_field                      # type: ignore[prop-decorator]
+   @cached_property
    def lifestyle_risk(self) -> str:
       
       if self.smoker and self.bmi > 30:
@@ -141,20 +191,15 @@ class UserInputFeatures(BaseModel):
       else:
          return 'low'
       
-   @computed_field
+   @computed_field                      # type: ignore[prop-decorator]
+   @cached_property
    def city_tier(self) -> int:
-      
-      if self.city in tier_1_cities:
-         return 1
-      
-      elif self.city in tier_2_cities:
-         return 2
-      
-      else:
-         return 3
+      # 1 for tier_1_cities, 2 for tier_2_cities, else 3: one dict lookup instead of scanning both lists
+      return reference_data.current().city_tier(self.city)
       
 
-   @computed_field
+   @computed_field                      # type: ignore[prop-decorator]
+   @cached_property
    def age_group(self) -> str:
       
       if self.age < 25:
@@ -173,6 +218,7 @@ class UserInputFeatures(BaseModel):
 # for working with SQLModel & DB
 class PatientDB(SQLModel, table=True):
    __tablename__='patients'
+   __table_args__={'sqlite_autoincrement': True}     # a deleted patient's 'id' is never reused: 'id' + 'version' identify 1 revision of 1 row
 
    # NOTE: 
    # 1- SQLModel sometimes struggles to detect the primary_key=True flag when it's buried inside Annotated combined with Optional in older versions or specific configurations.
@@ -188,6 +234,8 @@ class PatientDB(SQLModel, table=True):
    gender: str
    height: float
    weight: float
+   version: int = DBField(default=1,
+                          sa_column_kwargs={'server_default': '1'})     # +1 on every update, ETag of GET /patients/{patient_id} (9-6)
 
    @classmethod
    def from_patient(cls, patient: Patient) -> Self:      # Self denotes 'PatientDB' return type
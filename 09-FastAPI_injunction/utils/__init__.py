@@ -1,3 +1,3 @@
-from .load_update_data import load_patient_data, update_data_to_json, load_model, read_yaml
+from .load_update_data import load_patient_data, update_data_to_json, write_json_atomic, load_model, read_yaml
 
-from .score_prediction import predict_output
\ No newline at end of file
+from .score_prediction import predict_output, predict_output_batch, predict_output_isolated, extract_model_features, MODEL_FEATURES
@@ -0,0 +1,199 @@
+"""
+Offline batch scorer for large CSV files shaped like health_insurance.csv.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.utils.batch_score_csv portfolio.csv scored.csv --workers 4 --chunk-size 50000
+
+The input is streamed in chunks, every chunk is scored in a worker process & appended to the output in input order,
+so memory stays bounded by (workers x 2) chunks whatever the file size.
+Progress is checkpointed in '<output>.progress.json', re-run with --resume to continue an interrupted run.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import pandas as pd
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+from fastapi import HTTPException
+from pydantic import ValidationError
+from ..models import UserInputFeatures                   # type: ignore
+from .model_registry import ModelHandle, ModelRegistry
+from .score_prediction import extract_model_features, predict_output_isolated
+from .feature_engineering import RAW_FEATURES, derive_model_features
+
+# per worker process state, filled once by _init_worker()
+_worker_model: ModelHandle | None = None
+_skip_validation: bool = False
+
+
+def _init_worker(version: str, model_path: str, mtime_ns: int, skip_validation: bool) -> None:
+    global _worker_model, _skip_validation
+    _worker_model = ModelRegistry().load_version(version, Path(model_path), mtime_ns)
+    _skip_validation = skip_validation
+
+
+def derive_chunk_features(chunk: pd.DataFrame,
+                          errors: List[str | None]) -> Tuple[List[int], List[Dict[str, Any]]]:
+
+    if _skip_validation:
+        # trusted input (ex: the training csv, whose occupations differ from user_input_literals.yaml):
+        # features are derived column-wise for the whole chunk, no Pydantic obj per row
+        return list(range(len(chunk))), derive_model_features(chunk).to_dict(orient='records')
+
+    positions: List[int] = []
+    data_dicts: List[Dict[str, Any]] = []
+
+    for position, row in enumerate(chunk[list(RAW_FEATURES)].to_dict(orient='records')):
+        try:
+            data_dicts.append(extract_model_features(UserInputFeatures.model_validate(row)))
+            positions.append(position)
+
+        except ValidationError as err:
+            errors[position] = '; '.join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in err.errors())
+
+        except HTTPException as err:          # raised by the 'occupation' validator
+            errors[position] = str(err.detail)
+
+    return positions, data_dicts
+
+
+def score_chunk(chunk: pd.DataFrame) -> str:
+
+    predictions: List[Any] = [None] * len(chunk)
+    errors: List[str | None] = [None] * len(chunk)
+    positions, data_dicts = derive_chunk_features(chunk, errors)
+
+    results: List[str | Exception] = predict_output_isolated(data_dicts, _worker_model.model, _worker_model.fast_scorer)     # type: ignore
+
+    for position, result in zip(positions, results):
+        if isinstance(result, Exception):
+            errors[position] = str(result)
+        else:
+            predictions[position] = result
+
+    scored: pd.DataFrame = chunk.assign(predicted_insurance_premium=predictions, error=errors)
+    return scored.to_csv(index=False, header=False)
+
+
+def read_progress(progress_path: Path) -> Dict[str, Any]:
+    with open(progress_path) as progress_file:
+        return json.load(progress_file)
+
+
+def write_progress(progress_path: Path, progress: Dict[str, Any]) -> None:
+
+    # write + rename, a crash never leaves a half written checkpoint
+    temp_path: Path = progress_path.with_name(f'{progress_path.name}.tmp')
+
+    with open(temp_path, 'w') as progress_file:
+        json.dump(progress, progress_file)
+
+    os.replace(temp_path, progress_path)
+
+
+def run(input_path: Path,
+        output_path: Path,
+        workers: int,
+        chunk_size: int,
+        resume: bool,
+        skip_validation: bool) -> None:
+
+    progress_path: Path = output_path.with_name(f'{output_path.name}.progress.json')
+    version, model_path, mtime_ns = ModelRegistry().latest_version()
+
+    rows_done: int = 0
+    output_bytes: int = 0
+
+    if resume and progress_path.exists():
+        progress: Dict[str, Any] = read_progress(progress_path)
+
+        if progress['input'] != str(input_path.resolve()):
+            raise SystemExit(f"{progress_path} belongs to another input file: {progress['input']}")
+
+        if progress['model_version'] != version:
+            print(f"Warning: resuming a run started with model {progress['model_version']}, now scoring with {version}")
+
+        rows_done, output_bytes = progress['rows_done'], progress['output_bytes']
+        print(f'Resuming after {rows_done} rows')
+
+    if not output_path.exists():
+        rows_done, output_bytes = 0, 0
+
+    # drop anything written after the last checkpoint (ex: a chunk that was being appended when the run died)
+    with open(output_path, 'r+b' if output_bytes else 'wb') as output_file:
+        output_file.truncate(output_bytes)
+
+    chunks = pd.read_csv(input_path,
+                         chunksize=chunk_size,
+                         skiprows=range(1, rows_done + 1))        # keep the header row, skip the rows already scored
+
+    started_at: float = time.perf_counter()
+    rows_this_run: int = 0
+    in_flight: Deque[Tuple[Future[str], int]] = deque()
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker,
+                             initargs=(version, str(model_path), mtime_ns, skip_validation)) as executor, \
+         open(output_path, 'ab') as output_file:
+
+        if output_bytes == 0:
+            header: str = pd.DataFrame(columns=[*pd.read_csv(input_path, nrows=0).columns, 'predicted_insurance_premium', 'error']).to_csv(index=False)
+            output_bytes += output_file.write(header.encode())
+
+        def write_oldest() -> None:
+            nonlocal rows_done, output_bytes, rows_this_run
+
+            future, n_rows = in_flight.popleft()
+            output_bytes += output_file.write(future.result().encode())      # results are written in input order
+            output_file.flush()
+            os.fsync(output_file.fileno())
+
+            rows_done += n_rows
+            rows_this_run += n_rows
+            write_progress(progress_path, {
+                'input': str(input_path.resolve()),
+                'model_version': version,
+                'rows_done': rows_done,
+                'output_bytes': output_bytes
+            })
+
+            elapsed: float = time.perf_counter() - started_at
+            print(f'{rows_done:>12,} rows scored | {rows_this_run / elapsed:>10,.0f} rows/sec', file=sys.stderr)
+
+        for chunk in chunks:
+            in_flight.append((executor.submit(score_chunk, chunk), len(chunk)))
+
+            # back-pressure: at most 2 chunks per worker are held in memory
+            if len(in_flight) >= workers * 2:
+                write_oldest()
+
+        while in_flight:
+            write_oldest()
+
+    elapsed = time.perf_counter() - started_at
+    print(f'Done: {rows_this_run:,} rows in {elapsed:.1f}s ({rows_this_run / elapsed if elapsed else 0:,.0f} rows/sec) -> {output_path}')
+    progress_path.unlink(missing_ok=True)
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Score a large CSV file with the insurance premium model')
+    parser.add_argument('input', type=Path)
+    parser.add_argument('output', type=Path)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    parser.add_argument('--resume', action='store_true', help="continue from '<output>.progress.json'")
+    parser.add_argument('--skip-validation', action='store_true', help='trust the input, skip the UserInputFeatures validators')
+    args = parser.parse_args()
+
+    run(args.input, args.output, args.workers, args.chunk_size, args.resume, args.skip_validation)
+
+
+if __name__ == '__main__':
+    main()
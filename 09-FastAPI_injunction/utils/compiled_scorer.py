@@ -0,0 +1,153 @@
+import json
+import numpy as np
+from pathlib import Path
+from numpy.typing import NDArray
+from typing import Any, Dict, List
+
+# NOTE: numpy + stdlib only, this module must stay importable without pandas / scikit-learn
+COMPILED_FORMAT_VERSION: int = 1
+
+
+class CompiledScorer:
+    """
+    Scores data_dicts with a fitted 'preprocessor -> classifier' pipeline exported by utils/export_compiled_model.py
+    into a single .npz file: the one-hot layout as JSON metadata, plus the random forest's nodes
+    (or the linear model's coefficients) as plain NumPy arrays.
+    Same interface as FastScorer, so /predict can use either.
+    """
+
+    def __init__(self, metadata: Dict[str, Any], arrays: Dict[str, NDArray[Any]]) -> None:
+
+        if metadata.get('format_version') != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format {metadata.get('format_version')!r}")
+
+        self.metadata = metadata
+        self.n_columns: int = metadata['n_columns']
+        self.estimator_kind: str = metadata['estimator']
+        self.classes: NDArray[Any] = np.array(metadata['classes'], dtype=object)
+        self.ignore_unknown = frozenset(metadata['ignore_unknown'])
+        self.numeric_columns: Dict[str, int] = metadata['numeric_columns']
+
+        # JSON turns every key into a str, rebuild {category: column} with the category's original type (ex: city_tier ints)
+        self.one_hot_columns: Dict[str, Dict[Any, int]] = {
+            feature: dict(zip(encoding['categories'], encoding['columns']))
+            for feature, encoding in metadata['one_hot_columns'].items()
+        }
+
+        if self.estimator_kind == 'forest':
+            self.children_left = arrays['children_left']
+            self.children_right = arrays['children_right']
+            self.feature = arrays['feature']
+            self.threshold = arrays['threshold']
+            self.value = arrays['value']                    # (n_nodes, n_classes) class fractions of every node
+            self.roots = arrays['roots']                    # index of each tree's root node, in estimator order
+            self.max_depth: int = metadata['max_depth']
+
+        elif self.estimator_kind == 'linear':
+            self.coef = arrays['coef']
+            self.intercept = arrays['intercept']
+
+        else:
+            raise ValueError(f'Unsupported compiled estimator {self.estimator_kind!r}')
+
+
+    @classmethod
+    def load(cls, artifact_path: Path) -> 'CompiledScorer':
+
+        with np.load(artifact_path, allow_pickle=False) as npz_file:
+            arrays: Dict[str, NDArray[Any]] = {key: npz_file[key] for key in npz_file.files}
+
+        return cls(json.loads(str(arrays.pop('metadata'))), arrays)
+
+
+    def transform_many(self, data_dicts: List[Dict[str, Any]]) -> NDArray[np.float64]:
+
+        matrix: NDArray[np.float64] = np.zeros((len(data_dicts), self.n_columns), dtype=np.float64)
+
+        for row, data_dict in enumerate(data_dicts):
+            for feature, categories in self.one_hot_columns.items():
+                column: int | None = categories.get(data_dict[feature])
+
+                if column is not None:
+                    matrix[row, column] = 1.0
+
+                elif feature not in self.ignore_unknown:
+                    raise ValueError(f'Found unknown categories [{data_dict[feature]!r}] in column {feature!r} during transform')
+
+            for feature, column in self.numeric_columns.items():
+                matrix[row, column] = data_dict[feature]
+
+        return matrix
+
+
+    def scores_matrix(self, matrix: NDArray[np.float64]) -> NDArray[np.float64]:
+
+        # linear: decision_function(), i.e. X @ coef.T + intercept
+        if self.estimator_kind == 'linear':
+            return matrix @ self.coef.T + self.intercept
+
+        # forest: predict_proba()
+        # sklearn casts X to float32 before walking the trees, comparisons are then done against float64 thresholds
+        features: NDArray[np.float32] = matrix.astype(np.float32)
+        rows: NDArray[np.intp] = np.arange(matrix.shape[0])[:, None]
+
+        # walk every tree for every row at once: (n_rows, n_trees) node ids, leaves point to themselves
+        nodes: NDArray[np.intp] = np.broadcast_to(self.roots, (matrix.shape[0], self.roots.shape[0])).copy()
+
+        for _ in range(self.max_depth):
+            go_left: NDArray[np.bool_] = features[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+
+        # RandomForestClassifier adds the trees' probabilities one after the other (estimator order) then divides,
+        # cumsum along the tree axis is the same sequential sum, which keeps the result bit-for-bit identical
+        proba: NDArray[np.float64] = np.cumsum(self.value[nodes], axis=1)[:, -1, :]
+        proba /= self.roots.shape[0]
+        return proba
+
+
+    def predict_matrix(self, matrix: NDArray[np.float64]) -> NDArray[Any]:
+
+        scores: NDArray[np.float64] = self.scores_matrix(matrix)
+
+        if scores.shape[1] == 1:                      # binary linear model: a single decision column
+            return self.classes.take((scores[:, 0] > 0).astype(np.intp))
+
+        return self.classes.take(np.argmax(scores, axis=1))
+
+
+    def predict(self, data_dict: Dict[str, Any]) -> str:
+        return self.predict_matrix(self.transform_many([data_dict]))[0]
+
+
+    def predict_many(self, data_dicts: List[Dict[str, Any]]) -> List[str]:
+        return self.predict_matrix(self.transform_many(data_dicts)).tolist()
+
+
+    def predict_isolated(self, data_dicts: List[Dict[str, Any]]) -> List[str | Exception]:
+
+        results: List[str | Exception] = [None] * len(data_dicts)       # type: ignore
+        positions: List[int] = []
+        rows: List[NDArray[np.float64]] = []
+
+        for position, data_dict in enumerate(data_dicts):
+            try:
+                rows.append(self.transform_many([data_dict])[0])
+                positions.append(position)
+
+            except (KeyError, TypeError, ValueError) as ex:
+                results[position] = ex
+
+        if rows:
+            for position, prediction in zip(positions, self.predict_matrix(np.vstack(rows)).tolist()):
+                results[position] = prediction
+
+        return results
+
+
+"""
+    • Tree layout: all trees are concatenated into flat arrays, a node's children are absolute indices into them.
+      Leaves get themselves as both children (& threshold +inf), so after 'max_depth' steps every row sits on a leaf
+      without any per-row branching in Python.
+
+    • value[nodes] has shape (n_rows, n_trees, n_classes): the class fractions of the leaf each row reached in each tree.
+"""
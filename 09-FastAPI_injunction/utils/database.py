@@ -0,0 +1,89 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import create_engine
+
+JOURNAL_MODES: Tuple[str, ...] = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES: Tuple[str, ...] = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    # defaults read from the environment, pass fields explicitly to override them (ex: benchmarks/bench_sqlite_engine.py)
+    url: str = os.getenv('DATABASE_URL', 'sqlite:///patient_database.db')
+    echo: bool = os.getenv('DATABASE_ECHO', 'false').lower() == 'true'             # log every SQL statement
+
+    # connections kept open / opened on top under load / seconds a request waits for one
+    pool_size: int = int(os.getenv('DATABASE_POOL_SIZE', '5'))
+    max_overflow: int = int(os.getenv('DATABASE_MAX_OVERFLOW', '10'))
+    pool_timeout: float = float(os.getenv('DATABASE_POOL_TIMEOUT', '30'))
+
+    # 'false': SQLite's own defaults (rollback journal, synchronous=FULL, 2 MB cache, no mmap)
+    sqlite_pragmas: bool = os.getenv('SQLITE_PRAGMAS_ENABLED', 'true').lower() == 'true'
+    journal_mode: str = os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper()
+    synchronous: str = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()          # NORMAL is durable in WAL mode except on power loss
+    cache_size_kib: int = int(os.getenv('SQLITE_CACHE_SIZE_KIB', '65536'))
+    mmap_size_bytes: int = int(os.getenv('SQLITE_MMAP_SIZE_BYTES', str(256 * 2**20)))
+    busy_timeout_ms: int = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+    def __post_init__(self) -> None:
+
+        # the pragma values are formatted into SQL, only accept the documented ones
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f'Invalid SQLite journal mode {self.journal_mode!r}, select from {JOURNAL_MODES}')
+
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f'Invalid SQLite synchronous mode {self.synchronous!r}, select from {SYNCHRONOUS_MODES}')
+
+    @property
+    def is_sqlite(self) -> bool:
+        return make_url(self.url).get_backend_name() == 'sqlite'
+
+    def pragmas(self) -> Dict[str, str | int]:
+        return {'journal_mode': self.journal_mode,
+                'synchronous': self.synchronous,
+                'cache_size': -self.cache_size_kib,            # negative = KiB, positive would be pages
+                'mmap_size': self.mmap_size_bytes,
+                'busy_timeout': self.busy_timeout_ms}
+
+
+def create_db_engine(settings: DatabaseSettings | None = None) -> Engine:
+
+    settings = settings or DatabaseSettings()
+    engine_kwargs: Dict[str, Any] = {'echo': settings.echo}
+
+    # in-memory SQLite uses a single-connection pool that takes no sizing
+    if make_url(settings.url).database not in (None, '', ':memory:'):
+        engine_kwargs.update(pool_size=settings.pool_size,
+                             max_overflow=settings.max_overflow,
+                             pool_timeout=settings.pool_timeout)
+
+    engine: Engine = create_engine(settings.url, **engine_kwargs)
+
+    if settings.is_sqlite and settings.sqlite_pragmas:
+        pragmas: Dict[str, str | int] = settings.pragmas()
+
+        # SQLite pragmas (except journal_mode=WAL) only last for the connection, set them on every new pooled one
+        @event.listens_for(engine, 'connect')
+        def apply_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+            cursor = dbapi_connection.cursor()
+
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+
+            cursor.close()
+
+    return engine
+
+
+"""
+    • WAL: readers don't block the writer & the writer doesn't block readers, a commit appends to the -wal file instead of
+      rewriting pages through a rollback journal. With synchronous=NORMAL it's fsynced at checkpoints, not every commit.
+
+    • busy_timeout: how long a connection waits for a lock held by another one before 'database is locked',
+      explicit & configurable here (the sqlite3 module's own default is 5 s).
+
+    • DATABASE_ECHO used to be always on (echo=True): logging every statement costs more than many of the queries here.
+"""
@@ -0,0 +1,167 @@
+"""
+Export the fitted insurance pipeline into a NumPy-only artifact read by utils/compiled_scorer.py.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.utils.export_compiled_model
+
+The artifact is written next to the .joblib file (same name, '.npz' suffix) & is only kept
+if it reproduces the pipeline's predictions bit-for-bit on every row of health_insurance.csv.
+"""
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from numpy.typing import NDArray
+from typing import Any, Dict, List, Tuple
+from sklearn.base import BaseEstimator
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model._base import LinearClassifierMixin
+from sklearn.pipeline import Pipeline
+from .load_update_data import load_model, model_file_path
+from .fast_scoring import build_fast_scorer
+from .score_prediction import MODEL_FEATURES
+from .feature_engineering import derive_model_features
+from .compiled_scorer import COMPILED_FORMAT_VERSION, CompiledScorer
+
+csv_file_path: Path = Path(__file__).parent.parent / 'health_insurance.csv'
+
+
+def compile_forest(forest: RandomForestClassifier) -> Tuple[Dict[str, Any], Dict[str, NDArray[Any]]]:
+
+    if forest.n_outputs_ != 1:
+        raise ValueError('Only single output forests can be compiled')
+
+    children_left: List[NDArray[np.intp]] = []
+    children_right: List[NDArray[np.intp]] = []
+    features: List[NDArray[np.intp]] = []
+    thresholds: List[NDArray[np.float64]] = []
+    values: List[NDArray[np.float64]] = []
+    roots: List[int] = []
+    offset: int = 0
+
+    for tree in forest.estimators_:
+        tree_ = tree.tree_
+        is_leaf: NDArray[np.bool_] = tree_.children_left == -1
+        node_ids: NDArray[np.intp] = np.arange(offset, offset + tree_.node_count)
+
+        # leaves point to themselves & always 'go left', so extra traversal steps keep a row on its leaf
+        children_left.append(np.where(is_leaf, node_ids, tree_.children_left + offset))
+        children_right.append(np.where(is_leaf, node_ids, tree_.children_right + offset))
+        features.append(np.where(is_leaf, 0, tree_.feature).astype(np.intp))
+        thresholds.append(np.where(is_leaf, np.inf, tree_.threshold))
+        values.append(tree_.value[:, 0, :tree.n_classes_])        # what DecisionTreeClassifier.predict_proba() returns
+
+        roots.append(offset)
+        offset += tree_.node_count
+
+    metadata: Dict[str, Any] = {
+        'estimator': 'forest',
+        'max_depth': max(tree.tree_.max_depth for tree in forest.estimators_)
+    }
+    arrays: Dict[str, NDArray[Any]] = {
+        'children_left': np.concatenate(children_left).astype(np.intp),
+        'children_right': np.concatenate(children_right).astype(np.intp),
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.intp)
+    }
+    return metadata, arrays
+
+
+def compile_pipeline(pipeline: BaseEstimator) -> Tuple[Dict[str, Any], Dict[str, NDArray[Any]]]:
+
+    fast_scorer = build_fast_scorer(pipeline)
+
+    if fast_scorer is None:
+        raise ValueError("Only a fitted 'preprocessor (ColumnTransformer) -> classifier' pipeline can be compiled")
+
+    layout, estimator = fast_scorer.layout, fast_scorer.estimator
+
+    if isinstance(estimator, RandomForestClassifier):
+        metadata, arrays = compile_forest(estimator)
+
+    elif isinstance(estimator, LinearClassifierMixin) and hasattr(estimator, 'coef_'):
+        metadata = {'estimator': 'linear'}
+        arrays = {'coef': np.asarray(estimator.coef_, dtype=np.float64),
+                  'intercept': np.asarray(estimator.intercept_, dtype=np.float64)}
+
+    else:
+        raise ValueError(f'Unsupported estimator {type(estimator).__name__}, only random forests & linear classifiers can be compiled')
+
+    metadata.update({
+        'format_version': COMPILED_FORMAT_VERSION,
+        'features': list(MODEL_FEATURES),
+        'n_columns': layout.n_columns,
+        'classes': estimator.classes_.tolist(),          # type: ignore
+        'numeric_columns': layout.numeric_columns,
+        'ignore_unknown': sorted(layout.ignore_unknown),
+        'one_hot_columns': {feature: {'categories': list(categories.keys()), 'columns': list(categories.values())}
+                            for feature, categories in layout.one_hot_columns.items()}
+    })
+    return metadata, arrays
+
+
+def check_parity(pipeline: Pipeline, scorer: CompiledScorer, csv_path: Path = csv_file_path) -> None:
+
+    # no validation: the csv holds the occupations the model was trained on
+    input_df: pd.DataFrame = derive_model_features(pd.read_csv(csv_path))
+    data_dicts: List[Dict[str, Any]] = input_df.to_dict(orient='records')
+    matrix: NDArray[np.float64] = scorer.transform_many(data_dicts)
+
+    if scorer.estimator_kind == 'forest':
+        expected_scores: NDArray[np.float64] = pipeline.predict_proba(input_df)
+    else:
+        expected_scores = np.asarray(pipeline.decision_function(input_df)).reshape(len(data_dicts), -1)
+
+    checks: Dict[str, bool] = {
+        'encoded features': np.array_equal(np.asarray(pipeline[:-1].transform(input_df), dtype=np.float64), matrix),
+        'scores': np.array_equal(expected_scores, scorer.scores_matrix(matrix)),          # exact equality, not np.allclose
+        'predictions': np.array_equal(pipeline.predict(input_df), scorer.predict_matrix(matrix))
+    }
+    failed: List[str] = [check for check, passed in checks.items() if not passed]
+
+    if failed:
+        raise ValueError(f'Compiled model is not bit-for-bit identical to the pipeline on {csv_path.name}: {failed} differ')
+
+    print(f'Parity OK on {len(data_dicts)} rows of {csv_path.name}')
+
+
+def export_compiled_model(model_path: Path = model_file_path,
+                          output_path: Path | None = None,
+                          csv_path: Path = csv_file_path) -> Path:
+
+    output_path = output_path or model_path.with_suffix('.npz')
+    temp_path: Path = output_path.with_name(f'.{output_path.stem}.tmp.npz')
+
+    pipeline = load_model(model_path)
+    metadata, arrays = compile_pipeline(pipeline)
+    np.savez(temp_path, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    try:
+        check_parity(pipeline, CompiledScorer.load(temp_path), csv_path)
+
+    except Exception:
+        temp_path.unlink(missing_ok=True)          # never leave a non-identical artifact behind
+        raise
+
+    os.replace(temp_path, output_path)
+    print(f'Compiled model written to {output_path}')
+    return output_path
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Compile the fitted sklearn pipeline into a NumPy-only artifact')
+    parser.add_argument('--model', type=Path, default=model_file_path)
+    parser.add_argument('--output', type=Path, default=None)
+    parser.add_argument('--csv', type=Path, default=csv_file_path, help='rows used for the parity check')
+    args = parser.parse_args()
+
+    export_compiled_model(args.model, args.output, args.csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import numpy as np
+from numpy.typing import NDArray
+from typing import Any, Dict, List, Set
+from sklearn.base import BaseEstimator
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+
+class FeatureLayout:
+    """
+    Column layout of the fitted 'preprocessor' step, resolved once from the pipeline so that a
+    data_dict can be written straight into the NumPy row the 'classifier' step expects.
+    """
+
+    def __init__(self,
+                 n_columns: int,
+                 one_hot_columns: Dict[str, Dict[Any, int]],
+                 numeric_columns: Dict[str, int],
+                 ignore_unknown: Set[str]) -> None:
+
+        self.n_columns = n_columns
+        self.one_hot_columns = one_hot_columns          # feature -> {category: output column}
+        self.numeric_columns = numeric_columns          # feature -> output column
+        self.ignore_unknown = ignore_unknown            # features whose encoder had handle_unknown='ignore'
+
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor: ColumnTransformer) -> 'FeatureLayout':
+
+        one_hot_columns: Dict[str, Dict[Any, int]] = {}
+        numeric_columns: Dict[str, int] = {}
+        ignore_unknown: Set[str] = set()
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop':
+                continue
+
+            start: int = preprocessor.output_indices_[name].start
+
+            if isinstance(transformer, OneHotEncoder):
+                if transformer.drop_idx_ is not None or transformer._infrequent_enabled:
+                    raise ValueError(f'Unsupported OneHotEncoder settings in transformer {name!r}')
+
+                for column, categories in zip(columns, transformer.categories_):
+                    one_hot_columns[column] = {category: start + position
+                                               for position, category in enumerate(categories.tolist())}
+                    start += len(categories)
+
+                    if transformer.handle_unknown != 'error':
+                        ignore_unknown.add(column)
+
+            # a fitted 'passthrough' is stored as an identity FunctionTransformer
+            elif transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer) and transformer.func is None):
+                for position, column in enumerate(columns):
+                    numeric_columns[column] = start + position
+
+            else:
+                raise ValueError(f'Unsupported transformer {name!r}: {transformer!r}')
+
+        n_columns: int = sum(output_slice.stop - output_slice.start
+                             for output_slice in preprocessor.output_indices_.values())
+
+        return cls(n_columns, one_hot_columns, numeric_columns, ignore_unknown)
+
+
+    def transform_many(self, data_dicts: List[Dict[str, Any]]) -> NDArray[np.float64]:
+
+        matrix: NDArray[np.float64] = np.zeros((len(data_dicts), self.n_columns), dtype=np.float64)
+
+        for row, data_dict in enumerate(data_dicts):
+            for feature, categories in self.one_hot_columns.items():
+                column: int | None = categories.get(data_dict[feature])
+
+                if column is not None:
+                    matrix[row, column] = 1.0
+
+                elif feature not in self.ignore_unknown:      # same contract as OneHotEncoder(handle_unknown='error')
+                    raise ValueError(f'Found unknown categories [{data_dict[feature]!r}] in column {feature!r} during transform')
+
+            for feature, column in self.numeric_columns.items():
+                matrix[row, column] = data_dict[feature]
+
+        return matrix
+
+
+    def transform(self, data_dict: Dict[str, Any]) -> NDArray[np.float64]:
+        return self.transform_many([data_dict])
+
+
+class FastScorer:
+    """Scores data_dicts by skipping the DataFrame + ColumnTransformer and calling the final estimator directly."""
+
+    def __init__(self, layout: FeatureLayout, estimator: BaseEstimator) -> None:
+        self.layout = layout
+        self.estimator = estimator
+
+
+    def predict(self, data_dict: Dict[str, Any]) -> str:
+        return self.estimator.predict(self.layout.transform(data_dict))[0]         # type: ignore
+
+
+    def predict_many(self, data_dicts: List[Dict[str, Any]]) -> List[str]:
+        return self.estimator.predict(self.layout.transform_many(data_dicts)).tolist()   # type: ignore
+
+
+    def predict_isolated(self, data_dicts: List[Dict[str, Any]]) -> List[str | Exception]:
+
+        # encode row by row (cheap) so a bad row only fails itself, then still score the good rows in one predict() call
+        results: List[str | Exception] = [None] * len(data_dicts)       # type: ignore
+        positions: List[int] = []
+        rows: List[NDArray[np.float64]] = []
+
+        for position, data_dict in enumerate(data_dicts):
+            try:
+                rows.append(self.layout.transform(data_dict)[0])
+                positions.append(position)
+
+            except (KeyError, TypeError, ValueError) as ex:
+                results[position] = ex
+
+        if rows:
+            for position, prediction in zip(positions, self.estimator.predict(np.vstack(rows)).tolist()):   # type: ignore
+                results[position] = prediction
+
+        return results
+
+
+def build_fast_scorer(sk_model: BaseEstimator | None) -> FastScorer | None:
+
+    # only the 'preprocessor -> classifier' shape trained in notebooks_exp/ is understood, anything else keeps using predict_output()
+    if not isinstance(sk_model, Pipeline) or len(sk_model.steps) != 2:
+        return None
+
+    preprocessor, estimator = sk_model.steps[0][1], sk_model.steps[1][1]
+
+    if not isinstance(preprocessor, ColumnTransformer):
+        return None
+
+    try:
+        return FastScorer(FeatureLayout.from_preprocessor(preprocessor), estimator)
+
+    except ValueError as err:
+        print(f'Fast scoring path disabled: {err}')
+        return None
+
+
+"""
+    • The fitted ColumnTransformer always writes 'cat' (one-hot) columns first & 'num' (passthrough) columns after,
+      `output_indices_` tells where each transformer's block starts, so every category maps to 1 fixed column.
+
+    • FastScorer.predict(...) therefore builds a (1, n_columns) float array with a few dict lookups,
+      instead of pd.DataFrame([data_dict]) -> column checks -> OneHotEncoder.transform -> np.hstack.
+
+    • The classifier receives the exact same matrix the pipeline would have built, so predictions are identical,
+      tests/test_fast_scoring.py checks parity over health_insurance.csv, benchmarks/bench_fast_path.py measures the latency gain.
+"""
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, Series
+from numpy.typing import NDArray
+from typing import Any, List, Tuple
+from .score_prediction import MODEL_FEATURES
+from .reference_data import DEFAULT_CITY_TIER, normalize_key, reference_data
+
+# raw columns UserInputFeatures needs to compute the model features
+RAW_FEATURES: Tuple[str, ...] = ('age', 'height', 'weight', 'income_lpa', 'smoker', 'city', 'occupation')
+
+
+def derive_bmi(height: Series, weight: Series) -> NDArray[np.float64]:
+
+    raw_bmi: NDArray[np.float64] = (weight.to_numpy(dtype=np.float64) / height.to_numpy(dtype=np.float64) ** 2)
+
+    # Python's round() rounds the exact binary value (ex: 2.675 -> 2.67), np.round() scales by 100 first & can land
+    # on the other side of the .5 (2.68), which would flip 'lifestyle_risk' at the 27 / 30 thresholds, so keep round() here
+    return np.fromiter((round(value, 2) for value in raw_bmi.tolist()), dtype=np.float64, count=raw_bmi.shape[0])
+
+
+def derive_lifestyle_risk(smoker: Series, bmi: NDArray[np.float64]) -> NDArray[Any]:
+
+    is_smoker: NDArray[np.bool_] = smoker.to_numpy(dtype=bool)
+
+    return np.select([is_smoker & (bmi > 30), is_smoker & (bmi > 27)],
+                     ['high', 'medium'],
+                     default='low').astype(object)
+
+
+def normalize_city(city: Series) -> Series:
+    return city.astype(str).str.strip().str.title()          # same as UserInputFeatures.normalize_city_name()
+
+
+def normalize_occupation(occupation: Series) -> Series:
+
+    # same as UserInputFeatures.validate_occupation() for the yaml's occupations (ex: ' Private_Job ' -> 'private_job'),
+    # any other value is passed through unchanged: no validation here (ex: health_insurance.csv's 'government_job')
+    keys: Series = occupation.map(lambda value: normalize_key(value) if isinstance(value, str) else value)
+    canonical: Series = keys.map(reference_data.current().occupation_lookup)
+    return canonical.where(canonical.notna(), occupation)
+
+
+def derive_city_tier(city: Series) -> NDArray[np.int64]:
+
+    # same city -> tier map as UserInputFeatures.city_tier, keyed on the normalized name
+    city_keys: Series = city.str.strip().str.casefold()
+    return city_keys.map(reference_data.current().city_tiers).fillna(DEFAULT_CITY_TIER).to_numpy(dtype=np.int64)
+
+
+def derive_age_group(age: Series) -> NDArray[Any]:
+
+    ages: NDArray[np.float64] = age.to_numpy(dtype=np.float64)
+
+    if np.isnan(ages).any():
+        raise ValueError("'age' is required to derive 'age_group', found missing values")
+
+    return np.select([ages < 25, ages < 45, ages < 60],
+                     ['young', 'adult', 'middle_aged'],
+                     default='senior').astype(object)
+
+
+def derive_model_features(raw_df: DataFrame) -> DataFrame:
+    """
+    Column-wise version of UserInputFeatures' computed fields: one pass over whole columns instead of one
+    Pydantic obj per row. Takes the raw columns of RAW_FEATURES (ex: a chunk of health_insurance.csv) &
+    returns a DataFrame with the MODEL_FEATURES columns, in that order, ready for sk_model.predict().
+
+    No validation happens here, rows must already be valid (ex: trusted files, or rows checked upstream).
+    """
+    missing: List[str] = [column for column in RAW_FEATURES if column not in raw_df.columns]
+
+    if missing:
+        raise ValueError(f'Missing columns to derive the model features: {missing}')
+
+    bmi: NDArray[np.float64] = derive_bmi(raw_df['height'], raw_df['weight'])
+
+    features_df: DataFrame = pd.DataFrame({
+        'income_lpa': raw_df['income_lpa'].to_numpy(dtype=np.float64),
+        'occupation': normalize_occupation(raw_df['occupation']).to_numpy(dtype=object),
+        'bmi': bmi,
+        'lifestyle_risk': derive_lifestyle_risk(raw_df['smoker'], bmi),
+        'city_tier': derive_city_tier(normalize_city(raw_df['city'])),
+        'age_group': derive_age_group(raw_df['age'])
+    }, index=raw_df.index)
+
+    return features_df[list(MODEL_FEATURES)]
+
+
+"""
+    • Every rule mirrors a @computed_field of UserInputFeatures in models/patient_models.py:
+            bmi             -> round(weight / height**2, 2)
+            lifestyle_risk  -> smoker & bmi > 30: 'high', smoker & bmi > 27: 'medium', else 'low'   (on the rounded bmi)
+            city_tier       -> 1 / 2 / 3 from the reference data's city -> tier map, after strip().title()
+            age_group       -> < 25 'young', < 45 'adult', < 60 'middle_aged', else 'senior'
+      & the 'occupation' validator: the yaml's spelling, matched after strip().casefold()
+      A change to one of them has to be made in both places, then re-run tests/test_feature_parity.py:
+            python -m pytest tests/test_feature_parity.py
+
+    • np.select() picks the 1st matching condition per row, i.e. the same order as the if / elif chains.
+
+    • notebooks_exp/feature_engg_ml_model.ipynb trained the bundled model with slightly different rules
+      (unrounded bmi, 'smoker OR bmi > 27' for 'medium'), retraining with derive_model_features() removes that skew.
+"""
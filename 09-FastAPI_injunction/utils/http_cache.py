@@ -0,0 +1,63 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Mapping
+from fastapi import Response, status
+
+# clients may keep the body but revalidate it (If-None-Match) on every poll
+CACHE_CONTROL: str = 'no-cache'
+
+
+def strong_etag(*parts: object) -> str:
+    return '"' + '-'.join(str(part) for part in parts) + '"'
+
+
+def file_etag(path: Path) -> str:
+
+    # changes with every rewrite of the file: write_json_atomic() replaces it (new inode, mtime). Raises FileNotFoundError
+    file_stat = os.stat(path)
+    return strong_etag(f'{file_stat.st_ino:x}', f'{file_stat.st_mtime_ns:x}', f'{file_stat.st_size:x}')
+
+
+def content_etag(encoded: bytes) -> str:
+    return strong_etag(hashlib.blake2b(encoded, digest_size=12).hexdigest())
+
+
+def record_etag(record: Mapping[str, Any]) -> str:
+
+    # content hash: the same record gives the same ETag, whatever else changed in the file / across restarts
+    return content_etag(json.dumps(record, sort_keys=True, separators=(',', ':')).encode())
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+
+    # If-None-Match uses the weak comparison: W/"x" matches "x", '*' matches any current representation
+    if if_none_match is None:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    return etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    return {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=etag_headers(etag))
+
+
+"""
+    • The ETag is computed before reading the body: a matching If-None-Match gets its 304 without parsing the file or
+      loading the database row.
+
+    • Read the stat before the data: a response can then carry newer data than its ETag says (the next poll just gets
+      a 200), never older data under a newer ETag (that would be served as 304 for good).
+
+    • The validator lives with the data (file stat, record content, 9-6's 'version' column), never in process memory:
+      every worker & any outside writer see the same ETag for the same data.
+"""
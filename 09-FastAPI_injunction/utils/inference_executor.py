@@ -0,0 +1,101 @@
+import os
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Tuple
+from .score_prediction import predict_output_isolated
+from .model_registry import ModelHandle, load_scorer
+
+if TYPE_CHECKING:
+    from sklearn.base import BaseEstimator
+    from .fast_scoring import FastScorer
+    from .compiled_scorer import CompiledScorer
+
+ExecutorMode = Literal['thread', 'process']
+
+# per worker process state: the model versions loaded in this process, (version, mtime_ns) -> (model, fast scorer)
+_worker_models: OrderedDict[Tuple[str, int], Tuple['BaseEstimator | None', 'FastScorer | CompiledScorer | None']] = OrderedDict()
+WORKER_MODEL_VERSIONS: int = 2          # old + new while a hot swap drains
+
+
+def _load_into_worker(version_key: Tuple[str, int], model_path: str) -> Tuple['BaseEstimator | None', 'FastScorer | CompiledScorer | None']:
+
+    _worker_models[version_key] = load_scorer(Path(model_path))
+
+    while len(_worker_models) > WORKER_MODEL_VERSIONS:
+        _worker_models.popitem(last=False)
+
+    print(f'Model {version_key[0]} loaded into inference worker process {os.getpid()}')
+    return _worker_models[version_key]
+
+
+def _init_process_worker(version_key: Tuple[str, int], model_path: str) -> None:
+    _load_into_worker(version_key, model_path)
+
+
+def _score_in_process(version_key: Tuple[str, int], model_path: str, data_dicts: List[Dict[str, Any]]) -> List[str | Exception]:
+
+    # a new version is loaded the 1st time this worker gets a request for it, i.e. once per worker process
+    loaded: Tuple['BaseEstimator | None', 'FastScorer | CompiledScorer | None'] | None = _worker_models.get(version_key)
+    sk_model, fast_scorer = loaded if loaded is not None else _load_into_worker(version_key, model_path)
+    return predict_output_isolated(data_dicts, sk_model, fast_scorer)
+
+
+class InferenceExecutor:
+    """
+    Dedicated pool for CPU bound scoring so sklearn doesn't compete with the other sync routes on AnyIO's default threadpool.
+
+    • 'thread' mode scores with the in-memory model of the given ModelHandle on its own ThreadPoolExecutor.
+    • 'process' mode loads the model once in every worker process & scores there, spreading the work over CPU cores.
+    """
+
+    def __init__(self,
+                 initial_model: ModelHandle,
+                 mode: ExecutorMode = 'thread',
+                 max_workers: int | None = None) -> None:
+
+        self.mode = mode
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._executor: Executor
+
+        if mode == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='inference')
+
+        elif mode == 'process':
+            # 'spawn' so workers don't inherit the event loop & threads of the uvicorn process
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_process_worker,
+                                                 initargs=((initial_model.version, initial_model.source_mtime_ns),
+                                                           str(initial_model.source_path)))
+
+        else:
+            raise ValueError(f"Invalid inference executor mode {mode!r}, select from ['thread', 'process']")
+
+
+    async def score(self, handle: ModelHandle, data_dicts: List[Dict[str, Any]]) -> List[str | Exception]:
+
+        loop = asyncio.get_running_loop()
+
+        if self.mode == 'thread':
+            return await loop.run_in_executor(self._executor, predict_output_isolated, data_dicts, handle.model, handle.fast_scorer)
+
+        return await loop.run_in_executor(self._executor,
+                                          _score_in_process,
+                                          (handle.version, handle.source_mtime_ns),
+                                          str(handle.source_path),
+                                          data_dicts)
+
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'max_workers': self.max_workers
+        }
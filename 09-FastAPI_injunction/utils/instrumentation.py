@@ -0,0 +1,291 @@
+import os
+import time
+import bisect
+import inspect
+import functools
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, ContextManager, Dict, List, Tuple
+from fastapi import FastAPI, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+# off by default: routes are then plain APIRoutes & stage() is a ContextVar lookup returning a shared no-op
+INSTRUMENTATION_ENABLED: bool = os.getenv('INSTRUMENTATION_ENABLED', 'false').lower() == 'true'
+
+# seconds, Prometheus' default buckets
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# stage name -> seconds spent in it by the current request, None outside an instrumented request
+_request_timings: ContextVar[Dict[str, float] | None] = ContextVar('request_timings', default=None)
+_NO_STAGE: ContextManager[None] = nullcontext()
+
+
+class LatencyHistogram:
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)          # last slot is +Inf
+        self.total: float = 0.0
+        self.count: int = 0
+
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+    def render(self, name: str, labels: str) -> List[str]:
+
+        lines: List[str] = []
+        cumulative: int = 0
+
+        # Prometheus buckets are cumulative: 'le' counts every observation <= the bound
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Per-route request latency & per-(route, stage) latency histograms, rendered in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._requests: Dict[Tuple[str, str, int], LatencyHistogram] = {}        # (method, route, status)
+        self._stages: Dict[Tuple[str, str], LatencyHistogram] = {}               # (route, stage)
+        self._lock = threading.Lock()
+
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, timings: Dict[str, float]) -> None:
+
+        with self._lock:
+            self._requests.setdefault((method, route, status_code), LatencyHistogram()).observe(seconds)
+
+            for stage_name, stage_seconds in timings.items():
+                self._stages.setdefault((route, stage_name), LatencyHistogram()).observe(stage_seconds)
+
+
+    def render(self) -> str:
+
+        lines: List[str] = ['# HELP http_request_duration_seconds Request latency per route',
+                            '# TYPE http_request_duration_seconds histogram']
+
+        with self._lock:
+            for (method, route, status_code), histogram in sorted(self._requests.items()):
+                lines.extend(histogram.render('http_request_duration_seconds',
+                                              f'method="{method}",route="{route}",status="{status_code}"'))
+
+            lines.extend(['# HELP http_request_stage_duration_seconds Time spent in each stage of a request',
+                          '# TYPE http_request_stage_duration_seconds histogram'])
+
+            for (route, stage_name), histogram in sorted(self._stages.items()):
+                lines.extend(histogram.render('http_request_stage_duration_seconds',
+                                              f'route="{route}",stage="{stage_name}"'))
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics_registry: MetricsRegistry = MetricsRegistry()
+
+
+class _Stage:
+
+    __slots__ = ('timings', 'name', 'started_at')
+
+    def __init__(self, timings: Dict[str, float], name: str) -> None:
+        self.timings = timings
+        self.name = name
+
+
+    def __enter__(self) -> None:
+        self.started_at = time.perf_counter()
+
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - self.started_at
+
+
+def stage(name: str) -> ContextManager[None]:
+    """
+    with stage('predict'): ...   adds the block's duration to the current request's 'predict' timing.
+    A no-op outside an instrumented request.
+    """
+    timings: Dict[str, float] | None = _request_timings.get()
+    return _NO_STAGE if timings is None else _Stage(timings, name)
+
+
+def add_stage_time(name: str, seconds: float) -> None:
+
+    timings: Dict[str, float] | None = _request_timings.get()
+
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ', '.join(f'{stage_name};dur={seconds * 1000:.3f}' for stage_name, seconds in timings.items())
+
+
+def _wrap_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+
+    # marks when the endpoint starts & returns: everything before is request validation (body parsing + dependencies),
+    # everything after is response serialization (response_model validation + JSON encoding)
+    if _is_async(endpoint):
+        @functools.wraps(endpoint)
+        async def async_endpoint(*args: Any, **kwargs: Any) -> Any:
+            _mark('endpoint_started_at')
+
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark('endpoint_returned_at')
+
+        return async_endpoint
+
+    @functools.wraps(endpoint)
+    def sync_endpoint(*args: Any, **kwargs: Any) -> Any:
+        _mark('endpoint_started_at')
+
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _mark('endpoint_returned_at')
+
+    return sync_endpoint
+
+
+def _is_async(endpoint: Callable[..., Any]) -> bool:
+    return inspect.iscoroutinefunction(inspect.unwrap(endpoint))
+
+
+def _mark(name: str) -> None:
+
+    timings: Dict[str, float] | None = _request_timings.get()
+
+    if timings is not None:
+        timings[f'_{name}'] = time.perf_counter()
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute recording, for every request: the total latency (per method, route template & status code) &
+    the time spent in each stage, i.e. 'validation', 'serialization' + whatever the endpoint wraps in stage().
+    The stages are also sent back in a 'Server-Timing' header, readable in the browser's devtools.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _wrap_endpoint(endpoint), **kwargs)
+
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+
+        route_handler = super().get_route_handler()
+        route_path: str = self.path_format
+
+        async def instrumented_route_handler(request: Request) -> Response:
+
+            timings: Dict[str, float] = {}
+            token = _request_timings.set(timings)
+            started_at: float = time.perf_counter()
+            status_code: int = 500
+
+            try:
+                response: Response = await route_handler(request)
+                status_code = response.status_code
+
+                finished_at: float = time.perf_counter()
+                endpoint_started_at: float | None = timings.pop('_endpoint_started_at', None)
+                endpoint_returned_at: float | None = timings.pop('_endpoint_returned_at', None)
+
+                if endpoint_started_at is not None and endpoint_returned_at is not None:
+                    timings['validation'] = endpoint_started_at - started_at
+                    timings['serialization'] = finished_at - endpoint_returned_at
+
+                response.headers['Server-Timing'] = server_timing_header({**timings, 'total': finished_at - started_at})
+                return response
+
+            except RequestValidationError:
+                status_code = 422
+                raise
+
+            except Exception as ex:
+                status_code = getattr(ex, 'status_code', 500)            # HTTPException & friends, turned into a response upstream
+                raise
+
+            finally:
+                _request_timings.reset(token)
+                timings = {stage_name: seconds for stage_name, seconds in timings.items() if not stage_name.startswith('_')}
+                metrics_registry.observe_request(request.method, route_path, status_code,
+                                                 time.perf_counter() - started_at, timings)
+
+        return instrumented_route_handler
+
+
+def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(metrics_registry.render(),
+                             media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def instrument_app(app: FastAPI, enabled: bool = INSTRUMENTATION_ENABLED) -> FastAPI:
+    """
+    Call right after creating the app, before any route is declared: only routes declared afterwards are instrumented.
+    Adds GET /metrics (Prometheus text format).
+    """
+    if enabled:
+        app.router.route_class = InstrumentedRoute
+        app.add_route('/metrics', metrics_endpoint, methods=['GET'], include_in_schema=False)
+
+    return app
+
+
+def instrument_engine(engine: Engine, enabled: bool = INSTRUMENTATION_ENABLED) -> Engine:
+    """
+    Adds 'db_query' (every SQL statement) & 'db_commit' (Session.commit(), flush included) stages to the current request.
+    """
+    if not enabled:
+        return engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        add_stage_time('db_query', time.perf_counter() - conn.info['query_started_at'].pop())
+
+    @event.listens_for(Session, 'before_commit')
+    def before_commit(session: Session) -> None:
+        session.info['commit_started_at'] = time.perf_counter()
+
+    @event.listens_for(Session, 'after_commit')
+    def after_commit(session: Session) -> None:
+        started_at: float | None = session.info.pop('commit_started_at', None)
+
+        if started_at is not None:
+            add_stage_time('db_commit', time.perf_counter() - started_at)
+
+    return engine
+
+
+"""
+    • Sync endpoints run on AnyIO's threadpool, which copies the request's contextvars: the thread sees the same
+      'timings' dict, so stage() & the SQLAlchemy events called from that thread still land on the right request.
+
+    • Scrape with Prometheus, or by hand:
+            INSTRUMENTATION_ENABLED=true uvicorn ...
+            curl -s localhost:8000/metrics | grep 'route="/predict"'
+            curl -si -X POST localhost:8000/predict -d '{...}' | grep Server-Timing
+
+    • 'route' is the path template (ex: /patients/{patient_id}), not the raw path, which keeps the number of series bounded.
+"""
@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+from typing import Any, Iterator, TextIO, Tuple
+
+# characters read per chunk: memory stays ~ 1 chunk + the largest single patient, whatever the file size
+JSON_STREAM_CHUNK_CHARS: int = 64 * 1024
+
+_decoder: json.JSONDecoder = json.JSONDecoder()
+_WHITESPACE: str = ' \t\n\r'
+_NUMBER_CHARS: str = '0123456789.eE+-'
+
+
+class _ChunkedText:
+    """Sliding window over a text file: the part already parsed is dropped, the next chunk is read on demand."""
+
+    def __init__(self, text_file: TextIO, chunk_chars: int) -> None:
+        self._file = text_file
+        self._chunk_chars = chunk_chars
+        self.buffer: str = ''
+        self.pos: int = 0
+        self.eof: bool = False
+
+
+    def read_more(self) -> bool:
+
+        if self.eof:
+            return False
+
+        chunk: str = self._file.read(self._chunk_chars)
+
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+
+    def next_char(self) -> str:
+
+        # 1st non-whitespace char, not consumed ('' at the end of the file)
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer) or not self.read_more():
+                return self.buffer[self.pos:self.pos + 1]
+
+
+    def expect(self, expected: str) -> str:
+
+        char: str = self.next_char()
+
+        if not char or char not in expected:          # '' (end of file) is 'in' any str
+            raise json.JSONDecodeError(f'Expecting one of {expected!r}', self.buffer, self.pos)
+
+        self.pos += 1
+        return char
+
+
+    def decode_value(self) -> Any:
+
+        self.next_char()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+
+                # a number cut by the end of the buffer parses as a shorter one (ex: 12|3, 1|.5): only accept
+                # a value followed by a char that can't continue it
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in _NUMBER_CHARS):
+                    self.pos = end
+                    return value
+
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+
+            self.read_more()                # incomplete value: retried with 1 more chunk (or as-is at the end of the file)
+
+
+def iter_json_object(text_file: TextIO, chunk_chars: int = JSON_STREAM_CHUNK_CHARS) -> Iterator[Tuple[str, Any]]:
+
+    # (key, value) pairs of a top-level JSON object, parsed incrementally: 1 value in memory at a time
+    text: _ChunkedText = _ChunkedText(text_file, chunk_chars)
+    text.expect('{')
+
+    if text.next_char() == '}':
+        return
+
+    while True:
+        key: Any = text.decode_value()
+
+        if not isinstance(key, str):
+            raise json.JSONDecodeError('Expecting property name enclosed in double quotes', text.buffer, text.pos)
+
+        text.expect(':')
+        yield key, text.decode_value()
+
+        if text.expect(',}') == '}':
+            return
+
+
+def iter_json_file(json_path: Path, chunk_chars: int = JSON_STREAM_CHUNK_CHARS) -> Iterator[Tuple[str, Any]]:
+
+    with open(json_path, 'r') as json_file:
+        yield from iter_json_object(json_file, chunk_chars)
+
+
+"""
+    • json.load() needs the whole file as 1 string + the whole dict, ~ several times the file size in memory,
+      & nothing can be sent before the last byte is parsed. Here each patient is decoded (raw_decode) as soon as
+      its closing brace is read.
+
+    • Yields the same items as json.load() on valid files, malformed input raises json.JSONDecodeError,
+      possibly after some items were already yielded.
+"""
@@ -1,8 +1,11 @@
+import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import yaml
 import joblib as jb
 from pathlib import Path
-from typing import Dict, Any
+from typing import IO, Any, Callable, Dict
 from fastapi import HTTPException, status
 from box import ConfigBox
 from box.exceptions import BoxValueError
@@ -20,15 +23,51 @@ def load_patient_data():
                            detail=f'Patient data file not found: {err}')
 
 
+def write_file_atomic(path: Path, write: Callable[[IO[Any]], Any], binary: bool = False) -> os.stat_result:
+
+   # write(temp file) next to the target, fsync it, then rename over the target (atomic):
+   # a crash leaves either the old or the new file, never a truncated one. 1 temp file per process & thread, concurrent writers don't clash
+   # returns the stat of the file this call wrote (the rename keeps its inode, mtime & size), os.stat(path) afterwards
+   # may already see another writer's file
+   temp_path: Path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+   try:
+      with open(temp_path, 'wb' if binary else 'w') as temp_file:
+         write(temp_file)
+         temp_file.flush()
+         os.fsync(temp_file.fileno())
+         written_stat: os.stat_result = os.fstat(temp_file.fileno())
+
+   except Exception:
+      temp_path.unlink(missing_ok=True)          # ex: unserializable data, disk full
+      raise
+
+   os.replace(temp_path, path)
+   return written_stat
+
+
+def write_json_atomic(path: Path, data: Dict[str, Any]) -> os.stat_result:
+   return write_file_atomic(path, lambda temp_file: json.dump(data,
+                                                              temp_file,
+                                                              indent=4))
+
+
 def update_data_to_json(data_dict: Dict[str, Dict[str, Any]]) -> None:
   try:
-     with open(json_file_path, 'w') as json_file:
-       json.dump(data_dict, 
-                 json_file,
-                 indent=4)
+     write_json_atomic(json_file_path, data_dict)
+
+  # the previous file is still in place, report the failed write instead of answering as if it was saved
+  except OSError as err:
+     print(f'Error: {err}')
+     raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail=f'Patient data could not be saved: {err}')
 
-  except Exception as exp:
-     print(f'Error: {exp}')
+
+# dedicated threads for the patient file I/O: a burst of big reads / writes queues here (at most N run at once)
+# instead of taking the threads of AnyIO's shared threadpool the sync routes run on
+PATIENT_FILE_IO_WORKERS: int = int(os.getenv('PATIENT_FILE_IO_WORKERS', '2'))
+patient_file_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=PATIENT_FILE_IO_WORKERS,
+                                                               thread_name_prefix='patient-file-io')      # used by utils/patient_store.py
 
 """
    **Other possible exceptions status codes:**
@@ -44,9 +83,16 @@ def update_data_to_json(data_dict: Dict[str, Dict[str, Any]]) -> None:
 
 model_file_path: Path = Path(__file__).parent.parent / 'insurance_premium_prediction_model.joblib'
 
-def load_model():
+# 'r' memory-maps the numpy arrays stored in the .joblib file (read-only pages shared by every process mapping the file)
+MODEL_MMAP_MODE: str | None = os.getenv('MODEL_MMAP_MODE') or None
+
+def load_model(model_path: Path = model_file_path,
+               mmap_mode: str | None = MODEL_MMAP_MODE):
    try:
-      with open(model_file_path, 'rb') as model_file:
+      if mmap_mode:
+         return jb.load(model_path, mmap_mode=mmap_mode)         # mmap needs the file path, not an open file obj
+
+      with open(model_path, 'rb') as model_file:
          return jb.load(model_file)
 
    except FileNotFoundError as err:
@@ -0,0 +1,29 @@
+import os
+import sys
+import resource
+from pathlib import Path
+from typing import Any, Dict
+
+smaps_rollup_path: Path = Path('/proc/self/smaps_rollup')
+
+
+def process_memory() -> Dict[str, Any]:
+
+    memory: Dict[str, Any] = {'pid': os.getpid()}
+
+    try:
+        # Linux only: 'Pss' splits every shared page between the processes mapping it,
+        # so summing 'pss_mb' over the workers gives the real footprint of the pod
+        with open(smaps_rollup_path) as smaps_file:
+            for line in smaps_file:
+                key, _, value = line.partition(':')
+
+                if key in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty'):
+                    memory[f'{key.lower()}_mb'] = round(int(value.split()[0]) / 1024, 2)     # values are in kB
+
+    except OSError:
+        # elsewhere only the peak RSS is available (reported in bytes on macOS, kB otherwise)
+        max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory['max_rss_mb'] = round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 2)
+
+    return memory
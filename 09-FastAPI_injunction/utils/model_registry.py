@@ -0,0 +1,224 @@
+import os
+import asyncio
+import itertools
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+from .load_update_data import load_model, model_file_path
+from .compiled_scorer import CompiledScorer
+from .score_prediction import predict_output
+
+# only the pipeline fallback imports scikit-learn (unpickling the .joblib does it too), see load_scorer()
+if TYPE_CHECKING:
+    from sklearn.base import BaseEstimator
+    from .fast_scoring import FastScorer
+
+registry_dir_path: Path = Path(os.getenv('MODEL_REGISTRY_DIR', Path(__file__).parent.parent / 'model_registry'))
+
+# serve '<artifact>.npz' (written by utils/export_compiled_model.py) instead of the sklearn pipeline when it is up to date
+COMPILED_MODEL_ENABLED: bool = os.getenv('COMPILED_MODEL_ENABLED', 'true').lower() == 'true'
+
+# scored once by every freshly loaded model before it is swapped in, a model which can't score it is rejected
+WARM_UP_FEATURES: Dict[str, Any] = {
+    'income_lpa': 10.0,
+    'occupation': 'private_job',
+    'bmi': 24.22,
+    'lifestyle_risk': 'low',
+    'city_tier': 1,
+    'age_group': 'adult'
+}
+
+# load order of the handles: a higher generation was loaded later (ex: lets utils/prediction_cache.py tell a new model
+# from one still pinned by in-flight requests after a hot swap)
+_handle_generations: 'itertools.count[int]' = itertools.count(1)
+
+
+def fresh_compiled_path(artifact_path: Path) -> Path | None:
+
+    compiled_path: Path = artifact_path.with_suffix('.npz')
+
+    # an .npz older than its .joblib was exported from a previous model, ignore it
+    if COMPILED_MODEL_ENABLED and compiled_path.is_file() and compiled_path.stat().st_mtime_ns >= artifact_path.stat().st_mtime_ns:
+        return compiled_path
+
+    return None
+
+
+def load_scorer(artifact_path: Path) -> Tuple['BaseEstimator | None', 'FastScorer | CompiledScorer | None']:
+
+    # (sklearn pipeline, scorer). An up to date .npz is served alone: the .joblib isn't loaded & sklearn / pandas aren't imported
+    compiled_path: Path | None = fresh_compiled_path(artifact_path)
+
+    if compiled_path is not None:
+        return None, CompiledScorer.load(compiled_path)
+
+    from .fast_scoring import build_fast_scorer
+
+    sk_model: 'BaseEstimator' = load_model(artifact_path)
+    return sk_model, build_fast_scorer(sk_model)
+
+
+@dataclass(frozen=True)
+class ModelHandle:
+    # everything a request needs to be scored, swapped as 1 obj so a request never mixes 2 versions
+    version: str
+    model: 'BaseEstimator | None'                # None when the compiled scorer is served alone
+    fast_scorer: 'FastScorer | CompiledScorer | None'
+    source_path: Path
+    source_mtime_ns: int
+    loaded_at: datetime
+    generation: int
+
+
+class ModelRegistry:
+    """
+    Local, directory based model registry: every '<version>.joblib' file (or '<version>/model.joblib' folder)
+    inside 'registry_dir' is a version, the most recently modified one is served.
+    Without any version in the registry, the bundled 'insurance_premium_prediction_model.joblib' is served as 'default_version'.
+
+    Publish a new version by writing it elsewhere & moving it in (mv is atomic), so a half-written file is never picked up.
+    """
+
+    def __init__(self,
+                 registry_dir: Path = registry_dir_path,
+                 default_version: str = os.getenv('MODEL_VERSION', 'v_1.0'),
+                 poll_interval_seconds: float = 5.0) -> None:
+
+        self.registry_dir = registry_dir
+        self.default_version = default_version
+        self.poll_interval_seconds = poll_interval_seconds
+
+        self.current: ModelHandle | None = None          # replaced in 1 assignment, which is atomic for readers
+        self.swaps: int = 0
+        self.last_error: str | None = None
+
+        self._failed: Dict[Tuple[str, int], str] = {}      # (version, mtime_ns) -> error, not retried until the file changes
+        self._watcher: asyncio.Task[None] | None = None
+
+
+    def available_versions(self) -> List[Tuple[str, Path, int]]:
+
+        versions: List[Tuple[str, Path, int]] = []
+
+        if not self.registry_dir.is_dir():
+            return versions
+
+        for entry in self.registry_dir.iterdir():
+            artifact_path: Path = entry / 'model.joblib' if entry.is_dir() else entry
+
+            if artifact_path.suffix != '.joblib' or not artifact_path.is_file():
+                continue
+
+            version: str = entry.name if entry.is_dir() else entry.stem
+            versions.append((version, artifact_path, artifact_path.stat().st_mtime_ns))
+
+        return sorted(versions, key=lambda version_info: version_info[2])      # oldest -> newest
+
+
+    def latest_version(self) -> Tuple[str, Path, int]:
+
+        versions: List[Tuple[str, Path, int]] = self.available_versions()
+
+        if versions:
+            return versions[-1]
+
+        return self.default_version, model_file_path, model_file_path.stat().st_mtime_ns
+
+
+    def load_version(self, version: str, artifact_path: Path, mtime_ns: int) -> ModelHandle:
+
+        sk_model, fast_scorer = load_scorer(artifact_path)
+
+        # warm up: first predict() call pays for lazy allocations, & a broken artifact fails here instead of on live traffic
+        if fast_scorer is not None:
+            fast_scorer.predict(WARM_UP_FEATURES)
+        else:
+            predict_output(WARM_UP_FEATURES, sk_model)
+
+        return ModelHandle(version=version,
+                           model=sk_model,
+                           fast_scorer=fast_scorer,
+                           source_path=artifact_path,
+                           source_mtime_ns=mtime_ns,
+                           loaded_at=datetime.now(timezone.utc),
+                           generation=next(_handle_generations))
+
+
+    def load_initial(self) -> ModelHandle:
+        self.current = self.load_version(*self.latest_version())
+        return self.current
+
+
+    async def refresh(self) -> bool:
+
+        version, artifact_path, mtime_ns = self.latest_version()
+        current: ModelHandle | None = self.current
+
+        if current is not None and (current.version, current.source_mtime_ns) == (version, mtime_ns):
+            return False
+
+        if (version, mtime_ns) in self._failed:
+            return False
+
+        try:
+            handle: ModelHandle = await asyncio.to_thread(self.load_version, version, artifact_path, mtime_ns)
+
+        except Exception as ex:
+            self._failed[(version, mtime_ns)] = self.last_error = f'Model {version} rejected: {ex}'
+            print(self.last_error)
+            return False
+
+        # atomic swap: requests which already picked up the old handle finish on the old model
+        self.current = handle
+        self.swaps += 1
+        print(f'Model {version} swapped in!')
+        return True
+
+
+    async def start(self) -> None:
+
+        if self.current is None:
+            await asyncio.to_thread(self.load_initial)
+
+        self._watcher = asyncio.create_task(self._watch())
+
+
+    async def stop(self) -> None:
+
+        if self._watcher is not None:
+            self._watcher.cancel()
+
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+
+            self._watcher = None
+
+
+    async def _watch(self) -> None:
+
+        while True:
+            await asyncio.sleep(self.poll_interval_seconds)
+
+            try:
+                await self.refresh()
+
+            except OSError as err:            # ex: registry dir removed while listing it
+                self.last_error = f'Model registry scan failed: {err}'
+
+
+    def info(self) -> Dict[str, Any]:
+
+        current: ModelHandle | None = self.current
+
+        return {
+            'version': current.version if current is not None else None,
+            'loaded_at': current.loaded_at.isoformat() if current is not None else None,
+            'source': current.source_path.name if current is not None else None,
+            'scorer': type(current.fast_scorer).__name__ if current is not None and current.fast_scorer is not None else 'Pipeline',
+            'registry_dir': str(self.registry_dir),
+            'swaps': self.swaps,
+            'last_error': self.last_error
+        }
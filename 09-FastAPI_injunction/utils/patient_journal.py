@@ -0,0 +1,310 @@
+"""
+Append-only journal of the patient writes: 1 JSON record per line, next to patient_data.json (the snapshot).
+
+Convert the existing patient_data.json (once), then start the JSON-file apps in journal mode (any number of workers):
+    python -m 09-FastAPI_injunction.utils.patient_journal convert
+    PATIENT_STORE_MODE=journal uvicorn 09-FastAPI_injunction.9-4-put_del_request:app --workers 4
+
+Fold a journal back into patient_data.json (ex: before going back to PATIENT_STORE_MODE=snapshot), with the apps stopped:
+    python -m 09-FastAPI_injunction.utils.patient_journal compact
+"""
+import os
+import json
+import fcntl
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Tuple
+from .load_update_data import json_file_path, write_json_atomic
+
+# fsync every record before the write is acknowledged, 'false' trades the last records on power loss for speed
+PATIENT_JOURNAL_FSYNC: bool = os.getenv('PATIENT_JOURNAL_FSYNC', 'true').lower() == 'true'
+
+# the journal is folded into the snapshot once it holds this many records (& on shutdown)
+PATIENT_JOURNAL_COMPACT_RECORDS: int = int(os.getenv('PATIENT_JOURNAL_COMPACT_RECORDS', '1000'))
+
+
+def journal_path_for(snapshot_path: Path) -> Path:
+    return snapshot_path.with_suffix('.journal.jsonl')            # patient_data.json -> patient_data.journal.jsonl
+
+
+def apply_record(patients: Dict[str, Dict[str, Any]], versions: Dict[str, int], record: Dict[str, Any]) -> None:
+
+    # records hold the whole patient, replaying one twice (or over a snapshot that already has it) changes nothing
+    if record['op'] == 'put':
+        patients[record['id']] = record['patient']
+        versions[record['id']] = record.get('version', versions.get(record['id'], 0) + 1)
+
+    elif record['op'] == 'delete':
+        patients.pop(record['id'], None)
+        versions[record['id']] = record.get('version', versions.get(record['id'], 0) + 1)     # kept: a re-created id doesn't restart at 1
+
+    elif record['op'] == 'versions':                     # 1st record of a journal started by a compaction
+        versions.update(record['versions'])
+
+    else:
+        raise ValueError(f"Unknown journal record op: {record['op']!r}")
+
+
+def apply_records(content: bytes, patients: Dict[str, Dict[str, Any]], versions: Dict[str, int]) -> Tuple[int, int]:
+
+    # applies every complete ('\n' terminated) line, returns (patient records applied, offset after the last complete line)
+    applied: int = 0
+    end: int = 0
+
+    while (newline := content.find(b'\n', end)) != -1:
+        try:
+            record: Dict[str, Any] = json.loads(content[end:newline])
+            apply_record(patients, versions, record)
+
+        except (ValueError, KeyError, TypeError) as err:
+            raise ValueError(f'Journal is corrupted at byte {end}: {err}')
+
+        applied += record['op'] != 'versions'
+        end = newline + 1
+
+    return applied, end
+
+
+class PatientJournal:
+    """
+    Append-only log of the patient writes, each one a single line:
+        {"op": "put" | "delete", "id": ..., "version": ..., "patient": ...}
+
+    Shared by every worker process: appends & compactions hold an exclusive flock on '<journal>.lock',
+    each process tails the journal from its own offset to pick up the other workers' writes.
+
+    Compaction renames the live journal to '<journal>.old', starts a new one with the patients' versions,
+    writes the snapshot, then removes '.old'. State on disk = snapshot + '.old' + live journal, replayed in that order,
+    at any point of a compaction.
+    """
+
+    def __init__(self,
+                 path: Path,
+                 fsync: bool = PATIENT_JOURNAL_FSYNC) -> None:
+
+        self.path = path
+        self.rotated_path = path.with_suffix('.old')
+        self.lock_path = path.with_suffix('.lock')
+        self.fsync = fsync
+
+        self._file: BinaryIO | None = None      # live journal, opened 'a+b': appends go to the end, reads from '_offset'
+        self._inode: int | None = None
+        self._offset: int = 0                   # bytes of the live journal applied by this process
+        self.records: int = 0                   # patient records in the live journal
+
+        self.torn_records: int = 0
+
+
+    @contextmanager
+    def lock(self, shared: bool = False) -> Iterator[None]:
+
+        # a new open file per acquisition: flock()s on separate open files exclude each other, threads of 1 process included
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield                                # released when the file is closed
+
+
+    def exists(self) -> bool:
+        return self.path.exists() or self.rotated_path.exists()
+
+
+    def state(self) -> str:
+
+        # 'current', 'appended' (other workers wrote, tail it) or 'replaced' (compacted since, reload everything)
+        try:
+            stat = os.stat(self.path)
+
+        except FileNotFoundError:               # between the rename & the new journal of a compaction
+            return 'replaced'
+
+        if self._file is None or stat.st_ino != self._inode:
+            return 'replaced'
+
+        return 'appended' if stat.st_size > self._offset else 'current'
+
+
+    def reload(self, patients: Dict[str, Dict[str, Any]], versions: Dict[str, int], exclusive: bool) -> int:
+
+        # '.old' then the live journal, over the snapshot already in 'patients'. Caller holds lock()
+        replayed: int = 0
+
+        if self.rotated_path.exists():
+            replayed += self._replay_rotated(patients, versions, exclusive)
+
+        self.close()
+        self._file = open(self.path, 'a+b')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._offset = self.records = 0
+
+        replayed += self.read_new(patients, versions)
+
+        if exclusive:
+            self.truncate_torn()
+
+        return replayed
+
+
+    def _replay_rotated(self, patients: Dict[str, Dict[str, Any]], versions: Dict[str, int], exclusive: bool) -> int:
+
+        content: bytes = self.rotated_path.read_bytes()
+        applied, end = apply_records(content, patients, versions)
+
+        if end < len(content) and exclusive:
+            self._drop_torn(self.rotated_path.name, len(content) - end)
+
+            with open(self.rotated_path, 'r+b') as rotated_file:
+                rotated_file.truncate(end)
+
+        return applied
+
+
+    def read_new(self, patients: Dict[str, Dict[str, Any]], versions: Dict[str, int]) -> int:
+
+        # complete lines only: a line without '\n' is another worker's append in progress (or a torn one, see truncate_torn)
+        assert self._file is not None
+
+        self._file.seek(self._offset)
+        applied, end = apply_records(self._file.read(), patients, versions)
+
+        self._offset += end
+        self.records += applied
+        return applied
+
+
+    def truncate_torn(self) -> None:
+
+        # under the exclusive lock nobody is appending: bytes after the last complete line are a dead process' torn append
+        assert self._file is not None
+        size: int = os.fstat(self._file.fileno()).st_size
+
+        if size > self._offset:
+            self._drop_torn(self.path.name, size - self._offset)
+            self._file.truncate(self._offset)             # the next append starts on a clean line
+
+
+    def _drop_torn(self, name: str, size: int) -> None:
+
+        # no '\n': the process died in the middle of this append, it was never acknowledged
+        self.torn_records += 1
+        print(f'Ignoring a torn last record in {name} ({size} bytes)')
+
+
+    def append(self, record: Dict[str, Any]) -> None:
+
+        # caller holds the exclusive lock & has applied everything up to the end of the journal
+        assert self._file is not None
+        line: bytes = json.dumps(record, separators=(',', ':')).encode() + b'\n'
+
+        # 1 write() per record, so a crash can only tear the last line
+        self._file.write(line)
+        self._file.flush()
+
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        self._offset += len(line)
+        self.records += record['op'] != 'versions'
+
+
+    def rotate(self, versions: Dict[str, int]) -> bool:
+
+        # caller holds the exclusive lock. A '.old' left by a failed compaction is still needed:
+        # keep appending to the live journal, the next compaction removes both
+        if self.rotated_path.exists():
+            return False
+
+        os.replace(self.path, self.rotated_path)
+        self.close()
+        self._file = open(self.path, 'a+b')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._offset = self.records = 0
+
+        self.append({'op': 'versions', 'versions': versions})
+        return True
+
+
+    def replay(self, patients: Dict[str, Dict[str, Any]], versions: Dict[str, int]) -> int:
+
+        # read-only replay of whatever journal files exist (ex: folding a journal left by an earlier journal-mode run)
+        replayed: int = 0
+
+        for path in (self.rotated_path, self.path):
+            if path.exists():
+                replayed += apply_records(path.read_bytes(), patients, versions)[0]
+
+        return replayed
+
+
+    def discard_rotated(self) -> None:
+        self.rotated_path.unlink(missing_ok=True)
+
+
+    def discard(self) -> None:
+
+        # only once the snapshot holds everything the journal did
+        self.close()
+        self.discard_rotated()
+        self.path.unlink(missing_ok=True)
+        self.records = 0
+
+
+    def close(self) -> None:
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def fold_journal(snapshot_path: Path = json_file_path) -> Tuple[int, int]:
+
+    # snapshot + journal -> new snapshot, journal removed. Returns (patients, replayed records)
+    journal: PatientJournal = PatientJournal(journal_path_for(snapshot_path))
+
+    with journal.lock():
+        try:
+            with open(snapshot_path, 'r') as json_file:
+                patients: Dict[str, Dict[str, Any]] = json.load(json_file)
+
+        except FileNotFoundError:
+            patients = {}
+
+        replayed: int = journal.replay(patients, {})
+
+        write_json_atomic(snapshot_path, patients)
+        journal.discard()
+
+    return len(patients), replayed
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Convert patient_data.json to journal mode, or fold a journal back into it. '
+                                                 'Stop the JSON-file apps first.')
+    parser.add_argument('command', choices=['convert', 'compact'])
+    parser.add_argument('--json', type=Path, default=json_file_path)
+    args = parser.parse_args()
+
+    patients, replayed = fold_journal(args.json)
+    print(f'{args.json.name}: {patients} patients ({replayed} journal records folded in)')
+
+    if args.command == 'convert':
+        journal_path: Path = journal_path_for(args.json)
+        journal_path.touch()
+        print(f'Created {journal_path.name}, start the apps with PATIENT_STORE_MODE=journal')
+
+
+if __name__ == '__main__':
+    main()
+
+
+"""
+    • Crash safety: a record is acknowledged only after its line is written (& fsynced), the snapshot is only ever
+      replaced atomically. A crash mid-append leaves a line without '\\n', dropped by the next exclusive reload / append.
+
+    • Versions: every put / delete record carries the patient's version (previous + 1), compactions carry them over in
+      the new journal's 1st record, so a version seen by any worker stays comparable after a compaction.
+
+    • The snapshot stays patient_data.json in its usual format, so 9-1 / 9-2 keep reading it, they see
+      journal-mode writes once they are compacted (every PATIENT_JOURNAL_COMPACT_RECORDS writes & on shutdown).
+"""
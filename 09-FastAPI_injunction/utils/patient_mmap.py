@@ -0,0 +1,233 @@
+"""
+patient_data.json laid out for lookups by id without loading it: 1 line per patient in patient_data.ndjson
+("<id>\\t<record json>\\n") & an open-addressing hash table (patient id -> byte offset) in patient_data.ndjson.index,
+both read through mmap, so every worker shares the OS page cache instead of holding its own dict.
+
+Built from patient_data.json on first use & whenever it changes (9-2 with PATIENT_MMAP_ENABLED=true), or by hand:
+    python -m 09-FastAPI_injunction.utils.patient_mmap build
+    python -m 09-FastAPI_injunction.utils.patient_mmap get P001
+"""
+import os
+import sys
+import json
+import mmap
+import fcntl
+import struct
+import hashlib
+import argparse
+from array import array
+from pathlib import Path
+from typing import IO, Any, Dict, Tuple
+from .load_update_data import json_file_path, write_file_atomic
+
+# magic, slots (power of 2), patients, inode & mtime_ns & size of the source patient_data.json, then of the .ndjson
+_HEADER: struct.Struct = struct.Struct('<8sQQQqQQqQ')
+_MAGIC: bytes = b'PATIDX02'
+
+# hash of the patient id, offset of its line + 1 (0 = empty slot)
+_SLOT: struct.Struct = struct.Struct('<QQ')
+
+
+def ndjson_path_for(json_path: Path) -> Path:
+    return json_path.with_suffix('.ndjson')                # patient_data.json -> patient_data.ndjson
+
+
+def index_path_for(json_path: Path) -> Path:
+    return json_path.with_suffix('.ndjson.index')
+
+
+def id_hash(patient_id: str) -> int:
+    # stable across processes & runs, unlike hash(): the table is written by 1 process & probed by others
+    return int.from_bytes(hashlib.blake2b(patient_id.encode(), digest_size=8).digest(), 'little')
+
+
+def _file_key(file_stat: os.stat_result) -> Tuple[int, int, int]:
+    return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+
+def _write_lines(patients: Dict[str, Any], offsets: Dict[str, int], ndjson_file: IO[bytes]) -> None:
+
+    for patient_id, record in patients.items():
+        if '\t' in patient_id or '\n' in patient_id:
+            raise ValueError(f'Patient id {patient_id!r} contains a tab or a newline')
+
+        offsets[patient_id] = ndjson_file.tell()
+        ndjson_file.write(f'{patient_id}\t{json.dumps(record)}\n'.encode())
+
+
+def build_patient_mmap(json_path: Path) -> int:
+
+    # returns the number of patients. The whole json is parsed once here (json.load, several times faster than
+    # utils/json_stream.py), that memory is freed with the build: the lookups never hold more than 1 patient
+    offsets: Dict[str, int] = {}
+
+    with open(json_path, 'r') as json_file:
+        source_stat = os.fstat(json_file.fileno())            # the file actually parsed, even if replaced meanwhile
+        patients: Dict[str, Any] = json.load(json_file)
+
+    ndjson_stat = write_file_atomic(ndjson_path_for(json_path),
+                                    lambda ndjson_file: _write_lines(patients, offsets, ndjson_file),
+                                    binary=True)
+    del patients
+
+    # load factor <= 0.5: a lookup probes ~1.5 slots on average
+    slots: int = 8
+    while slots < 2 * len(offsets):
+        slots *= 2
+
+    table: array = array('Q', bytes(_SLOT.size * slots))
+
+    for patient_id, offset in offsets.items():
+        hashed: int = id_hash(patient_id)
+        slot: int = hashed & (slots - 1)
+
+        while table[2 * slot + 1]:
+            slot = (slot + 1) & (slots - 1)
+
+        table[2 * slot], table[2 * slot + 1] = hashed, offset + 1
+
+    if sys.byteorder == 'big':
+        table.byteswap()
+
+    header: bytes = _HEADER.pack(_MAGIC, slots, len(offsets), *_file_key(source_stat), *_file_key(ndjson_stat))
+    write_file_atomic(index_path_for(json_path),
+                      lambda index_file: index_file.write(header + table.tobytes()),
+                      binary=True)
+    return len(offsets)
+
+
+class PatientMmapFile:
+    """
+    Read-only view of a built .ndjson / .index pair. get() probes the mapped table & decodes only the matching line,
+    get_raw() returns that line's json bytes without decoding them.
+    Immutable once opened, so threads share it without a lock: a rebuild writes new files & a new instance maps them.
+    """
+
+    def __init__(self, json_path: Path) -> None:
+
+        with open(index_path_for(json_path), 'rb') as index_file:
+            self._index: mmap.mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._index) < _HEADER.size:
+            raise ValueError('Patient index is truncated')
+
+        magic, self._slots, self.patients, *keys = _HEADER.unpack_from(self._index)
+        self.source_key: Tuple[int, int, int] = tuple(keys[:3])         # type: ignore
+        ndjson_key: Tuple[int, int, int] = tuple(keys[3:])              # type: ignore
+
+        if magic != _MAGIC or len(self._index) != _HEADER.size + self._slots * _SLOT.size:
+            raise ValueError('Not a patient index, or written by another format version')
+
+        with open(ndjson_path_for(json_path), 'rb') as ndjson_file:
+            ndjson_stat = os.fstat(ndjson_file.fileno())
+
+            # the .ndjson the table points into, not one written by a later (or concurrent) build
+            if _file_key(ndjson_stat) != ndjson_key:
+                raise ValueError('Patient index & ndjson file are from different builds')
+
+            self._records: mmap.mmap | None = (mmap.mmap(ndjson_file.fileno(), 0, access=mmap.ACCESS_READ)
+                                               if ndjson_stat.st_size else None)         # an empty file can't be mapped
+
+
+    def __len__(self) -> int:
+        return self.patients
+
+
+    def built_from(self, source_stat: os.stat_result) -> bool:
+        return self.source_key == _file_key(source_stat)
+
+
+    def get_raw(self, patient_id: str) -> bytes | None:
+
+        if self._records is None:
+            return None
+
+        hashed: int = id_hash(patient_id)
+        key: bytes = patient_id.encode() + b'\t'
+        slot: int = hashed & (self._slots - 1)
+
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(self._index, _HEADER.size + slot * _SLOT.size)
+
+            if not offset:
+                return None
+
+            # equal hashes: compare the id at the start of the line (a 64 bit collision is unlikely, not impossible)
+            if slot_hash == hashed and self._records[offset - 1:offset - 1 + len(key)] == key:
+                end: int = self._records.find(b'\n', offset - 1)
+                return self._records[offset - 1 + len(key):end]           # the record's json, not decoded
+
+            slot = (slot + 1) & (self._slots - 1)
+
+
+    def get(self, patient_id: str) -> Dict[str, Any] | None:
+        raw: bytes | None = self.get_raw(patient_id)
+        return json.loads(raw) if raw is not None else None
+
+
+def open_patient_mmap(json_path: Path, current: PatientMmapFile | None = None) -> PatientMmapFile:
+
+    # 'current' while it still matches patient_data.json, else the files on disk, rebuilt first if they are stale.
+    # Raises FileNotFoundError when there's neither a json nor a built pair
+    try:
+        source_stat = os.stat(json_path)
+
+    except FileNotFoundError:
+        return current if current is not None else PatientMmapFile(json_path)       # keep serving the last build
+
+    if current is not None and current.built_from(source_stat):
+        return current
+
+    # 1 build at a time across workers, the others wait & map its result
+    with open(index_path_for(json_path).with_suffix('.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            mapped: PatientMmapFile = PatientMmapFile(json_path)
+
+            if mapped.built_from(source_stat):
+                return mapped
+
+        except (FileNotFoundError, ValueError):
+            pass
+
+        try:
+            build_patient_mmap(json_path)
+
+        except json.JSONDecodeError as err:
+            if current is None:
+                raise
+
+            print(f'Patient index not rebuilt, serving the previous build: {err}')      # ex: json being edited by hand
+            return current
+
+        return PatientMmapFile(json_path)
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Build the ndjson + hash index layout of patient_data.json, or look up 1 patient')
+    parser.add_argument('command', choices=['build', 'get'])
+    parser.add_argument('patient_id', nargs='?')
+    parser.add_argument('--json', type=Path, default=json_file_path)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        patients: int = build_patient_mmap(args.json)
+        print(f'{ndjson_path_for(args.json).name} & {index_path_for(args.json).name}: {patients} patients')
+        return
+
+    print(json.dumps(open_patient_mmap(args.json).get(args.patient_id), indent=4))
+
+
+if __name__ == '__main__':
+    main()
+
+
+"""
+    • patient_data.json stays the source of truth (9-3 / 9-4 write it), the .ndjson / .index pair is derived from it:
+      the index header records the json's inode, mtime & size, a json rewritten since makes the next lookup rebuild the pair.
+
+    • A lookup costs 1 hash, ~1-2 slot reads & 1 json.loads of that patient's line. Only the touched pages are read,
+      & the kernel keeps them once for every worker mapping the same files.
+"""
@@ -0,0 +1,120 @@
+import os
+import json
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from pydantic import ValidationError
+from ..models import Patient                                  # type: ignore
+from .load_update_data import write_file_atomic
+
+# read the binary snapshot at startup when it's fresh, 'false' always parses & validates patient_data.json
+PATIENT_SNAPSHOT_ENABLED: bool = os.getenv('PATIENT_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+
+# bumped whenever the pickled layout or the validation rules change: older snapshots are then ignored
+SNAPSHOT_FORMAT: int = 2
+
+
+def json_file_key(json_stat: os.stat_result) -> Tuple[int, int, int]:
+    # identifies 1 version of patient_data.json: every write replaces it (new inode), mtime & size catch in-place edits
+    return json_stat.st_ino, json_stat.st_mtime_ns, json_stat.st_size
+
+
+def snapshot_path_for(json_path: Path) -> Path:
+    return json_path.with_suffix('.snapshot.pickle')         # patient_data.json -> patient_data.snapshot.pickle
+
+
+def validate_records(raw_patients: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+
+    # same dict a write through 9-3 / 9-4 stores: validated by Patient, computed fields (bmi, verdict) recomputed
+    patients: Dict[str, Dict[str, Any]] = {}
+    invalid: List[str] = []
+
+    for patient_id, record in raw_patients.items():
+        try:
+            patients[patient_id] = Patient.model_validate({**record, 'id': patient_id}).model_dump(exclude={'id'})
+
+        except ValidationError:
+            patients[patient_id] = record            # kept as stored, the app served it like this so far
+            invalid.append(patient_id)
+
+    if invalid:
+        print(f'{len(invalid)} patients failed validation & are kept as stored: {invalid[:10]}')
+
+    return patients
+
+
+def write_snapshot(json_path: Path, patients: Dict[str, Dict[str, Any]], json_stat: os.stat_result) -> None:
+
+    # 'json_stat' = stat of the json file 'patients' were written to / read from (write_json_atomic()'s result, fstat of
+    # the opened file), not os.stat(json_path) now: another writer may have replaced it since, with other records
+    write_file_atomic(snapshot_path_for(json_path),
+                      lambda snapshot_file: pickle.dump({'format': SNAPSHOT_FORMAT,
+                                                         'json_file': json_file_key(json_stat),
+                                                         'patients': patients},
+                                                        snapshot_file,
+                                                        protocol=pickle.HIGHEST_PROTOCOL),
+                      binary=True)
+
+
+def read_snapshot(json_path: Path) -> Dict[str, Dict[str, Any]] | None:
+
+    # None when there's no snapshot, or patient_data.json changed since it was written (ex: edited by hand, older app version)
+    try:
+        json_stat = os.stat(json_path)
+
+        with open(snapshot_path_for(json_path), 'rb') as snapshot_file:
+            snapshot: Dict[str, Any] = pickle.load(snapshot_file)          # only ever written by write_snapshot(), next to the json
+
+    except FileNotFoundError:
+        return None
+
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError) as err:
+        print(f'Ignoring unreadable patient snapshot: {err}')
+        return None
+
+    if snapshot.get('format') != SNAPSHOT_FORMAT or snapshot.get('json_file') != json_file_key(json_stat):
+        return None
+
+    return snapshot['patients']
+
+
+def load_patients(json_path: Path) -> Tuple[Dict[str, Dict[str, Any]], str]:
+
+    # returns (patients, where they came from). Raises FileNotFoundError without a json file
+    if PATIENT_SNAPSHOT_ENABLED:
+        patients: Dict[str, Dict[str, Any]] | None = read_snapshot(json_path)
+
+        if patients is not None:
+            return patients, 'snapshot'
+
+    with open(json_path, 'r') as json_file:
+        json_stat = os.fstat(json_file.fileno())          # the file actually read, even if replaced meanwhile
+        patients = validate_records(json.load(json_file))
+
+    if PATIENT_SNAPSHOT_ENABLED:
+        save_snapshot(json_path, patients, json_stat)        # next start skips the parsing & validation
+
+    return patients, 'json'
+
+
+def save_snapshot(json_path: Path, patients: Dict[str, Dict[str, Any]], json_stat: os.stat_result) -> None:
+
+    # best effort: patient_data.json stays the source of truth, a missing / stale snapshot only costs a slower start
+    try:
+        write_snapshot(json_path, patients, json_stat)
+
+    except OSError as err:
+        print(f'Patient snapshot not written: {err}')
+
+
+"""
+    • Format: 1 pickle (stdlib, protocol 5) of the validated record dicts + the inode, mtime & size of the
+      patient_data.json it was built from. Loading it is a single C-level unpickle, no JSON parsing & no Pydantic validation per record.
+
+    • Freshness: any write of patient_data.json outside the store (hand edit, git checkout, older app version) changes
+      its inode / mtime / size, the snapshot is then ignored & rebuilt from the json. The stamp is the stat of the json
+      the records came from (taken on the written / opened file), so a concurrent rewrite can't get another file's stat.
+
+    • pickle runs code from the file it loads: the snapshot is only read from next to patient_data.json, where only the
+      store writes it, never load one received from elsewhere.
+"""
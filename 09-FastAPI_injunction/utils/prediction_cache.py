@@ -0,0 +1,125 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Tuple
+from .score_prediction import MODEL_FEATURES
+
+if TYPE_CHECKING:
+    from .model_registry import ModelHandle
+
+MISSING: Any = object()          # sentinel, a cached prediction can never be this obj
+
+
+def prediction_cache_key(data_dict: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    # the derived features are all the model sees, so 2 users with the same tuple get the same prediction
+    return tuple(data_dict[feature] for feature in MODEL_FEATURES)
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions keyed on the derived feature tuple, with an optional TTL.
+    Entries belong to the ModelHandle that produced them: a newer handle (higher generation) empties the cache & takes it
+    over, requests still pinned to an older one during a hot swap get MISSING & don't store, without touching the entries.
+    """
+
+    def __init__(self,
+                 max_size: int = 4096,
+                 ttl_seconds: float | None = None) -> None:
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: OrderedDict[Tuple[Hashable, ...], Tuple[Any, float]] = OrderedDict()     # key -> (prediction, expires_at)
+        self._model: 'ModelHandle | None' = None
+        self._lock = threading.Lock()          # sync routes hit the cache from threadpool workers
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.invalidations: int = 0
+        self.stale_handles: int = 0
+
+
+    def _bind_model(self, model: 'ModelHandle') -> bool:
+
+        # False for a handle older than the one the entries belong to: rebinding back to it would empty the cache
+        # on every request of the drain window, alternating with the new handle's requests
+        if model is self._model:
+            return True
+
+        if self._model is not None and model.generation < self._model.generation:
+            return False
+
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._model = model
+        return True
+
+
+    def get(self, key: Tuple[Hashable, ...], model: 'ModelHandle') -> Any:
+
+        with self._lock:
+            if not self._bind_model(model):
+                self.stale_handles += 1
+                self.misses += 1
+                return MISSING
+
+            entry: Tuple[Any, float] | None = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            prediction, expires_at = entry
+
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)          # mark as most recently used
+            self.hits += 1
+            return prediction
+
+
+    def put(self, key: Tuple[Hashable, ...], prediction: Any, model: 'ModelHandle') -> None:
+
+        with self._lock:
+            if model is not self._model:         # scored by a model that was replaced meanwhile, don't keep it
+                return
+
+            expires_at: float = time.monotonic() + self.ttl_seconds if self.ttl_seconds else float('inf')
+            self._entries[key] = (prediction, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)   # least recently used
+                self.evictions += 1
+
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / (self.hits + self.misses), 4) if self.hits + self.misses else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'stale_handles': self.stale_handles
+            }
+
+
+"""
+    • city_tier (3 values) & age_group (4 values) are coarse buckets and bmi is rounded to 2 decimals,
+      so lots of different UserInputFeatures payloads collapse into the same 6 feature tuple.
+
+    • OrderedDict keeps insertion order, move_to_end() on every hit makes the front of the dict the
+      least recently used entry which popitem(last=False) evicts once 'max_size' is exceeded.
+"""
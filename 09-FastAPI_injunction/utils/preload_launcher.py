@@ -0,0 +1,78 @@
+"""
+Preload-before-fork launcher for the model serving app.
+
+`uvicorn --workers N` starts every worker with 'spawn', so each one runs load_model() & keeps a private copy of the model.
+This launcher loads the model once in the parent, then forks N uvicorn workers sharing one listening socket:
+the model's pages are inherited copy-on-write & stay shared as long as nobody writes to them.
+
+Run from the repo root:
+    python -m 09-FastAPI_injunction.utils.preload_launcher --workers 4 --port 8000
+
+Add MODEL_MMAP_MODE=r to also memory-map the numpy arrays stored in the .joblib file.
+"""
+import os
+import gc
+import signal
+import socket
+import argparse
+import importlib
+from typing import List
+import uvicorn
+
+
+def serve_worker(app_module_name: str, sock: socket.socket, log_level: str) -> None:
+
+    app_module = importlib.import_module(app_module_name)         # already imported in the parent, just a sys.modules lookup
+    config = uvicorn.Config(app_module.app,
+                            log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description='Preload the model, then fork uvicorn workers')
+    parser.add_argument('--app-module', default='09-FastAPI_injunction.9-5-model_prediction')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    app_module = importlib.import_module(args.app_module)
+    app_module.preload_model()
+    print(f'Model preloaded in parent process {os.getpid()}')
+
+    # move everything allocated so far out of the GC's reach: otherwise the collector touches
+    # every object header in the children & copy-on-write duplicates the pages we want to share
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    worker_pids: List[int] = []
+
+    for _ in range(args.workers):
+        pid: int = os.fork()
+
+        if pid == 0:                # child
+            serve_worker(args.app_module, sock, args.log_level)
+            os._exit(0)
+
+        worker_pids.append(pid)
+
+    print(f'Started workers {worker_pids} on http://{args.host}:{args.port}')
+
+    # Ctrl+C reaches the whole process group, SIGTERM (ex: from the container runtime) only reaches us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: [os.kill(pid, signal.SIGTERM) for pid in worker_pids])
+
+    for pid in worker_pids:
+        os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
+from box import ConfigBox
+from .load_update_data import read_yaml
+
+literals_file_path: Path = Path(__file__).parent.parent / 'user_input_literals.yaml'
+
+# the yaml's mtime is checked at most once per interval, not on every lookup
+REFERENCE_DATA_CHECK_SECONDS: float = float(os.getenv('REFERENCE_DATA_CHECK_SECONDS', '1'))
+
+DEFAULT_CITY_TIER: int = 3          # any city not listed in the yaml
+
+
+def normalize_key(value: str) -> str:
+    return value.strip().casefold()             # 'Mumbai', ' mumbai ', 'MUMBAI' -> 'mumbai'
+
+
+def _lookup(values: Tuple[str, ...]) -> Mapping[str, str]:
+    # normalized key -> value as spelled in the yaml, both interned: validated models all share the same str objs
+    return MappingProxyType({sys.intern(normalize_key(value)): sys.intern(value) for value in values})
+
+
+@dataclass(frozen=True)
+class ReferenceIndex:
+    """
+    user_input_literals.yaml compiled into read-only hash lookups, built once per version of the file.
+    The tuples keep the yaml's order for error messages, lookups go through the normalized keys.
+    """
+    genders: Tuple[str, ...]
+    occupations: Tuple[str, ...]
+    tier_1_cities: Tuple[str, ...]
+    tier_2_cities: Tuple[str, ...]
+    gender_lookup: Mapping[str, str]
+    occupation_lookup: Mapping[str, str]
+    city_tiers: Mapping[str, int]               # normalized city -> tier
+    source_mtime_ns: int
+
+
+    @classmethod
+    def from_yaml(cls, yaml_path: Path = literals_file_path) -> 'ReferenceIndex':
+
+        mtime_ns: int = yaml_path.stat().st_mtime_ns          # taken 1st, a change during the read is picked up by the next check
+        literals: ConfigBox = read_yaml(yaml_path)
+
+        try:
+            genders: Tuple[str, ...] = tuple(sys.intern(str(value)) for value in literals.gender)
+            occupations: Tuple[str, ...] = tuple(sys.intern(str(value)) for value in literals.occupations)
+            tier_1_cities: Tuple[str, ...] = tuple(sys.intern(str(value)) for value in literals.tier_1_cities)
+            tier_2_cities: Tuple[str, ...] = tuple(sys.intern(str(value)) for value in literals.tier_2_cities)
+
+        except (AttributeError, KeyError, TypeError) as err:
+            raise ValueError(f'{yaml_path.name} is missing a reference list: {err}')
+
+        city_tiers: Dict[str, int] = {sys.intern(normalize_key(city)): 2 for city in tier_2_cities}
+        city_tiers.update({sys.intern(normalize_key(city)): 1 for city in tier_1_cities})         # tier 1 wins if a city is in both, like the old if / elif
+
+        return cls(genders=genders,
+                   occupations=occupations,
+                   tier_1_cities=tier_1_cities,
+                   tier_2_cities=tier_2_cities,
+                   gender_lookup=_lookup(genders),
+                   occupation_lookup=_lookup(occupations),
+                   city_tiers=MappingProxyType(city_tiers),
+                   source_mtime_ns=mtime_ns)
+
+
+    def canonical_gender(self, value: Any) -> str | None:
+        return self.gender_lookup.get(normalize_key(value)) if isinstance(value, str) else None
+
+
+    def canonical_occupation(self, value: Any) -> str | None:
+        return self.occupation_lookup.get(normalize_key(value)) if isinstance(value, str) else None
+
+
+    def city_tier(self, city: str) -> int:
+        return self.city_tiers.get(normalize_key(city), DEFAULT_CITY_TIER)
+
+
+class ReferenceData:
+    """
+    Holds the current ReferenceIndex & rebuilds it when user_input_literals.yaml is modified.
+    The new index replaces the old one in a single assignment, a lookup sees either the old or the new file, never a mix.
+    A yaml that fails to load is reported in 'last_error' & the previous index stays in use.
+    """
+
+    def __init__(self,
+                 yaml_path: Path = literals_file_path,
+                 check_interval_seconds: float = REFERENCE_DATA_CHECK_SECONDS) -> None:
+
+        self.yaml_path = yaml_path
+        self.check_interval_seconds = check_interval_seconds
+
+        self._index: ReferenceIndex = ReferenceIndex.from_yaml(yaml_path)
+        self._next_check_at: float = time.monotonic() + check_interval_seconds
+        self._failed_mtime_ns: int | None = None
+        self._lock = threading.Lock()           # validators run on threadpool workers too, only 1 of them reloads
+
+        self.reloads: int = 0
+        self.last_error: str | None = None
+
+
+    def current(self) -> ReferenceIndex:
+
+        if time.monotonic() >= self._next_check_at:
+            self._reload_if_modified()
+
+        return self._index
+
+
+    def _reload_if_modified(self) -> None:
+
+        if not self._lock.acquire(blocking=False):          # another thread is already checking, keep serving the current index
+            return
+
+        try:
+            self._next_check_at = time.monotonic() + self.check_interval_seconds
+
+            try:
+                mtime_ns: int = self.yaml_path.stat().st_mtime_ns
+
+            except OSError as err:            # ex: file being replaced right now, checked again next interval
+                self.last_error = f'Reference data check failed, still using the previous version: {err}'
+                return
+
+            if mtime_ns in (self._index.source_mtime_ns, self._failed_mtime_ns):
+                return
+
+            try:
+                self._index = ReferenceIndex.from_yaml(self.yaml_path)
+
+            except Exception as ex:
+                self._failed_mtime_ns = mtime_ns              # not parsed again until the file changes
+                self.last_error = f'Reference data reload failed, still using the previous version: {ex}'
+                print(self.last_error)
+                return
+
+            self.reloads += 1
+            print(f'Reference data reloaded from {self.yaml_path.name}')
+
+        finally:
+            self._lock.release()
+
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'source': self.yaml_path.name,
+            'cities': len(self._index.city_tiers),
+            'occupations': len(self._index.occupations),
+            'reloads': self.reloads,
+            'last_error': self.last_error
+        }
+
+
+# one instance shared by the models, routes & utils
+reference_data: ReferenceData = ReferenceData()
+
+
+"""
+    • Before: city_tier did 'in' checks on 2 lists (~55 cities), the occupation & gender validators scanned lists too.
+      Now each is a single dict lookup on the normalized value.
+
+    • Lookups are case & surrounding-whitespace insensitive, the validators hand back the value as spelled in the yaml
+      (ex: ' Private_Job' -> 'private_job'), which is what the model was trained on.
+"""
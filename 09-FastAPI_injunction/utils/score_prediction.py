@@ -1,14 +1,67 @@
-import pandas as pd
-from pandas import DataFrame
-from typing import Dict, Any
-from sklearn.base import BaseEstimator
-
-def predict_output(data_dict: Dict[str, Any], sk_model: BaseEstimator) -> str:
-    
-    input_df: DataFrame = pd.DataFrame( [data_dict] )
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple
+
+# pandas & scikit-learn are imported by the pipeline path only: a pod serving a compiled model (utils/compiled_scorer.py) never loads them
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from sklearn.base import BaseEstimator
+    from .fast_scoring import FastScorer
+    from .compiled_scorer import CompiledScorer
+
+# order of the derived features the insurance pipeline was trained on
+MODEL_FEATURES: Tuple[str, ...] = ('income_lpa',
+                                   'occupation',
+                                   'bmi',
+                                   'lifestyle_risk',
+                                   'city_tier',
+                                   'age_group')
+
+
+def extract_model_features(user_input: Any) -> Dict[str, Any]:
+    # 'user_input' is a validated UserInputFeatures obj, reading the attrs evaluates its computed fields
+    return {feature: getattr(user_input, feature) for feature in MODEL_FEATURES}
+
+
+def predict_output(data_dict: Dict[str, Any], sk_model: 'BaseEstimator') -> str:
+    import pandas as pd
+
+    input_df: 'DataFrame' = pd.DataFrame( [data_dict] )
     return sk_model.predict(input_df)[0]
 
 
+def predict_output_batch(data_dicts: List[Dict[str, Any]], sk_model: 'BaseEstimator') -> List[str]:
+    import pandas as pd
+
+    # one DataFrame & one predict() call for the whole batch, predictions come back in input order
+    input_df: 'DataFrame' = pd.DataFrame(data_dicts,
+                                       columns=list(MODEL_FEATURES))
+    return sk_model.predict(input_df).tolist()
+
+
+def predict_output_isolated(data_dicts: List[Dict[str, Any]],
+                            sk_model: 'BaseEstimator | None',
+                            fast_scorer: 'FastScorer | CompiledScorer | None' = None) -> List[str | Exception]:
+
+    if fast_scorer is not None:
+        return fast_scorer.predict_isolated(data_dicts)
+
+    try:
+        return predict_output_batch(data_dicts, sk_model)   # type: ignore
+
+    except Exception:
+        # a single bad row (ex: a category unseen during training) fails the vectorized call,
+        # so re-score row by row and hand back the exception only for the rows that failed
+        results: List[str | Exception] = []
+
+        for data_dict in data_dicts:
+            try:
+                results.append(predict_output(data_dict, sk_model))
+
+            except Exception as ex:
+                results.append(ex)
+
+        return results
+
+
 """
     • `input_df` is a single-row pandas DataFrame built from `data_dict` in 9-5-model_prediction.py file.
 
@@ -21,4 +74,7 @@ def predict_output(data_dict: Dict[str, Any], sk_model: BaseEstimator) -> str:
 
     • input_df is like `X_test` with exactly 1 sample (a single inference request).
 
-"""
\ No newline at end of file
+    • predict_output_batch(...) is the same idea with `X_test` holding N samples, so the per-call overhead
+      (DataFrame construction, column checks, estimator dispatch) is paid once per batch instead of once per row.
+
+"""
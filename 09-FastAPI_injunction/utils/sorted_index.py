@@ -0,0 +1,155 @@
+import json
+import heapq
+import base64
+import binascii
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+# sort key of a patient: (value of the field, patient id), the id breaks ties so every key is unique & a cursor is exact
+SortKey = Tuple[Any, str]
+
+
+def sort_key(patient_id: str, record: Mapping[str, Any], field: str) -> SortKey:
+    return record.get(field, 0), patient_id          # missing field sorts as 0, like the former sorted(key=x.get(sort_by, 0))
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> SortKey:
+
+    try:
+        value, patient_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+    except (binascii.Error, ValueError, TypeError) as err:
+        raise ValueError(f'Invalid cursor: {err}')
+
+    if not isinstance(patient_id, str) or not isinstance(value, (int, float)):
+        raise ValueError('Invalid cursor')
+
+    return value, patient_id
+
+
+def top_k(records: Mapping[str, Mapping[str, Any]], field: str, k: int, descending: bool) -> List[SortKey]:
+
+    # 1st page without an index: O(n log k) heap instead of an O(n log n) full sort
+    keys: Iterable[SortKey] = (sort_key(patient_id, record, field) for patient_id, record in records.items())
+    return heapq.nlargest(k, keys) if descending else heapq.nsmallest(k, keys)
+
+
+class SortedIndex:
+    """
+    Secondary index of 1 field: every patient's SortKey in a list kept sorted with bisect.
+    Built once in O(n log n), then upsert() / remove() keep it current (O(log n) search + list shift),
+    & a page is a slice starting at the cursor's position, not a sort of the whole dataset.
+    """
+
+    def __init__(self, field: str, records: Mapping[str, Mapping[str, Any]]) -> None:
+
+        self.field = field
+        self._key_by_id: Dict[str, SortKey] = {patient_id: sort_key(patient_id, record, field)
+                                               for patient_id, record in records.items()}
+        self._keys: List[SortKey] = sorted(self._key_by_id.values())
+
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+    def upsert(self, patient_id: str, record: Mapping[str, Any]) -> None:
+
+        new_key: SortKey = sort_key(patient_id, record, self.field)
+        old_key: SortKey | None = self._key_by_id.get(patient_id)
+
+        if old_key == new_key:
+            return
+
+        if old_key is not None:
+            del self._keys[bisect_left(self._keys, old_key)]
+
+        insort(self._keys, new_key)
+        self._key_by_id[patient_id] = new_key
+
+
+    def remove(self, patient_id: str) -> None:
+
+        old_key: SortKey | None = self._key_by_id.pop(patient_id, None)
+
+        if old_key is not None:
+            del self._keys[bisect_left(self._keys, old_key)]
+
+
+    def page(self, descending: bool, limit: int | None = None, after: SortKey | None = None) -> List[SortKey]:
+
+        # keys following 'after' (the last key of the previous page) in the requested order
+        if descending:
+            end: int = bisect_left(self._keys, after) if after is not None else len(self._keys)
+            start: int = max(end - limit, 0) if limit is not None else 0
+            return self._keys[start:end][::-1]
+
+        start = bisect_right(self._keys, after) if after is not None else 0
+        return self._keys[start:start + limit] if limit is not None else self._keys[start:]
+
+
+class PatientIndexes:
+    """
+    SortedIndex per sortable field, each built on its 1st use. 'sync()' applies a new version of the records:
+    only the patients that were added, changed or removed touch the built indexes.
+    """
+
+    def __init__(self, fields: Iterable[str], records: Mapping[str, Mapping[str, Any]]) -> None:
+
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self._records: Mapping[str, Mapping[str, Any]] = records
+        self._indexes: Dict[str, SortedIndex] = {}
+
+
+    def get(self, field: str) -> SortedIndex | None:
+        return self._indexes.get(field)
+
+
+    def build(self, field: str) -> SortedIndex:
+
+        if field not in self._indexes:
+            self._indexes[field] = SortedIndex(field, self._records)
+
+        return self._indexes[field]
+
+
+    def upsert(self, patient_id: str, record: Mapping[str, Any]) -> None:
+        for index in self._indexes.values():
+            index.upsert(patient_id, record)
+
+
+    def remove(self, patient_id: str) -> None:
+        for index in self._indexes.values():
+            index.remove(patient_id)
+
+
+    def sync(self, records: Mapping[str, Mapping[str, Any]]) -> int:
+
+        # returns how many patients changed
+        previous: Mapping[str, Mapping[str, Any]] = self._records
+        changed: int = 0
+
+        for patient_id in previous.keys() - records.keys():
+            self.remove(patient_id)
+            changed += 1
+
+        for patient_id, record in records.items():
+            if previous.get(patient_id) != record:
+                self.upsert(patient_id, record)
+                changed += 1
+
+        self._records = records
+        return changed
+
+
+"""
+    • Ties are ordered by patient id (descending pages: reverse id order), the same order top_k() returns,
+      so the 1st page doesn't change when the index gets built between 2 requests.
+
+    • A cursor is the SortKey of the last patient of the previous page (base64 json), it stays valid when patients are
+      added or removed in between: the next page starts right after that key.
+"""
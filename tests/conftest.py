@@ -0,0 +1,79 @@
+"""
+Shared fixtures. The 9-6 SQLModel app builds its engine from DATABASE_URL when it's imported: the import points it at
+a throwaway database (never patient_database.db in the working directory) & every test gets a fresh database of its own.
+The 9-1 / 9-2 apps read patient_data.json next to them: every test points them at a copy of its own.
+"""
+import importlib
+import pytest
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterator
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel
+
+# patient_data.json of the 9-1 / 9-2 tests: ties on weight & bmi, P004 without bmi (sorts as 0)
+PATIENTS: Dict[str, Dict[str, Any]] = {
+    'P003': {'name': 'Raj', 'city': 'Pune', 'age': 48, 'gender': 'male', 'height': 1.80, 'weight': 80.0, 'bmi': 24.69},
+    'P001': {'name': 'Ananya Verma', 'city': 'Guwahati', 'age': 28, 'gender': 'female', 'height': 1.65, 'weight': 90.0, 'bmi': 33.06},
+    'P005': {'name': 'Mira', 'city': 'Delhi', 'age': 35, 'gender': 'female', 'height': 1.60, 'weight': 63.0, 'bmi': 24.61},
+    'P002': {'name': 'Karan', 'city': 'Mumbai', 'age': 31, 'gender': 'male', 'height': 1.80, 'weight': 80.0, 'bmi': 24.69},
+    'P004': {'name': 'Neha', 'city': 'Chennai', 'age': 52, 'gender': 'female', 'height': 1.55, 'weight': 63.0},
+    'P006': {'name': 'Vikram', 'city': 'Kochi', 'age': 44, 'gender': 'male', 'height': 1.75, 'weight': 80.0, 'bmi': 26.12},
+}
+
+
+@pytest.fixture(scope='session')
+def sqlmodel_app(tmp_path_factory: pytest.TempPathFactory) -> ModuleType:
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('DATABASE_URL', f"sqlite:///{tmp_path_factory.mktemp('import') / 'patient_database.db'}")
+        patch.setenv('DATABASE_ECHO', 'false')
+        return importlib.import_module('09-FastAPI_injunction.9-6-sqlmodel_data_operations')
+
+
+@pytest.fixture
+def sqlmodel_engine(sqlmodel_app: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Engine]:
+
+    database = importlib.import_module('09-FastAPI_injunction.utils.database')
+    engine: Engine = database.create_db_engine(database.DatabaseSettings(url=f"sqlite:///{tmp_path / 'patient_database.db'}",
+                                                                         echo=False))
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(sqlmodel_app, 'engine', engine)         # read by get_session() on every request
+
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlmodel_client(sqlmodel_app: ModuleType, sqlmodel_engine: Engine) -> Iterator[TestClient]:
+    with TestClient(sqlmodel_app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def patients_json(tmp_path: Path) -> Path:
+    path: Path = tmp_path / 'patient_data.json'
+    load_update_data = importlib.import_module('09-FastAPI_injunction.utils.load_update_data')
+    load_update_data.write_json_atomic(path, PATIENTS)
+    return path
+
+
+@pytest.fixture
+def display_app(patients_json: Path, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+
+    module: ModuleType = importlib.import_module('09-FastAPI_injunction.9-1-display_json_route')
+    monkeypatch.setattr(module, 'json_file_path', patients_json)
+    return module
+
+
+@pytest.fixture
+def path_query_app(patients_json: Path, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+
+    # data, file key & indexes start empty: the 1st request loads the copy like a rewrite of the file would
+    module: ModuleType = importlib.import_module('09-FastAPI_injunction.9-2-path_query_params')
+    monkeypatch.setattr(module, 'json_file_path', patients_json)
+    monkeypatch.setattr(module, 'patient_data', {})
+    monkeypatch.setattr(module, 'patient_data_file_key', None)
+    monkeypatch.setattr(module, 'patient_indexes', module.PatientIndexes(module.valid_sorted_fields, {}))
+    return module
@@ -0,0 +1,103 @@
+"""
+POST /create_patient/bulk (9-6): chunked inserts, duplicates in the payload & in the database, the retry when a
+concurrent request creates an id of the chunk, & the per-patient created / conflict / failed results.
+"""
+import sqlite3
+import pytest
+from types import ModuleType
+from typing import Any, Dict, List
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+PATIENT: Dict[str, Any] = {'name': 'James Bond', 'city': 'London', 'age': 40, 'gender': 'male', 'height': 1.83, 'weight': 85}
+
+
+def payload(*patient_ids: str) -> List[Dict[str, Any]]:
+    return [{**PATIENT, 'id': patient_id} for patient_id in patient_ids]
+
+
+def statuses(response_json: Dict[str, Any]) -> List[str]:
+    return [result['status'] for result in response_json['results']]
+
+
+def stored_ids(client: TestClient) -> List[str]:
+    return sorted(patient['patient_id'] for patient in client.get('/patients', params={'limit': 100}).json())
+
+
+def create_concurrently(engine: Engine, patient_ids: List[str]) -> None:
+
+    # right before the bulk INSERT of a chunk holding the next id of 'patient_ids', another connection creates that id
+    database: str = str(engine.url.database)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def race(connection: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        rows = parameters if executemany else [parameters]
+
+        if statement.startswith('INSERT') and patient_ids and any(patient_ids[0] in row for row in rows):
+            with sqlite3.connect(database, timeout=5) as other:
+                other.execute("INSERT INTO patients (patient_id, name, city, age, gender, height, weight, version) "
+                              "VALUES (?, 'Other', 'Pune', 30, 'male', 1.7, 70, 1)", (patient_ids.pop(0),))
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(sqlmodel_app: ModuleType, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sqlmodel_app, 'BULK_CHUNK_SIZE', 2)
+
+
+def test_duplicates_in_payload_and_database_across_chunks(sqlmodel_client: TestClient) -> None:
+
+    assert sqlmodel_client.post('/create_patient', json={**PATIENT, 'id': 'P002'}).status_code == 201
+
+    # chunks of 2: [P001, P002] [P003, P001] [P004, P003] [P005]
+    response = sqlmodel_client.post('/create_patient/bulk', json=payload('P001', 'P002', 'P003', 'P001', 'P004', 'P003', 'P005'))
+
+    assert response.status_code == 200
+    assert statuses(response.json()) == ['created', 'conflict', 'created', 'conflict', 'created', 'conflict', 'created']
+    assert [result['index'] for result in response.json()['results']] == list(range(7))
+    assert {key: response.json()[key] for key in ('created', 'conflicts', 'failed')} == {'created': 4, 'conflicts': 3, 'failed': 0}
+    assert stored_ids(sqlmodel_client) == ['P001', 'P002', 'P003', 'P004', 'P005']
+
+    # sent again: everything exists now
+    again = sqlmodel_client.post('/create_patient/bulk', json=payload('P001', 'P005', 'P006'))
+    assert statuses(again.json()) == ['conflict', 'conflict', 'created']
+
+
+def test_empty_payload(sqlmodel_client: TestClient) -> None:
+    response = sqlmodel_client.post('/create_patient/bulk', json=[])
+    assert response.json() == {'created': 0, 'conflicts': 0, 'failed': 0, 'results': []}
+
+
+def test_id_created_concurrently_is_retried_as_conflict(sqlmodel_client: TestClient, sqlmodel_engine: Engine) -> None:
+
+    create_concurrently(sqlmodel_engine, ['P003'])
+    response = sqlmodel_client.post('/create_patient/bulk', json=payload('P001', 'P002', 'P003', 'P004'))
+
+    assert statuses(response.json()) == ['created', 'created', 'conflict', 'created']
+    assert stored_ids(sqlmodel_client) == ['P001', 'P002', 'P003', 'P004']
+
+
+def test_chunk_racing_every_attempt_fails_alone(sqlmodel_app: ModuleType, sqlmodel_client: TestClient, sqlmodel_engine: Engine,
+                                                monkeypatch: pytest.MonkeyPatch) -> None:
+
+    monkeypatch.setattr(sqlmodel_app, 'BULK_CHUNK_SIZE', 3)
+    create_concurrently(sqlmodel_engine, ['P004', 'P005', 'P006'])      # 1 per attempt on chunk 2
+
+    response = sqlmodel_client.post('/create_patient/bulk', json=payload('P001', 'P002', 'P003', 'P004', 'P005', 'P006', 'P007'))
+
+    # chunks before & after the failed one are committed & reported
+    assert statuses(response.json()) == ['created'] * 3 + ['failed'] * 3 + ['created']
+    assert {key: response.json()[key] for key in ('created', 'conflicts', 'failed')} == {'created': 4, 'conflicts': 0, 'failed': 3}
+    assert stored_ids(sqlmodel_client) == ['P001', 'P002', 'P003', 'P004', 'P005', 'P006', 'P007']
+
+
+def test_other_integrity_errors_are_not_retried(sqlmodel_app: ModuleType, sqlmodel_engine: Engine) -> None:
+
+    with sqlmodel_engine.begin() as connection:
+        connection.execute(text("CREATE TRIGGER reject_name BEFORE INSERT ON patients WHEN NEW.name = 'Reject' "
+                                "BEGIN SELECT RAISE(ABORT, 'CHECK constraint failed: name'); END"))
+
+    with TestClient(sqlmodel_app.app, raise_server_exceptions=False) as client:
+        response = client.post('/create_patient/bulk', json=payload('P001', 'P002') + [{**PATIENT, 'id': 'P003', 'name': 'Reject'}])
+        assert response.status_code == 500
+        assert stored_ids(client) == ['P001', 'P002']             # the 1st chunk was committed before the error
@@ -0,0 +1,47 @@
+"""
+FastScorer (utils/fast_scoring.py) against the DataFrame based predict_output(): every row of health_insurance.csv
+must get the same prediction from both paths.
+"""
+import importlib
+import pandas as pd
+import pytest
+from pathlib import Path
+from typing import Any, Dict, List
+
+utils = importlib.import_module('09-FastAPI_injunction.utils')
+fast_scoring = importlib.import_module('09-FastAPI_injunction.utils.fast_scoring')
+feature_engineering = importlib.import_module('09-FastAPI_injunction.utils.feature_engineering')
+
+csv_file_path: Path = Path(__file__).parent.parent / '09-FastAPI_injunction' / 'health_insurance.csv'
+
+
+@pytest.fixture(scope='module')
+def sk_model() -> Any:
+    return utils.load_model()
+
+
+@pytest.fixture(scope='module')
+def feature_rows() -> List[Dict[str, Any]]:
+
+    # no validation: the csv holds the occupations the model was trained on,
+    # which differ from the ones listed in user_input_literals.yaml
+    return feature_engineering.derive_model_features(pd.read_csv(csv_file_path)).to_dict(orient='records')
+
+
+def test_pipeline_layout_is_supported(sk_model: Any) -> None:
+    assert fast_scoring.build_fast_scorer(sk_model) is not None
+
+
+def test_fast_path_matches_dataframe_path(sk_model: Any, feature_rows: List[Dict[str, Any]]) -> None:
+
+    fast_scorer = fast_scoring.build_fast_scorer(sk_model)
+    mismatches: List[int] = [index for index, data_dict in enumerate(feature_rows)
+                             if utils.predict_output(data_dict, sk_model) != fast_scorer.predict(data_dict)]
+
+    assert not mismatches, f'Fast path disagrees with the DataFrame path on rows {mismatches}'
+
+
+def test_isolated_scoring_matches_batch(sk_model: Any, feature_rows: List[Dict[str, Any]]) -> None:
+
+    fast_scorer = fast_scoring.build_fast_scorer(sk_model)
+    assert fast_scorer.predict_isolated(feature_rows) == utils.predict_output_batch(feature_rows, sk_model)
@@ -0,0 +1,125 @@
+"""
+utils/feature_engineering.derive_model_features() must return exactly what UserInputFeatures' computed fields return,
+on every row of health_insurance.csv, hand picked edge cases (thresholds, rounding, city & occupation spelling) & random rows.
+"""
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+from pandas import DataFrame
+from typing import Any, Callable, Dict, List, Tuple
+
+models = importlib.import_module('09-FastAPI_injunction.models')
+score_prediction = importlib.import_module('09-FastAPI_injunction.utils.score_prediction')
+feature_engineering = importlib.import_module('09-FastAPI_injunction.utils.feature_engineering')
+reference_data = importlib.import_module('09-FastAPI_injunction.utils.reference_data').reference_data
+
+csv_file_path: Path = Path(__file__).parent.parent / '09-FastAPI_injunction' / 'health_insurance.csv'
+
+RANDOM_ROWS: int = 10_000
+
+EDGE_CASES: List[Dict[str, Any]] = [
+    # age_group boundaries
+    {'age': 24, 'height': 1.75, 'weight': 70.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Mumbai', 'occupation': 'student'},
+    {'age': 25, 'height': 1.75, 'weight': 70.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Mumbai', 'occupation': 'student'},
+    {'age': 45, 'height': 1.75, 'weight': 70.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Mumbai', 'occupation': 'private_job'},
+    {'age': 59, 'height': 1.75, 'weight': 70.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Mumbai', 'occupation': 'private_job'},
+    {'age': 60, 'height': 1.75, 'weight': 70.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Mumbai', 'occupation': 'retired'},
+    {'age': 119, 'height': 1.75, 'weight': 70.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Mumbai', 'occupation': 'retired'},
+
+    # bmi exactly on / just around the lifestyle_risk thresholds after rounding (27.0, 27.01, 30.0, 30.01)
+    {'age': 30, 'height': 1.0, 'weight': 27.0, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 27.004, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 27.005, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 27.006, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 30.0, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 30.005, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 30.01, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.0, 'weight': 35.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Pune', 'occupation': 'business'},
+    {'age': 30, 'height': 1.6, 'weight': 76.8, 'income_lpa': 5.0, 'smoker': True, 'city': 'Pune', 'occupation': 'business'},
+
+    # city spelling: normalized with strip().title(), unknown cities are tier 3
+    {'age': 30, 'height': 1.7, 'weight': 60.0, 'income_lpa': 5.0, 'smoker': False, 'city': '  mumbai ', 'occupation': 'govt_job'},
+    {'age': 30, 'height': 1.7, 'weight': 60.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'JAIPUR', 'occupation': 'govt_job'},
+    {'age': 30, 'height': 1.7, 'weight': 60.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'new york', 'occupation': 'govt_job'},
+    {'age': 30, 'height': 1.7, 'weight': 60.0, 'income_lpa': 5.0, 'smoker': False, 'city': '', 'occupation': 'unemployed'},
+
+    # extreme heights / weights
+    {'age': 30, 'height': 0.01, 'weight': 500.0, 'income_lpa': 0.01, 'smoker': True, 'city': 'Delhi', 'occupation': 'freelancer'},
+    {'age': 30, 'height': 2.49, 'weight': 0.1, 'income_lpa': 1e6, 'smoker': True, 'city': 'Delhi', 'occupation': 'freelancer'},
+]
+
+# occupation spelling: the validator maps it to the yaml's spelling after strip().casefold()
+OCCUPATION_CASES: List[Dict[str, Any]] = [
+    {'age': 30, 'height': 1.7, 'weight': 60.0, 'income_lpa': 5.0, 'smoker': False, 'city': 'Pune', 'occupation': occupation}
+    for occupation in ('Private_Job', 'PRIVATE_JOB', '  student ', '\tretired\n', 'Govt_Job ', ' BUSINESS', 'Unemployed', 'freelancer')
+]
+
+# spellings the random rows draw their occupations with
+OCCUPATION_SPELLINGS: Tuple[Callable[[str], str], ...] = (str, str.upper, str.title, lambda value: f'  {value} ', lambda value: f'\t{value.upper()}')
+
+
+def random_rows(n_rows: int, seed: int = 42) -> DataFrame:
+
+    rng = np.random.default_rng(seed)
+    literals = reference_data.current()
+    cities: List[str] = [*literals.tier_1_cities, *literals.tier_2_cities, 'Springfield']
+
+    return pd.DataFrame({
+        'age': rng.integers(1, 120, n_rows),
+        'height': rng.uniform(1.2, 2.2, n_rows).round(2),
+        'weight': rng.uniform(30, 160, n_rows).round(1),
+        'income_lpa': rng.uniform(0.5, 60, n_rows).round(2),
+        'smoker': rng.integers(0, 2, n_rows).astype(bool),
+        'city': [cities[index] for index in rng.integers(0, len(cities), n_rows)],
+        'occupation': [OCCUPATION_SPELLINGS[spelling](literals.occupations[occupation])
+                       for occupation, spelling in zip(rng.integers(0, len(literals.occupations), n_rows),
+                                                       rng.integers(0, len(OCCUPATION_SPELLINGS), n_rows))]
+    })
+
+
+def expected_features(raw_df: DataFrame) -> DataFrame:
+
+    rows: List[Dict[str, Any]] = []
+
+    for row in raw_df[list(feature_engineering.RAW_FEATURES)].to_dict(orient='records'):
+        # model_construct() skips the validators (the csv's occupations aren't all in the yaml), so apply them by hand:
+        # the city one always, the occupation one to the occupations it accepts
+        if reference_data.current().canonical_occupation(row['occupation']) is not None:
+            row['occupation'] = models.UserInputFeatures.validate_occupation(row['occupation'])
+
+        user_input = models.UserInputFeatures.model_construct(**{**row, 'city': models.UserInputFeatures.normalize_city_name(row['city'])})
+        rows.append(score_prediction.extract_model_features(user_input))
+
+    return pd.DataFrame(rows, columns=list(score_prediction.MODEL_FEATURES), index=raw_df.index)
+
+
+@pytest.mark.parametrize('label', ['csv', 'edge case', 'random'])
+def test_vectorized_features_match_model(label: str) -> None:
+
+    raw_df: DataFrame = {'csv': lambda: pd.read_csv(csv_file_path),
+                         'edge case': lambda: pd.DataFrame(EDGE_CASES),
+                         'random': lambda: random_rows(RANDOM_ROWS)}[label]()
+
+    expected: DataFrame = expected_features(raw_df)
+    derived: DataFrame = feature_engineering.derive_model_features(raw_df)
+
+    for feature in score_prediction.MODEL_FEATURES:
+        # exact comparison, python objects on both sides (no float tolerance, 1 != 1.0 type slips are caught by the type check)
+        mismatches: List[int] = [position for position, (left, right) in enumerate(zip(expected[feature].tolist(), derived[feature].tolist()))
+                                 if left != right or type(left) is not type(right)]
+
+        assert not mismatches, (f'{label}: {feature!r} differs on {len(mismatches)} rows, 1st at row {mismatches[0]}: '
+                                f'model={expected[feature].iloc[mismatches[0]]!r} vectorized={derived[feature].iloc[mismatches[0]]!r}')
+
+
+def test_occupation_spelling_matches_validation() -> None:
+
+    # expected values from real validation (UserInputFeatures(**row)), not model_construct()
+    expected: List[Dict[str, Any]] = [score_prediction.extract_model_features(models.UserInputFeatures(**row)) for row in OCCUPATION_CASES]
+    derived: List[Dict[str, Any]] = feature_engineering.derive_model_features(pd.DataFrame(OCCUPATION_CASES)).to_dict(orient='records')
+
+    assert derived == expected
+    assert [features['occupation'] for features in derived] == ['private_job', 'private_job', 'student', 'retired',
+                                                               'govt_job', 'business', 'unemployed', 'freelancer']
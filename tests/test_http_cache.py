@@ -0,0 +1,151 @@
+"""
+ETags & If-None-Match: utils/http_cache.etag_matches(), then the ETag value & the 304 of GET /patients (9-1, file stat),
+GET /patients/{patient_id} (9-2, record hash) & GET /patients/{patient_id} (9-6, '"<row id>-<version>"' from the database).
+"""
+import importlib
+import pytest
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict
+from fastapi.testclient import TestClient
+
+http_cache = importlib.import_module('09-FastAPI_injunction.utils.http_cache')
+load_update_data = importlib.import_module('09-FastAPI_injunction.utils.load_update_data')
+
+ETAG: str = '"1a-2b-3c"'
+PATIENT: Dict[str, Any] = {'name': 'James Bond', 'city': 'London', 'age': 40, 'gender': 'male', 'height': 1.83, 'weight': 85}
+
+
+def weak(etag: str) -> str:
+    return f'W/{etag}'
+
+
+@pytest.mark.parametrize('if_none_match, expected', [
+    (None, False),
+    (ETAG, True),
+    (weak(ETAG), True),                                 # weak comparison
+    (f'"other", {ETAG}', True),
+    (f'"other",{weak(ETAG)}', True),
+    ('*', True),
+    (' * ', True),
+    ('"other"', False),
+    ('"1a-2b"', False),
+    (ETAG.strip('"'), False),                           # unquoted
+    ('', False),
+])
+def test_etag_matches(if_none_match: str | None, expected: bool) -> None:
+    assert http_cache.etag_matches(if_none_match, ETAG) is expected
+
+
+def test_not_modified_carries_the_etag() -> None:
+    response = http_cache.not_modified(ETAG)
+    assert response.status_code == 304
+    assert response.headers['ETag'] == ETAG
+    assert response.headers['Cache-Control'] == http_cache.CACHE_CONTROL
+    assert response.body == b''
+
+
+@pytest.mark.parametrize('params', [{}, {'limit': 2}, {'offset': 1, 'format': 'ndjson'}])
+def test_display_etag_is_the_file_stat_and_changes_with_the_file(display_app: ModuleType, patients_json: Path,
+                                                                  params: Dict[str, Any]) -> None:
+    client = TestClient(display_app.app)
+
+    response = client.get('/patients', params=params)
+    etag: str = response.headers['ETag']
+    assert response.status_code == 200
+    assert etag == http_cache.file_etag(patients_json)
+
+    for if_none_match in (etag, weak(etag), f'"other", {etag}', '*'):
+        cached = client.get('/patients', params=params, headers={'If-None-Match': if_none_match})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+        assert cached.content == b''
+
+    # any rewrite of the file: new ETag, the old one gets the full body again
+    load_update_data.write_json_atomic(patients_json, {'P001': PATIENT})
+    changed = client.get('/patients', params=params, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] == http_cache.file_etag(patients_json) != etag
+
+
+def test_display_missing_file_is_404_even_with_if_none_match(display_app: ModuleType, patients_json: Path) -> None:
+    patients_json.unlink()
+    assert TestClient(display_app.app).get('/patients', headers={'If-None-Match': '*'}).status_code == 404
+
+
+def test_patient_etag_is_the_record_hash(path_query_app: ModuleType, patients_json: Path) -> None:
+    client = TestClient(path_query_app.app)
+
+    response = client.get('/patients/P001')
+    etag: str = response.headers['ETag']
+    assert response.status_code == 200
+    assert etag == http_cache.record_etag(response.json())
+
+    for if_none_match in (etag, weak(etag), f'"other", {weak(etag)}'):
+        assert client.get('/patients/P001', headers={'If-None-Match': if_none_match}).status_code == 304
+
+    assert client.get('/patients/P002', headers={'If-None-Match': etag}).status_code == 200
+
+    # another patient changed: P001's ETag stays, P002's changes
+    other_etag: str = client.get('/patients/P002').headers['ETag']
+    patients: Dict[str, Dict[str, Any]] = path_query_app.patient_data
+    load_update_data.write_json_atomic(patients_json, {**patients, 'P002': {**patients['P002'], 'weight': 81.0}})
+
+    assert client.get('/patients/P001', headers={'If-None-Match': etag}).status_code == 304
+    changed = client.get('/patients/P002', headers={'If-None-Match': other_etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != other_etag
+    assert changed.json()['weight'] == 81.0
+
+
+def test_mmap_patient_etag_is_the_stored_line_hash(path_query_app: ModuleType, patients_json: Path,
+                                                   monkeypatch: pytest.MonkeyPatch) -> None:
+
+    # PATIENT_MMAP_ENABLED=true: the .ndjson / .index pair is built next to the copy on the 1st request
+    monkeypatch.setattr(path_query_app, 'PATIENT_MMAP_ENABLED', True)
+    monkeypatch.setattr(path_query_app, 'patient_mmap', None)
+    client = TestClient(path_query_app.app)
+
+    response = client.get('/patients/P001')
+    etag: str = response.headers['ETag']
+    assert response.status_code == 200
+    assert etag == http_cache.content_etag(response.content)
+
+    for if_none_match in (etag, weak(etag), f'"other", {etag}'):
+        assert client.get('/patients/P001', headers={'If-None-Match': if_none_match}).status_code == 304
+
+    load_update_data.write_json_atomic(patients_json, {'P001': {**response.json(), 'weight': 91.0}})
+    changed = client.get('/patients/P001', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert client.get('/patients/P002', headers={'If-None-Match': '*'}).status_code == 404
+
+
+def test_sqlmodel_etag_is_row_id_and_version(sqlmodel_client: TestClient) -> None:
+
+    created = sqlmodel_client.post('/create_patient', json={**PATIENT, 'id': 'P001'}).json()
+    response = sqlmodel_client.get('/patients/P001')
+    etag: str = response.headers['ETag']
+    assert etag == f'"{created["id"]:x}-1"'
+
+    for if_none_match in (etag, weak(etag), f'"other", {etag}', '*'):
+        cached = sqlmodel_client.get('/patients/P001', headers={'If-None-Match': if_none_match})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+
+    # every update bumps the version: new ETag, the old one gets a 200
+    assert sqlmodel_client.patch('/update_patient/P001', json={'weight': 86}).json()['version'] == 2
+    updated = sqlmodel_client.get('/patients/P001', headers={'If-None-Match': etag})
+    assert updated.status_code == 200
+    assert updated.headers['ETag'] == f'"{created["id"]:x}-2"'
+    assert updated.json()['weight'] == 86
+
+    # deleted & created again: a new row id, the ETag of the old row never matches the new one
+    assert sqlmodel_client.delete('/delete_patient/P001').status_code == 204
+    assert sqlmodel_client.get('/patients/P001', headers={'If-None-Match': updated.headers['ETag']}).status_code == 404
+
+    recreated = sqlmodel_client.post('/create_patient', json={**PATIENT, 'id': 'P001'}).json()
+    assert recreated['id'] != created['id']
+    again = sqlmodel_client.get('/patients/P001', headers={'If-None-Match': etag})
+    assert again.status_code == 200
+    assert again.headers['ETag'] == f'"{recreated["id"]:x}-1"'
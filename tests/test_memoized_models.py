@@ -0,0 +1,159 @@
+"""
+models/patient_models.MemoizedComputedModel: computed fields cached in the instance __dict__ are dropped & recomputed
+when a field they derive from is assigned or replaced by model_copy(update=...), & the cache never shows up in
+dict(model), ==, or a pickle.
+"""
+import copy
+import pickle
+import importlib
+import pytest
+from typing import Any, Dict, List
+
+patient_models = importlib.import_module('09-FastAPI_injunction.models.patient_models')
+
+FEATURES: Dict[str, Any] = {'age': 30, 'height': 1.75, 'weight': 70.0, 'income_lpa': 12.0, 'smoker': True,
+                            'city': 'Mumbai', 'occupation': 'private_job'}
+PATIENT: Dict[str, Any] = {'id': 'P001', 'name': 'Ananya Verma', 'city': 'Guwahati', 'age': 28, 'gender': 'female',
+                           'height': 1.65, 'weight': 90.0}
+COMPUTED: List[str] = ['bmi', 'lifestyle_risk', 'city_tier', 'age_group']
+
+
+def features(**update: Any) -> Any:
+    return patient_models.UserInputFeatures(**{**FEATURES, **update})
+
+
+def cached(model: Any) -> List[str]:
+    return [name for name in model.__pydantic_computed_fields__ if name in model.__dict__]
+
+
+def read_all(model: Any) -> Dict[str, Any]:
+    return {name: getattr(model, name) for name in model.__pydantic_computed_fields__}
+
+
+def test_computed_fields_are_cached_on_first_read() -> None:
+
+    model = features()
+    assert cached(model) == []
+
+    assert model.lifestyle_risk == 'low'            # reads bmi too
+    assert sorted(cached(model)) == ['bmi', 'lifestyle_risk']
+
+    read_all(model)
+    assert sorted(cached(model)) == sorted(COMPUTED)
+
+
+@pytest.mark.parametrize('field, value, dropped', [
+    ('weight', 95.0, ['bmi', 'lifestyle_risk']),
+    ('height', 1.60, ['bmi', 'lifestyle_risk']),
+    ('smoker', False, ['lifestyle_risk']),
+    ('city', 'Jaipur', ['city_tier']),
+    ('age', 50, ['age_group']),
+    ('income_lpa', 30.0, []),
+])
+def test_assignment_drops_only_the_dependent_cached_fields(field: str, value: Any, dropped: List[str]) -> None:
+
+    model = features()
+    read_all(model)
+    setattr(model, field, value)
+
+    assert sorted(set(COMPUTED) - set(cached(model))) == sorted(dropped)
+    assert read_all(model) == read_all(features(**{field: value}))
+
+
+def test_assignment_recomputes_chained_computed_fields() -> None:
+
+    model = features()
+    assert (model.bmi, model.lifestyle_risk, model.city_tier) == (22.86, 'low', 1)
+
+    model.weight = 95.0
+    assert (model.bmi, model.lifestyle_risk) == (31.02, 'high')
+
+    model.city = 'Jaipur'
+    assert model.city_tier == 2
+    assert model.model_dump() == features(weight=95.0, city='Jaipur').model_dump()
+
+
+def test_model_copy_update_recomputes_the_copy_only() -> None:
+
+    model = features()
+    read_all(model)
+
+    heavier = model.model_copy(update={'weight': 95.0})
+    assert (heavier.bmi, heavier.lifestyle_risk) == (31.02, 'high')
+    assert heavier.city_tier == 1
+    assert (model.bmi, model.lifestyle_risk) == (22.86, 'low')
+
+    # a field without cached dependents keeps the copied cache, a plain copy keeps all of it
+    assert sorted(cached(model.model_copy(update={'income_lpa': 30.0}))) == sorted(COMPUTED)
+    assert read_all(model.model_copy()) == read_all(model)
+
+    deep = model.model_copy(update={'age': 70, 'city': 'Jaipur'}, deep=True)
+    assert (deep.age_group, deep.city_tier) == ('senior', 2)
+
+
+def test_common_model_assignment_and_copy() -> None:
+
+    patient = patient_models.Patient(**PATIENT)
+    assert (patient.bmi, patient.verdict) == (33.06, 'Obese')
+
+    patient.weight = 60.0
+    assert (patient.bmi, patient.verdict) == (22.04, 'Normal')
+
+    taller = patient.model_copy(update={'height': 1.20})
+    assert (taller.bmi, taller.verdict) == (41.67, 'Obese')
+    assert patient.verdict == 'Normal'
+
+
+def test_iteration_lists_fields_only_while_model_dump_has_computed_fields() -> None:
+
+    model = features()
+    read_all(model)
+
+    assert dict(model) == features().model_dump(exclude=set(COMPUTED))
+    assert set(model.model_dump()) == set(FEATURES) | set(COMPUTED)
+
+
+def test_equality_ignores_the_cache() -> None:
+
+    model, fresh = features(), features()
+    read_all(model)
+
+    assert model == fresh
+    assert fresh == model
+    assert model != features(weight=71.0)
+
+    # same fields again after a change & its revert, with a cache filled in between
+    model.weight = 95.0
+    read_all(model)
+    model.weight = 70.0
+    assert model == fresh
+
+
+@pytest.mark.parametrize('make', [features, lambda: patient_models.Patient(**PATIENT)])
+def test_pickle_ignores_the_cache(make: Any) -> None:
+
+    model = make()
+    expected: Dict[str, Any] = read_all(make())
+    read_all(model)
+
+    loaded = pickle.loads(pickle.dumps(model))
+    assert cached(loaded) == []
+    assert loaded == model
+    assert read_all(loaded) == expected
+
+    # same bytes whether the cache was filled or not
+    assert pickle.dumps(model) == pickle.dumps(make())
+
+    # the pickled instance itself keeps its cache
+    assert sorted(cached(model)) == sorted(model.__pydantic_computed_fields__)
+
+
+def test_deepcopy_keeps_recomputing_after_assignment() -> None:
+
+    model = features()
+    read_all(model)
+
+    copied = copy.deepcopy(model)
+    copied.weight = 95.0
+    assert copied.bmi == 31.02
+    assert model.bmi == 22.86
@@ -0,0 +1,147 @@
+"""
+utils/patient_store.PatientStore with several stores on 1 patient_data.json, like the 9-3 (create) & 9-4 (update / delete)
+apps running side by side: every store sees the others' writes & no flush drops a write made by another store.
+Journal mode is also run with several processes writing at once (benchmarks/stress_patient_store.py, scaled down).
+"""
+import json
+import asyncio
+import importlib
+import multiprocessing as mp
+import pytest
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+patient_store = importlib.import_module('09-FastAPI_injunction.utils.patient_store')
+load_update_data = importlib.import_module('09-FastAPI_injunction.utils.load_update_data')
+stress_patient_store = importlib.import_module('09-FastAPI_injunction.benchmarks.stress_patient_store')
+
+# small enough for every test run, compactions still happen in the middle of it
+STRESS_PROCESSES: int = 3
+STRESS_THREADS: int = 2
+STRESS_INCREMENTS: int = 40
+STRESS_CREATES: int = 10
+STRESS_RACE_IDS: int = 10
+STRESS_COMPACT_RECORDS: int = 25
+
+PATIENT: Dict[str, Any] = {'name': 'Ananya Verma', 'city': 'Guwahati', 'age': 28, 'gender': 'female', 'height': 1.65,
+                           'weight': 90.0, 'bmi': 33.06, 'verdict': 'Obese'}
+
+
+def patient(weight: float) -> Dict[str, Any]:
+    return {**PATIENT, 'weight': weight}
+
+
+def file_patients(json_path: Path) -> Dict[str, Dict[str, Any]]:
+    with open(json_path, 'r') as json_file:
+        return json.load(json_file)
+
+
+@pytest.fixture
+def json_path(tmp_path: Path) -> Path:
+    path: Path = tmp_path / 'patient_data.json'
+    load_update_data.write_json_atomic(path, {'P001': patient(90.0)})
+    return path
+
+
+@pytest.mark.parametrize('mode', ['snapshot', 'journal'])
+def test_stores_sharing_a_file_see_each_others_writes(json_path: Path, mode: str) -> None:
+
+    # both loaded before either writes, no flusher running: every write goes to the files right away
+    creator = patient_store.PatientStore(json_path, mode=mode)
+    updater = patient_store.PatientStore(json_path, mode=mode)
+    creator.load()
+    updater.load()
+
+    assert creator.create('P002', patient(60.0))
+    assert updater.get('P002') == patient(60.0)                 # was a 404 in 9-4 for patients created by 9-3
+    assert not updater.create('P002', patient(61.0))
+
+    assert updater.put('P002', patient(65.0))
+    assert updater.delete('P001')
+    assert creator.create('P003', patient(70.0))
+
+    expected: Dict[str, Dict[str, Any]] = {'P002': patient(65.0), 'P003': patient(70.0)}
+    assert creator.all() == expected
+    assert updater.all() == expected
+
+    for store in (creator, updater):
+        store.flush()
+
+    fresh = patient_store.PatientStore(json_path, mode=mode)
+    fresh.load()
+    assert fresh.all() == expected
+
+
+@pytest.mark.parametrize('mode', ['snapshot', 'journal'])
+def test_compare_and_set_fails_after_another_stores_write(json_path: Path, mode: str) -> None:
+
+    first = patient_store.PatientStore(json_path, mode=mode)
+    second = patient_store.PatientStore(json_path, mode=mode)
+    first.load()
+    second.load()
+
+    record, version = second.get_versioned('P001')
+    assert record == patient(90.0)
+
+    assert first.put('P001', patient(91.0))
+    assert not second.put('P001', patient(92.0), expected_version=version)
+    assert second.get('P001') == patient(91.0)
+
+
+def test_write_behind_flushes_merge_the_other_stores_flushes(json_path: Path) -> None:
+
+    async def run() -> None:
+        first = patient_store.PatientStore(json_path, flush_delay_seconds=0.01, mode='snapshot')
+        second = patient_store.PatientStore(json_path, flush_delay_seconds=0.01, mode='snapshot')
+        await first.start()
+        await second.start()
+
+        assert await first.create_async('P002', patient(60.0))
+        assert await second.create_async('P003', patient(70.0))
+        assert await second.delete_async('P001')
+        await asyncio.sleep(0.2)                # both flushers wrote the file at least once
+
+        assert await first.create_async('P004', patient(80.0))
+        assert await second.put_async('P002', patient(61.0))
+
+        await first.stop()
+        await second.stop()
+
+    asyncio.run(run())
+
+    assert file_patients(json_path) == {'P002': patient(61.0), 'P003': patient(70.0), 'P004': patient(80.0)}
+
+
+def test_concurrent_processes_lose_no_update_in_journal_mode(tmp_path: Path) -> None:
+
+    counter_id: str = stress_patient_store.COUNTER_ID
+    json_path: Path = tmp_path / 'patient_data.json'
+    load_update_data.write_json_atomic(json_path, {counter_id: stress_patient_store.PATIENT})
+
+    # spawn: forking the multi-threaded pytest process may deadlock the children
+    context = mp.get_context('spawn')
+    results: 'mp.Queue[Tuple[int, int, int, int]]' = context.Queue()
+    workers: List[mp.Process] = [context.Process(target=stress_patient_store.run_worker,
+                                                 args=(json_path, 'journal', STRESS_COMPACT_RECORDS, worker, STRESS_THREADS,
+                                                       STRESS_INCREMENTS, STRESS_CREATES, STRESS_RACE_IDS, results))
+                                 for worker in range(STRESS_PROCESSES)]
+
+    for worker in workers:
+        worker.start()
+    outcomes: List[Tuple[int, int, int, int]] = [results.get(timeout=120) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+
+    assert [worker.exitcode for worker in workers] == [0] * STRESS_PROCESSES
+
+    final = patient_store.PatientStore(json_path, mode='journal')
+    final.load()
+    patients: Dict[str, Dict[str, Any]] = final.all()
+    writers: int = STRESS_PROCESSES * STRESS_THREADS
+
+    # every read-modify-write increment counted once, every own create kept, each raced id created by 1 writer only
+    assert patients[counter_id]['weight'] == writers * STRESS_INCREMENTS
+    assert sum(patient_id.startswith('W') for patient_id in patients) == writers * STRESS_CREATES
+    assert sum(patient_id.startswith('RACE-') for patient_id in patients) == STRESS_RACE_IDS
+    assert sum(outcome[2] for outcome in outcomes) == STRESS_RACE_IDS
+    assert sum(outcome[3] for outcome in outcomes) == 0                # no read went back to an older version
@@ -0,0 +1,71 @@
+"""
+utils/prediction_cache.PredictionCache across a hot swap: the new ModelHandle takes the cache over once, requests still
+pinned to the old one (drain window) neither read, write nor empty it.
+"""
+import importlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+prediction_cache = importlib.import_module('09-FastAPI_injunction.utils.prediction_cache')
+model_registry = importlib.import_module('09-FastAPI_injunction.utils.model_registry')
+
+KEY = (10.0, 'private_job', 24.22, 'low', 1, 'adult')
+
+
+def handle(version: str, generation: int) -> Any:
+    return model_registry.ModelHandle(version=version,
+                                      model=None,
+                                      fast_scorer=None,
+                                      source_path=Path(f'{version}.joblib'),
+                                      source_mtime_ns=0,
+                                      loaded_at=datetime.now(timezone.utc),
+                                      generation=generation)
+
+
+def test_newer_handle_takes_the_cache_over() -> None:
+
+    cache = prediction_cache.PredictionCache(max_size=8)
+    old, new = handle('v1', 1), handle('v2', 2)
+
+    assert cache.get(KEY, old) is prediction_cache.MISSING
+    cache.put(KEY, 'Low', old)
+    assert cache.get(KEY, old) == 'Low'
+
+    assert cache.get(KEY, new) is prediction_cache.MISSING       # entries of the old model are dropped
+    cache.put(KEY, 'High', new)
+    assert cache.get(KEY, new) == 'High'
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_alternating_old_and_new_handles_dont_thrash() -> None:
+
+    cache = prediction_cache.PredictionCache(max_size=8)
+    old, new = handle('v1', 1), handle('v2', 2)
+
+    cache.get(KEY, old)
+    cache.put(KEY, 'Low', old)
+    cache.get(KEY, new)                                          # hot swap: 'new' takes the cache over
+    cache.put(KEY, 'High', new)
+
+    # requests pinned to 'old' keep arriving while the new ones are served
+    for _ in range(20):
+        assert cache.get(KEY, old) is prediction_cache.MISSING
+        cache.put(KEY, 'Low', old)                               # ignored, never overwrites the new model's entry
+        assert cache.get(KEY, new) == 'High'
+
+    stats = cache.stats()
+    assert stats['invalidations'] == 1
+    assert stats['stale_handles'] == 20
+    assert stats['size'] == 1
+    assert stats['hits'] == 20
+
+
+def test_registry_handles_get_increasing_generations(tmp_path: Path) -> None:
+
+    # every load is a new generation, a version loaded again (ex: rollback) included
+    registry = model_registry.ModelRegistry(registry_dir=tmp_path)
+    first = registry.load_initial()
+    second = registry.load_version(*registry.latest_version())
+
+    assert second.generation > first.generation
@@ -0,0 +1,216 @@
+"""
+GET /sort (9-2) with 'limit' / 'cursor' against the full sort it replaced (sorted(..., key=x.get(sort_by, 0))): pages
+walked with 'next_cursor' give the same patients in the same order, ties included, whatever the page size, before & after
+the index is built, & with patients added or removed between 2 pages. Then utils/sorted_index.SortedIndex on its own.
+"""
+import json
+import base64
+import random
+import importlib
+import pytest
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Tuple
+from fastapi.testclient import TestClient
+
+sorted_index = importlib.import_module('09-FastAPI_injunction.utils.sorted_index')
+load_update_data = importlib.import_module('09-FastAPI_injunction.utils.load_update_data')
+
+FIELDS: List[str] = ['height', 'weight', 'bmi']
+ORDERS: List[str] = ['asc', 'desc']
+
+
+def full_sort(patients: Dict[str, Dict[str, Any]], field: str, order: str) -> List[str]:
+
+    # the former '/sort' (stable sort of the values, missing field as 0), ties then ordered by id like the index
+    # (descending: reverse id order), the only ordering the old route left unspecified
+    ordered: List[Tuple[str, Dict[str, Any]]] = sorted(patients.items(), key=lambda item: item[0], reverse=order == 'desc')
+    return [patient_id for patient_id, _ in sorted(ordered, key=lambda item: item[1].get(field, 0), reverse=order == 'desc')]
+
+
+def patient_ids(patients: Dict[str, Dict[str, Any]], records: List[Dict[str, Any]]) -> List[str]:
+
+    # '/sort' returns the records without their id: names are unique in the test data
+    id_by_name: Dict[str, str] = {record['name']: patient_id for patient_id, record in patients.items()}
+    return [id_by_name[record['name']] for record in records]
+
+
+def get_page(client: TestClient, field: str, order: str, limit: int, cursor: str | None = None) -> Dict[str, Any]:
+
+    params: Dict[str, Any] = {'sort_by': field, 'order_by': order, 'limit': limit}
+    if cursor is not None:
+        params['cursor'] = cursor
+
+    response = client.get('/sort', params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def walk_pages(client: TestClient, field: str, order: str, limit: int) -> List[List[Dict[str, Any]]]:
+
+    pages: List[List[Dict[str, Any]]] = []
+    cursor: str | None = None
+
+    while True:
+        page: Dict[str, Any] = get_page(client, field, order, limit, cursor)
+        assert len(page['patients']) <= limit
+        pages.append(page['patients'])
+
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def raw_cursor(value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize('order', ORDERS)
+@pytest.mark.parametrize('field', FIELDS)
+def test_unpaged_sort_matches_the_full_sort(path_query_app: ModuleType, field: str, order: str) -> None:
+
+    client = TestClient(path_query_app.app)
+    records: List[Dict[str, Any]] = client.get('/sort', params={'sort_by': field, 'order_by': order}).json()
+    patients: Dict[str, Dict[str, Any]] = path_query_app.patient_data
+
+    assert patient_ids(patients, records) == full_sort(patients, field, order)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 6, 10])
+@pytest.mark.parametrize('order', ORDERS)
+@pytest.mark.parametrize('field', FIELDS)
+def test_pages_walked_with_next_cursor_match_the_full_sort(path_query_app: ModuleType, field: str, order: str,
+                                                           limit: int) -> None:
+
+    # 1st page from top_k() (no index yet), the next ones from the index
+    client = TestClient(path_query_app.app)
+    pages: List[List[Dict[str, Any]]] = walk_pages(client, field, order, limit)
+    patients: Dict[str, Dict[str, Any]] = path_query_app.patient_data
+
+    assert patient_ids(patients, [record for page in pages for record in page]) == full_sort(patients, field, order)
+    assert all(len(page) == limit for page in pages[:-1])
+
+    # walked again with every index built: the same pages
+    assert walk_pages(client, field, order, limit) == pages
+
+
+@pytest.mark.parametrize('order', ORDERS)
+def test_ties_split_across_pages(path_query_app: ModuleType, order: str) -> None:
+
+    # 3 patients weigh 80.0 & 2 weigh 63.0: pages of 1 cut through every tie, none is repeated or skipped
+    client = TestClient(path_query_app.app)
+    pages: List[List[Dict[str, Any]]] = walk_pages(client, 'weight', order, 1)
+    patients: Dict[str, Dict[str, Any]] = path_query_app.patient_data
+    walked: List[str] = patient_ids(patients, [record for page in pages for record in page])
+
+    tied: List[str] = [patient_id for patient_id in walked if patients[patient_id]['weight'] == 80.0]
+    assert tied == sorted(tied, reverse=order == 'desc')
+    assert len(tied) == 3
+    assert sorted(walked) == sorted(patients)
+
+
+def test_missing_field_sorts_as_zero(path_query_app: ModuleType, patients_json: Path) -> None:
+
+    client = TestClient(path_query_app.app)
+    with open(patients_json, 'r') as json_file:
+        patients: Dict[str, Dict[str, Any]] = json.load(json_file)
+    no_bmi: List[str] = [patient_id for patient_id, record in patients.items() if 'bmi' not in record]
+
+    assert no_bmi
+    assert patient_ids(patients, get_page(client, 'bmi', 'asc', len(no_bmi))['patients']) == sorted(no_bmi)
+    assert patient_ids(patients, get_page(client, 'bmi', 'desc', len(patients))['patients'])[-len(no_bmi):] == sorted(no_bmi, reverse=True)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 !',
+    raw_cursor([80.0]),
+    raw_cursor([80.0, 'P001', 'P002']),
+    raw_cursor(['80.0', 'P001']),                   # value must be a number
+    raw_cursor([80.0, 1]),                          # id must be a string
+    raw_cursor({'weight': 80.0}),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_malformed_cursor_is_400(path_query_app: ModuleType, cursor: str) -> None:
+
+    response = TestClient(path_query_app.app).get('/sort', params={'sort_by': 'weight', 'order_by': 'asc', 'limit': 2,
+                                                                   'cursor': cursor})
+    assert response.status_code == 400
+    assert 'cursor' in response.json()['detail'].lower()
+
+
+@pytest.mark.parametrize('params', [
+    {'sort_by': 'age', 'order_by': 'asc'},
+    {'sort_by': 'weight', 'order_by': 'up'},
+    {'sort_by': 'weight'},
+])
+def test_invalid_sort_or_order_is_400(path_query_app: ModuleType, params: Dict[str, Any]) -> None:
+    assert TestClient(path_query_app.app).get('/sort', params={**params, 'limit': 2}).status_code == 400
+
+
+@pytest.mark.parametrize('order', ORDERS)
+def test_patients_added_or_removed_between_pages(path_query_app: ModuleType, patients_json: Path, order: str) -> None:
+
+    client = TestClient(path_query_app.app)
+    first: Dict[str, Any] = get_page(client, 'weight', order, 2)
+    patients: Dict[str, Dict[str, Any]] = dict(path_query_app.patient_data)
+    seen: List[str] = patient_ids(patients, first['patients'])
+    last_seen: str = seen[-1]
+    after: Tuple[Any, str] = (patients[last_seen]['weight'], last_seen)
+
+    # the cursor's own patient & 1 not yet sent are removed, 1 patient lands before the cursor & 1 after it
+    not_sent: List[str] = [patient_id for patient_id in full_sort(patients, 'weight', order) if patient_id not in seen]
+    del patients[last_seen], patients[not_sent[0]]
+    before_weight, after_weight = (10.0, 500.0) if order == 'asc' else (500.0, 10.0)
+    patients['P100'] = {'name': 'Early', 'city': 'Agra', 'age': 20, 'gender': 'male', 'height': 1.70, 'weight': before_weight}
+    patients['P101'] = {'name': 'Late', 'city': 'Agra', 'age': 21, 'gender': 'male', 'height': 1.70, 'weight': after_weight}
+    load_update_data.write_json_atomic(patients_json, patients)
+
+    rest: List[Dict[str, Any]] = []
+    cursor: str | None = first['next_cursor']
+    while cursor is not None:
+        page: Dict[str, Any] = get_page(client, 'weight', order, 2, cursor)
+        rest.extend(page['patients'])
+        cursor = page['next_cursor']
+
+    # the walk resumes right after the cursor's key in the new data: nothing repeated, the removed patients are gone
+    expected: List[str] = [patient_id for patient_id in full_sort(patients, 'weight', order)
+                           if ((patients[patient_id]['weight'], patient_id) > after) == (order == 'asc')]
+    assert patient_ids(patients, rest) == expected
+    assert 'P101' in expected and 'P100' not in expected
+    assert not set(expected) & set(seen)
+
+
+def test_sorted_index_pages_match_a_full_sort_through_upserts_and_removes() -> None:
+
+    rng = random.Random(19)
+    records: Dict[str, Dict[str, Any]] = {f'P{number:03d}': {'weight': rng.choice([60.0, 70.0, 80.0])} for number in range(40)}
+    index = sorted_index.SortedIndex('weight', records)
+
+    for step in range(200):
+        patient_id: str = f'P{rng.randrange(60):03d}'
+        if rng.random() < 0.3:
+            records.pop(patient_id, None)
+            index.remove(patient_id)
+        else:
+            records[patient_id] = {'weight': rng.choice([60.0, 65.0, 70.0, 80.0])} if rng.random() < 0.9 else {}
+            index.upsert(patient_id, records[patient_id])
+
+        if step % 20:
+            continue
+
+        expected: List[Tuple[Any, str]] = sorted(sorted_index.sort_key(patient_id, record, 'weight')
+                                                 for patient_id, record in records.items())
+        assert len(index) == len(records)
+
+        for descending in (False, True):
+            ordered: List[Tuple[Any, str]] = expected[::-1] if descending else expected
+            assert index.page(descending) == ordered
+            assert index.page(descending, 7) == sorted_index.top_k(records, 'weight', 7, descending) == ordered[:7]
+
+            walked: List[Tuple[Any, str]] = []
+            after: Tuple[Any, str] | None = None
+            while page := index.page(descending, 3, after):
+                walked.extend(page)
+                after = sorted_index.decode_cursor(sorted_index.encode_cursor(page[-1]))
+
+            assert walked == ordered